@@ -3,7 +3,33 @@ import sys
 import os
 import json
 import signal
+import stat
+import threading
+from devgateway.gateway.frames import encode_batch, encode_frame, event
 from devgateway.gateway.gateway import Gateway
+from devgateway.gateway.line_decoder import DEFAULT_MAX_LINE_LENGTH
+# Supervisor, FileWatcher (ctypes) and ControlServer are imported when
+# configured: time to the process's first output line counts every import
+
+async def open_stdin() -> asyncio.StreamReader:
+    """Wrap the container's stdin in an asyncio stream."""
+    loop = asyncio.get_running_loop()
+    # Input lines (pasted text) can be long
+    reader = asyncio.StreamReader(limit=1024 * 1024)
+    mode = os.fstat(sys.stdin.fileno()).st_mode
+    if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or sys.stdin.isatty():
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        return reader
+    
+    # Files and /dev/null can't be polled; read them from a thread instead
+    # A private file object, so the interpreter doesn't wait on this thread's read at exit
+    private = os.fdopen(os.dup(sys.stdin.fileno()), "rb")
+    def pump():
+        for line in private:
+            loop.call_soon_threadsafe(reader.feed_data, line)
+        loop.call_soon_threadsafe(reader.feed_eof)
+    threading.Thread(target=pump, daemon=True).start()
+    return reader
 
 async def main():
     """
@@ -11,10 +37,74 @@ async def main():
     
     It reads configuration from environment variables and uses the Gateway class
     to manage the actual project process, streaming its output to stdout.
+    
+    With GATEWAY_STANDBY=1 (warm pool containers) the agent instead waits for a
+    JSON assignment line on stdin: {"project_id", "working_directory", "command"}
+    (plus optionally "pty", "columns", "rows", "processes", "watch", "control_token").
+    
+    With GATEWAY_PROCESSES (a JSON list of named processes, see
+    parse_processes) the agent supervises several processes instead of
+    running GATEWAY_COMMAND, restarting them when they crash; output lines
+    are then prefixed (plain text) or tagged (frames) with the process name.
+    
+    With GATEWAY_PTY=1 the process runs on a pseudo-terminal of
+    GATEWAY_PTY_COLUMNS x GATEWAY_PTY_ROWS and its output is passed through
+    as raw terminal chunks instead of lines. Otherwise output lines longer
+    than GATEWAY_MAX_LINE_LENGTH characters are truncated.
+    
+    With GATEWAY_OUTPUT_FORMAT=frames (set by dev-manager) output is written
+    as frames carrying stream, sequence number, timestamp and event type (see
+    devgateway.gateway.frames) instead of plain text.
+    
+    Further stdin lines are console messages from the manager, one JSON
+    object each: {"type": "input", "data": "...", "newline": bool} is written
+    to the process's stdin (with "process": name, to that supervised
+    process's), {"type": "resize", "columns": n, "rows": n} resizes the
+    terminal.
+    
+    With GATEWAY_WATCH (1, or options; see parse_watch_options) the process
+    is restarted in place when files in the working directory change and
+    waits for the next change when it exits, instead of ending the agent.
+    Supervised processes opt in with "watch": true.
+    
+    With GATEWAY_CONTROL_PORT and/or GATEWAY_CONTROL_SOCKET the agent also
+    serves a control endpoint (signals, input, restarts, status; see
+    ControlServer) secured with GATEWAY_CONTROL_TOKEN.
     """
     project_id = os.environ.get("GATEWAY_PROJECT_ID", "default")
     working_dir = os.environ.get("GATEWAY_WORKING_DIR", "/app")
     command_str = os.environ.get("GATEWAY_COMMAND", "[]")
+    processes_str = os.environ.get("GATEWAY_PROCESSES", "")
+    use_pty = os.environ.get("GATEWAY_PTY") == "1"
+    columns = int(os.environ.get("GATEWAY_PTY_COLUMNS", "80"))
+    rows = int(os.environ.get("GATEWAY_PTY_ROWS", "24"))
+    framed = os.environ.get("GATEWAY_OUTPUT_FORMAT", "text") == "frames"
+    max_line_length = int(os.environ.get("GATEWAY_MAX_LINE_LENGTH", str(DEFAULT_MAX_LINE_LENGTH)))
+    watch_str = os.environ.get("GATEWAY_WATCH", "")
+    control_port = int(os.environ.get("GATEWAY_CONTROL_PORT", "0"))
+    control_socket = os.environ.get("GATEWAY_CONTROL_SOCKET", "")
+    control_token = os.environ.get("GATEWAY_CONTROL_TOKEN", "")
+    
+    stdin = await open_stdin()
+    if os.environ.get("GATEWAY_STANDBY") == "1":
+        line = await stdin.readline()
+        if not line:
+            # Pool drained without this container being used
+            return
+        assignment = json.loads(line)
+        project_id = assignment.get("project_id", project_id)
+        working_dir = assignment.get("working_directory", working_dir)
+        command_str = json.dumps(assignment.get("command", []))
+        if assignment.get("processes"):
+            processes_str = json.dumps(assignment["processes"])
+        use_pty = bool(assignment.get("pty", use_pty))
+        columns = int(assignment.get("columns", columns))
+        rows = int(assignment.get("rows", rows))
+        control_token = assignment.get("control_token", control_token)
+        watch = assignment.get("watch")
+        if watch is not None:
+            # Options, or true/false
+            watch_str = json.dumps(watch) if isinstance(watch, dict) else ("1" if watch else "")
     
     try:
         command = json.loads(command_str)
@@ -23,25 +113,81 @@ async def main():
     except json.JSONDecodeError:
         command = command_str.split()
 
-    if not command or command == [""]:
+    watch_options = None
+    if watch_str.strip():
+        from devgateway.gateway.watcher import parse_watch_options
+        try:
+            watch_options = parse_watch_options(watch_str)
+        except ValueError as e:
+            print(f"[GATEWAY] Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    supervised = bool(processes_str)
+    if supervised:
+        from devgateway.gateway.supervisor import Supervisor, parse_processes
+        try:
+            specs = parse_processes(processes_str)
+        except ValueError as e:
+            print(f"[GATEWAY] Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        gateway = Supervisor(
+            project_id, working_dir, specs,
+            pty=use_pty, columns=columns, rows=rows, max_line_length=max_line_length,
+        )
+        gateway.notice(
+            f"[GATEWAY] Starting project {project_id} with processes: {', '.join(spec.name for spec in specs)}",
+            "starting",
+        )
+    elif not command or command == [""]:
         print("[GATEWAY] Error: No command provided. "
               "The GATEWAY_COMMAND environment variable must be set to the command you want to execute "
               "(e.g., '[\"npm\", \"start\"]' or 'python main.py').", file=sys.stderr)
         sys.exit(1)
-
-    print(f"[GATEWAY] Starting project {project_id} with command: {' '.join(command)}")
+    else:
+        gateway = Gateway(
+            project_id, working_dir, command,
+            pty=use_pty, columns=columns, rows=rows, max_line_length=max_line_length,
+        )
+        gateway.notice(f"[GATEWAY] Starting project {project_id} with command: {' '.join(command)}", "starting")
     
-    gateway = Gateway(project_id, working_dir, command)
+    # Lines produced within this window are written to stdout together
+    # (terminal chunks are passed on as soon as they are read)
+    batch_latency = 0 if use_pty else int(os.environ.get("GATEWAY_OUTPUT_BATCH_MS", "0")) / 1000
+    batch_bytes = int(os.environ.get("GATEWAY_OUTPUT_BATCH_BYTES", str(64 * 1024)))
+    # Right after input, output (the echo) is written without waiting for a batch
+    interactive_seconds = 2.0
+    loop = asyncio.get_running_loop()
+    last_input = -interactive_seconds
     
-    # Task to pipe output from the Gateway queue to the container's stdout
+    # Task to pipe output from the Gateway scrollback to the container's stdout,
+    # one write per batch of lines. Ends when the gateway closes its output.
     async def pipe_output():
-        queue = gateway.output_queue
+        output = gateway.output
+        cursor = output.first_seq
         while True:
-            line = await queue.get()
-            print(line, flush=True)
-            # Stop piping when we see a termination message
-            if "[GATEWAY] Process stopped" in line or "[GATEWAY] Process exited" in line:
+            interactive = loop.time() - last_input < interactive_seconds
+            batch = await output.read_coalesced(cursor, batch_bytes, 0 if interactive else batch_latency)
+            if batch is None:
                 break
+            lines = batch.lines
+            if framed:
+                # Dropped entries show up as a gap in the frame sequence numbers
+                sys.stdout.write(encode_batch(batch))
+            elif use_pty:
+                if batch.dropped:
+                    lines = [f"\r\n[GATEWAY] {batch.dropped} chunks dropped\r\n", *lines]
+                sys.stdout.write("".join(lines))
+            else:
+                if supervised:
+                    lines = [
+                        f"[{source.process}] {line}" if source.process else line
+                        for line, source in zip(lines, batch.sources)
+                    ]
+                if batch.dropped:
+                    lines = [f"[GATEWAY] {batch.dropped} lines dropped", *lines]
+                sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+            cursor = batch.seq + len(batch.lines)
 
     # Start the project process
     try:
@@ -50,9 +196,68 @@ async def main():
         print(f"[GATEWAY] Error starting process: {e}", file=sys.stderr)
         sys.exit(1)
         
+    # Task to hand console input from the manager to the process
+    async def forward_input():
+        nonlocal last_input
+        while line := await stdin.readline():
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if message.get("type") == "input":
+                last_input = loop.time()
+                data, newline = str(message.get("data", "")), bool(message.get("newline", True))
+                if supervised:
+                    try:
+                        await gateway.send_input(data, newline, message.get("process"))
+                    except KeyError:
+                        pass  # No such process
+                else:
+                    await gateway.send_input(data, newline)
+            elif message.get("type") == "resize":
+                try:
+                    gateway.resize(int(message["columns"]), int(message["rows"]))
+                except (KeyError, ValueError, OSError):
+                    pass
+
+    # Watch mode: restart on file changes
+    watch_task = None
+    watch_roots = gateway.watch_roots if supervised else ([working_dir] if watch_options else [])
+    if watch_roots:
+        from devgateway.gateway.watcher import FileWatcher, WatchOptions
+        watcher = FileWatcher(watch_roots, watch_options or WatchOptions())
+        try:
+            watcher.start()
+        except OSError as e:
+            gateway.notice(f"[GATEWAY] File watching unavailable: {e}")
+        else:
+            count = watcher.watched_directories
+            gateway.notice(
+                f"[GATEWAY] Watching {count} director{'y' if count == 1 else 'ies'} in {', '.join(watch_roots)} "
+                "for changes" + (" (inotify watch limit reached, some are not watched)" if watcher.limit_reached else "")
+            )
+            watch_task = asyncio.create_task(gateway.watch(watcher))
+    
+    def on_control_input() -> None:
+        nonlocal last_input
+        last_input = loop.time()
+    
+    control = None
+    if control_port or control_socket:
+        if not control_token:
+            print("[GATEWAY] Error: GATEWAY_CONTROL_TOKEN is not set, control endpoint disabled", file=sys.stderr)
+        else:
+            from devgateway.gateway.control import ControlServer
+            control = ControlServer(gateway, control_token, on_input=on_control_input)
+            try:
+                await control.start(control_port, control_socket)
+            except OSError as e:
+                print(f"[GATEWAY] Error starting control endpoint: {e}", file=sys.stderr)
+    
     output_task = asyncio.create_task(pipe_output())
+    input_task = asyncio.create_task(forward_input())
     
-    # Wait for the process to complete
+    # Wait for the process (or every supervised process) to complete
     exit_code = await gateway.wait()
     
     # Wait a bit for remaining output to be piped
@@ -60,8 +265,18 @@ async def main():
         await asyncio.wait_for(output_task, timeout=2.0)
     except asyncio.TimeoutError:
         output_task.cancel()
+    input_task.cancel()
+    if watch_task:
+        watch_task.cancel()
+    if control:
+        await control.close()
     
-    print(f"[GATEWAY] Agent exiting with code {exit_code}")
+    message = f"[GATEWAY] Agent exiting with code {exit_code}"
+    if framed:
+        sys.stdout.write(encode_frame(gateway.output.next_seq, event("exit"), [message], code=exit_code))
+        sys.stdout.flush()
+    else:
+        print(message)
     sys.exit(exit_code)
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+import asyncio
+import hmac
+import json
+import signal
+import time
+from http import HTTPStatus
+from typing import Callable, Optional, Tuple, Union
+
+from devgateway.gateway.gateway import Gateway
+from devgateway.gateway.supervisor import Supervisor
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def parse_signal(value) -> int:
+    """
+    A signal given as number or name ("HUP" or "SIGHUP").
+
+    Raises:
+        ValueError: If it isn't a known signal.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return signal.Signals(value).value
+    if isinstance(value, str):
+        name = value.upper()
+        try:
+            return signal.Signals[name if name.startswith("SIG") else f"SIG{name}"].value
+        except KeyError:
+            pass
+    raise ValueError(f"Unknown signal: {value!r}")
+
+
+class ControlServer:
+    """
+    Small HTTP/1.1 endpoint through which dev-manager controls the project
+    inside the container directly, instead of with whole-container Docker
+    operations. Listens on a TCP port (published by the manager) and/or a
+    unix socket; connections are kept alive between requests.
+
+    Every request needs an "Authorization: Bearer <token>" header. Bodies
+    and responses are JSON; "process" picks a supervised process (the
+    first one by default):
+
+        GET  /status                        {"project_id", "state", "pid", "exit_code"}
+                                            or {"project_id", "processes": {name: status}}
+        POST /signal   {"signal": "HUP"}    signal the process ("SIGHUP" or 1 work too)
+        POST /input    {"data", "newline"}  write to its stdin (newline defaults to true)
+        POST /restart  {}                   replace it with a fresh run, in place
+
+    Errors come back as {"error": message} with status 400 (bad request),
+    401 (token), 404 (unknown route or process) or 409 (wrong state).
+    """
+
+    def __init__(
+        self,
+        gateway: Union[Gateway, Supervisor],
+        token: str,
+        on_input: Optional[Callable[[], None]] = None,
+    ):
+        self._gateway = gateway
+        self._supervised = isinstance(gateway, Supervisor)
+        self._authorization = f"Bearer {token}".encode()
+        self._on_input = on_input
+        self._servers = []
+        self._connections = set()
+
+    async def start(self, port: Optional[int] = None, path: Optional[str] = None) -> None:
+        """Start listening on `port` (all interfaces) and/or the unix socket at `path`."""
+        if port:
+            self._servers.append(await asyncio.start_server(self._serve, port=port))
+        if path:
+            self._servers.append(await asyncio.start_unix_server(self._serve, path=path))
+
+    async def close(self) -> None:
+        """Stop listening and end open connections."""
+        for server in self._servers:
+            server.close()
+        for writer in self._connections:
+            writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while request_line := await reader.readline():
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self._handle(method, target.split("?", 1)[0], headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict, keep_alive: bool) -> None:
+        data = json.dumps(payload).encode()
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+        ]
+        if not keep_alive:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+    async def _handle(self, method: str, path: str, headers: dict, body: bytes) -> Tuple[HTTPStatus, dict]:
+        if not hmac.compare_digest(headers.get("authorization", "").encode("latin-1"), self._authorization):
+            return HTTPStatus.UNAUTHORIZED, {"error": "Invalid token"}
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Body is not valid JSON"}
+        if not isinstance(request, dict):
+            return HTTPStatus.BAD_REQUEST, {"error": "Body must be a JSON object"}
+
+        process = request.get("process")
+        if process is not None:
+            process = str(process)
+        try:
+            if process is not None and not self._supervised:
+                raise KeyError(process)
+            if (method, path) == ("GET", "/status"):
+                return HTTPStatus.OK, self._status()
+            if (method, path) == ("POST", "/signal"):
+                signum = parse_signal(request.get("signal"))
+                if self._supervised:
+                    self._gateway.send_signal(signum, process)
+                else:
+                    self._gateway.send_signal(signum)
+                return HTTPStatus.OK, self._status()
+            if (method, path) == ("POST", "/input"):
+                data, newline = str(request.get("data", "")), bool(request.get("newline", True))
+                if self._on_input:
+                    self._on_input()
+                if self._supervised:
+                    await self._gateway.send_input(data, newline, process)
+                else:
+                    await self._gateway.send_input(data, newline)
+                return HTTPStatus.OK, {}
+            if (method, path) == ("POST", "/restart"):
+                started = time.perf_counter()
+                if self._supervised:
+                    await self._gateway.restart(process)
+                else:
+                    await self._gateway.restart()
+                return HTTPStatus.OK, {**self._status(), "restart_seconds": round(time.perf_counter() - started, 6)}
+        except KeyError:
+            return HTTPStatus.NOT_FOUND, {"error": f"No process named {process}"}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except (RuntimeError, OSError) as e:
+            return HTTPStatus.CONFLICT, {"error": str(e)}
+        return HTTPStatus.NOT_FOUND, {"error": f"No route {method} {path}"}
+
+    def _status(self) -> dict:
+        if self._supervised:
+            return {"project_id": self._gateway.project_id, "processes": self._gateway.status()}
+        return {"project_id": self._gateway.project_id, **self._gateway.status()}
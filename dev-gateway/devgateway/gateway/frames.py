@@ -0,0 +1,74 @@
+"""
+Framed output protocol between the agent and dev-manager.
+
+With GATEWAY_OUTPUT_FORMAT=frames the agent writes its stdout as a JSON
+text sequence (RFC 7464): every frame is a record separator (0x1E), one
+compact JSON object and a newline, e.g.
+
+    \\x1e{"seq":41,"ts":5123.094117,"stream":"stdout","type":"output","data":["GET / 200"]}
+
+    seq     Sequence number of the first entry in `data`; the entries of a
+            frame are consecutive, so a jump between frames means entries
+            were dropped from the agent's scrollback.
+    ts      time.monotonic() in the agent when the data was read or the
+            event happened.
+    stream  "stdout", "stderr", "pty" (raw terminal chunks) or "gateway"
+            (the agent's own notices).
+    type    "output" for process output, otherwise a lifecycle event:
+            "starting", "started", "paused", "resumed", "stopped",
+            "exited" (the process ended), "process" (a supervised
+            process changed state; has "state" and details such as "pid",
+            "exit_code", "restarts", "retry_in"), "reload" (restarted
+            after file changes in watch mode; has "files", "latency" from
+            the first change to the new process and "restart_seconds")
+            and "exit" (the agent ends; has the exit "code").
+    data    Output lines (terminal chunks for "pty"), or the human-readable
+            message of an event.
+    process Name of the supervised process the frame is about; only
+            present when the agent runs several (GATEWAY_PROCESSES).
+
+Anything else the manager reads from the container (e.g. agent errors on
+stderr) is plain text.
+"""
+import json
+import time
+from typing import List, Optional
+
+from devgateway.gateway.output_buffer import OutputBatch, Source
+
+RECORD_SEPARATOR = "\x1e"
+
+STDOUT = "stdout"
+STDERR = "stderr"
+TERMINAL = "pty"
+GATEWAY = "gateway"
+
+OUTPUT = "output"
+
+
+def encode_frame(seq: int, source: Source, data: List[str], **fields) -> str:
+    """One frame, including the record separator and trailing newline."""
+    frame = {"seq": seq, "ts": round(source.time, 6), "stream": source.stream, "type": source.event, "data": data}
+    if source.process is not None:
+        frame["process"] = source.process
+    if source.fields:
+        frame.update(source.fields)
+    frame.update(fields)
+    return RECORD_SEPARATOR + json.dumps(frame, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def encode_batch(batch: OutputBatch) -> str:
+    """Frames for a batch read from the scrollback: one per run of entries from the same read."""
+    frames = []
+    lines, sources = batch.lines, batch.sources
+    start = 0
+    for end in range(1, len(lines) + 1):
+        if end == len(lines) or sources[end] is not sources[start]:
+            frames.append(encode_frame(batch.seq + start, sources[start], lines[start:end]))
+            start = end
+    return "".join(frames)
+
+
+def event(name: str, process: Optional[str] = None, **fields) -> Source:
+    """Source for an agent notice about lifecycle event `name`, happening now."""
+    return Source(GATEWAY, time.monotonic(), name, process, fields or None)
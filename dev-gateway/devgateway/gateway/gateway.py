@@ -1,7 +1,27 @@
 import asyncio
+import codecs
+import fcntl
+import os
+import pty
 import signal
+import struct
+import termios
+import time
 from enum import Enum
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
+
+from devgateway.gateway.frames import OUTPUT, STDERR, STDOUT, TERMINAL, event
+from devgateway.gateway.line_decoder import DEFAULT_MAX_LINE_LENGTH, LineDecoder
+from devgateway.gateway.output_buffer import OutputBuffer, Source
+
+if TYPE_CHECKING:
+    from devgateway.gateway.watcher import Change, FileWatcher
+
+DEFAULT_SCROLLBACK_LINES = 5000
+DEFAULT_SCROLLBACK_BYTES = 4 * 1024 * 1024
+DEFAULT_COLUMNS = 80
+DEFAULT_ROWS = 24
+OUTPUT_READ_SIZE = 256 * 1024
 
 
 class GatewayState(Enum):
@@ -17,17 +37,64 @@ class Gateway:
     Manages a single project execution process.
     
     Provides lifecycle controls (run, shutdown, pause, resume) and
-    streams console output via an async queue.
+    streams console output via a bounded, sequence-numbered scrollback.
+    
+    With `pty=True` the process runs on a pseudo-terminal, so it line-buffers,
+    draws progress bars and keeps its colours. Output entries are then raw
+    chunks as read from the terminal (escape sequences and line breaks
+    included) instead of lines.
+    
+    Otherwise stdout and stderr are separate pipes, each drained with large
+    non-blocking reads into a reused buffer and split into lines in bulk;
+    lines longer than `max_line_length` characters are truncated. Every
+    scrollback entry records its stream and read time (see Source).
+    
+    Several gateways can share one `output` buffer (see Supervisor); their
+    entries are then told apart by `name`, and closing the buffer is left
+    to its owner.
+    
+    In watch mode (see `watch`) the process is restarted in place whenever
+    files in the project change, and a process that exited waits for the
+    next change instead of ending the gateway.
     """
     
-    def __init__(self, project_id: str, working_directory: str, command: list[str]):
+    def __init__(
+        self,
+        project_id: str,
+        working_directory: str,
+        command: list[str],
+        scrollback_lines: int = DEFAULT_SCROLLBACK_LINES,
+        scrollback_bytes: int = DEFAULT_SCROLLBACK_BYTES,
+        pty: bool = False,
+        columns: int = DEFAULT_COLUMNS,
+        rows: int = DEFAULT_ROWS,
+        max_line_length: int = DEFAULT_MAX_LINE_LENGTH,
+        name: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        output: Optional[OutputBuffer] = None,
+    ):
         self.project_id = project_id
         self.working_directory = working_directory
         self.command = command
+        self.name = name
+        self.env = env or {}
+        self.pty = pty
+        self._size = (columns, rows)
+        self._max_line_length = max_line_length
         self._state = GatewayState.PENDING
         self._process: Optional[asyncio.subprocess.Process] = None
-        self._output_queue: asyncio.Queue[str] = asyncio.Queue()
+        self._owns_output = output is None
+        self._output = output or OutputBuffer(scrollback_lines, scrollback_bytes)
         self._stream_task: Optional[asyncio.Task] = None
+        self._master: Optional[int] = None
+        # Stream name of the read end of each output pipe (or of the PTY master)
+        self._output_fds: Dict[int, str] = {}
+        # Whether the last PTY chunk ended mid-line (notices then start on a new one)
+        self._line_open = False
+        # Set while `restart` replaces a running process, so `wait` carries on
+        self._restarting: Optional[asyncio.Event] = None
+        # In watch mode: set (and replaced) when a restart begins or watching ends
+        self._watching: Optional[asyncio.Event] = None
     
     @property
     def state(self) -> GatewayState:
@@ -35,9 +102,25 @@ class Gateway:
         return self._state
     
     @property
-    def output_queue(self) -> asyncio.Queue[str]:
-        """Queue for consuming console output."""
-        return self._output_queue
+    def output(self) -> OutputBuffer:
+        """Scrollback for consuming console output."""
+        return self._output
+    
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+    
+    @property
+    def returncode(self) -> Optional[int]:
+        """Exit code of the last run, once the process has been reaped."""
+        return self._process.returncode if self._process else None
+    
+    def status(self) -> dict:
+        return {
+            "state": self._state.value,
+            "pid": self.pid if self._state in (GatewayState.RUNNING, GatewayState.PAUSED) else None,
+            "exit_code": self.returncode,
+        }
     
     async def run(self) -> None:
         """
@@ -49,18 +132,190 @@ class Gateway:
         if self._state != GatewayState.PENDING:
             raise RuntimeError(f"Cannot run gateway in state {self._state}")
         
-        self._process = await asyncio.create_subprocess_exec(
-            *self.command,
-            cwd=self.working_directory,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.STDOUT,
-            stdin=asyncio.subprocess.PIPE,
-        )
+        if self.pty:
+            await self._spawn_pty()
+        else:
+            await self._spawn_pipe()
         self._state = GatewayState.RUNNING
         
+        self.notice(f"[GATEWAY] Process started with PID {self._process.pid}", "started")
+        
         # Start streaming output
         self._stream_task = asyncio.create_task(self._stream_output())
     
+    async def restart(self) -> None:
+        """
+        Run the command again, stopping the process first if it is still
+        running. Output continues in the same scrollback, with the same
+        sequence numbers, and `wait` keeps waiting for the new process.
+        
+        Raises:
+            RuntimeError: If gateway is in PENDING state.
+        """
+        if self._state == GatewayState.PENDING:
+            raise RuntimeError(f"Cannot restart gateway in state {self._state}")
+        self._restarting = restarting = asyncio.Event()
+        self._wake_watch_waiters()
+        try:
+            if self._state != GatewayState.STOPPED:
+                await self._stop()
+                self.notice("[GATEWAY] Process stopped for restart", "stopped")
+            await self.drain()
+            if self._process:
+                await self._process.wait()
+            self._output.reopen()
+            self._line_open = False
+            self._state = GatewayState.PENDING
+            await self.run()
+        finally:
+            self._restarting = None
+            restarting.set()
+    
+    async def watch(self, watcher: "FileWatcher") -> None:
+        """
+        Watch mode: restart the process whenever `watcher` reports a burst
+        of changed files, and report each reload with its change-to-restart
+        latency. Runs until cancelled; the gateway then ends once its
+        process does.
+        """
+        self._watching = asyncio.Event()
+        try:
+            async for change in watcher.changes():
+                if self._state == GatewayState.PENDING:
+                    continue
+                started = time.monotonic()
+                try:
+                    await self.restart()
+                except (RuntimeError, OSError) as e:
+                    self.notice(f"[GATEWAY] Restart after file change failed: {e}", "error")
+                    continue
+                self.notice_reload(change, self.working_directory, started)
+        finally:
+            self._wake_watch_waiters()
+            self._watching = None
+            if self._state == GatewayState.STOPPED and self._owns_output:
+                self._output.close()
+    
+    def notice_reload(self, change: "Change", root: str, restart_started: float) -> None:
+        """Report a restart caused by `change` (see `watch`) as a "reload" notice."""
+        now = time.monotonic()
+        names = [os.path.relpath(path, root) for path in change.paths[:3]]
+        if len(change.paths) > 3:
+            names.append(f"{len(change.paths) - 3} more")
+        latency = now - change.time
+        self.notice(
+            f"[GATEWAY] {len(change.paths)} file{'s' if len(change.paths) != 1 else ''} changed "
+            f"({', '.join(names)}), restarted in {(now - restart_started) * 1000:.0f} ms "
+            f"({latency * 1000:.0f} ms after the change)",
+            "reload",
+            files=len(change.paths),
+            latency=round(latency, 6),
+            restart_seconds=round(now - restart_started, 6),
+        )
+    
+    def _wake_watch_waiters(self) -> None:
+        if self._watching is not None:
+            self._watching.set()
+            self._watching = asyncio.Event()
+    
+    async def drain(self, timeout: float = 2.0) -> None:
+        """
+        Once the process has exited, wait up to `timeout` seconds for the
+        rest of its output, then stop reading (a background child may keep
+        the pipes open).
+        """
+        if self._stream_task is None:
+            return
+        done, _ = await asyncio.wait({self._stream_task}, timeout=timeout)
+        if not done:
+            self._stream_task.cancel()
+            await asyncio.gather(self._stream_task, return_exceptions=True)
+    
+    def _environment(self) -> Optional[Dict[str, str]]:
+        if not self.env and not self.pty:
+            return None  # Inherit the agent's environment
+        env = dict(os.environ)
+        if self.pty:
+            env.setdefault("TERM", "xterm-256color")
+        env.update(self.env)
+        return env
+    
+    async def _spawn_pipe(self) -> None:
+        # Plain pipes instead of asyncio's StreamReader: the drain reads them
+        # directly, without readline()'s per-line overhead and length limit
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *self.command,
+                cwd=self.working_directory,
+                stdout=stdout_write,
+                stderr=stderr_write,
+                stdin=asyncio.subprocess.PIPE,
+                env=self._environment(),
+            )
+        except BaseException:
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+        for fd, stream in ((stdout_read, STDOUT), (stderr_read, STDERR)):
+            os.set_blocking(fd, False)
+            self._output_fds[fd] = stream
+    
+    async def _spawn_pty(self) -> None:
+        master, slave = pty.openpty()
+        try:
+            self._set_window_size(master, *self._size)
+            self._process = await asyncio.create_subprocess_exec(
+                *self.command,
+                cwd=self.working_directory,
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+                env=self._environment(),
+                # New session with the terminal as its controlling tty, so
+                # Ctrl-C and window size changes reach the process group
+                start_new_session=True,
+                preexec_fn=lambda: fcntl.ioctl(0, termios.TIOCSCTTY, 0),
+            )
+        except BaseException:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self._master = master
+        self._output_fds[master] = TERMINAL
+    
+    @staticmethod
+    def _set_window_size(fd: int, columns: int, rows: int) -> None:
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, columns, 0, 0))
+    
+    def resize(self, columns: int, rows: int) -> None:
+        """
+        Change the terminal size (PTY mode only). The kernel signals the
+        process with SIGWINCH.
+        """
+        self._size = (columns, rows)
+        if self._master is not None:
+            self._set_window_size(self._master, columns, rows)
+    
+    def notice(self, message: str, event_name: str = "notice", **fields) -> None:
+        """
+        Add a status message (e.g. "[GATEWAY] Process exited") to the output,
+        tagged with the lifecycle event it reports (plus any event details).
+        """
+        source = event(event_name, self.name, **fields)
+        if not self.pty:
+            self._output.append(message, source)
+            return
+        prefix = "\r\n" if self._line_open else ""
+        self._line_open = False
+        self._output.append(f"{prefix}{message}\r\n", source)
+    
     async def shutdown(self) -> None:
         """
         Stop the execution process gracefully, then forcefully if needed.
@@ -68,12 +323,26 @@ class Gateway:
         if self._process is None or self._state == GatewayState.STOPPED:
             return
         
+        await self._stop()
+        
+        # Signal end of output
+        self.notice("[GATEWAY] Process stopped", "stopped")
+        if self._owns_output:
+            self._output.close()
+    
+    async def _stop(self) -> None:
+        paused = self._state == GatewayState.PAUSED
         self._state = GatewayState.STOPPED
         
         # Try graceful shutdown first
         try:
             self._process.terminate()
+            if paused:
+                # A stopped process only acts on SIGTERM once continued
+                self._process.send_signal(signal.SIGCONT)
             await asyncio.wait_for(self._process.wait(), timeout=5.0)
+        except ProcessLookupError:
+            pass  # Already exited; its output hasn't ended yet
         except asyncio.TimeoutError:
             # Force kill if graceful shutdown times out
             self._process.kill()
@@ -86,9 +355,6 @@ class Gateway:
                 await self._stream_task
             except asyncio.CancelledError:
                 pass
-        
-        # Signal end of output
-        await self._output_queue.put("[GATEWAY] Process stopped")
     
     async def pause(self) -> None:
         """
@@ -103,7 +369,7 @@ class Gateway:
         if self._process and self._process.pid:
             self._process.send_signal(signal.SIGSTOP)
             self._state = GatewayState.PAUSED
-            await self._output_queue.put("[GATEWAY] Process paused")
+            self.notice("[GATEWAY] Process paused", "paused")
     
     async def resume(self) -> None:
         """
@@ -118,50 +384,158 @@ class Gateway:
         if self._process and self._process.pid:
             self._process.send_signal(signal.SIGCONT)
             self._state = GatewayState.RUNNING
-            await self._output_queue.put("[GATEWAY] Process resumed")
+            self.notice("[GATEWAY] Process resumed", "resumed")
+    
+    def send_signal(self, signum: int) -> None:
+        """
+        Send a signal to the process (in PTY mode, to its whole process
+        group, like the terminal would).
+        
+        Raises:
+            RuntimeError: If the process is not running.
+        """
+        if self._state not in (GatewayState.RUNNING, GatewayState.PAUSED) or self._process is None:
+            raise RuntimeError(f"Cannot signal gateway in state {self._state}")
+        if self._process.returncode is not None:
+            return
+        try:
+            # Not Popen.send_signal: it polls first, and reaping the process
+            # there would keep its exit code from asyncio
+            if self.pty:
+                os.killpg(self._process.pid, signum)
+            else:
+                os.kill(self._process.pid, signum)
+        except ProcessLookupError:
+            pass  # Exited; the exit is reported by the output stream
     
-    async def send_input(self, input_text: str) -> None:
+    async def send_input(self, input_text: str, newline: bool = True) -> None:
         """
         Send input to the process stdin.
         
         Args:
-            input_text: Text to send (newline will be appended if not present).
+            input_text: Text to send.
+            newline: Append a newline if not present (off for raw keystrokes).
         """
+        if newline and not input_text.endswith("\n"):
+            input_text += "\n"
+        
+        if self._master is not None:
+            await self._write_pty(input_text.encode())
+            return
         if self._process is None or self._process.stdin is None:
             return
         
-        if not input_text.endswith("\n"):
-            input_text += "\n"
-        
-        self._process.stdin.write(input_text.encode())
-        await self._process.stdin.drain()
+        try:
+            self._process.stdin.write(input_text.encode())
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The process exited or closed its stdin
+            pass
+    
+    async def _write_pty(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view and self._master is not None:
+            try:
+                view = view[os.write(self._master, view):]
+            except BlockingIOError:
+                # Terminal input queue full; the process isn't reading
+                await asyncio.sleep(0.01)
+            except OSError:
+                return
     
     async def _stream_output(self) -> None:
-        """Stream stdout/stderr to the output queue."""
-        if self._process is None or self._process.stdout is None:
-            return
-        
+        """
+        Drain the output pipes (or the PTY master) until every one of them
+        reaches end of file.
+        """
+        drains = [self._drain(fd, stream) for fd, stream in self._output_fds.items()]
         try:
-            while True:
-                line = await self._process.stdout.readline()
-                if not line:
-                    break
-                await self._output_queue.put(line.decode().rstrip())
+            await asyncio.gather(*drains)
         except asyncio.CancelledError:
             pass
         finally:
-            # Mark process as stopped if it exited
-            if self._state == GatewayState.RUNNING:
-                self._state = GatewayState.STOPPED
-                await self._output_queue.put("[GATEWAY] Process exited")
+            self._output_ended()
+    
+    async def _drain(self, fd: int, stream: str) -> None:
+        """
+        Read one output fd with non-blocking reads on the event loop. Each
+        read fills a reused buffer with whatever is available, up to
+        OUTPUT_READ_SIZE bytes; the event loop runs other tasks between
+        reads, so readers keep up with a fast producer.
+        """
+        loop = asyncio.get_running_loop()
+        buffer = bytearray(OUTPUT_READ_SIZE)
+        view = memoryview(buffer)
+        terminal = stream == TERMINAL
+        if terminal:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        else:
+            lines = LineDecoder(self._max_line_length)
+        ended = loop.create_future()
+        
+        def on_readable() -> None:
+            try:
+                size = os.readv(fd, [buffer])
+            except BlockingIOError:
+                return
+            except OSError:
+                # EIO: every process holding the terminal is gone
+                size = 0
+            if not size:
+                loop.remove_reader(fd)
+                if not ended.done():
+                    ended.set_result(None)
+                return
+            source = Source(stream, time.monotonic(), OUTPUT, self.name)
+            if not terminal:
+                self._output.extend(lines.feed(view[:size]), source)
+                return
+            text = decoder.decode(view[:size])
+            if text:
+                self._line_open = not text.endswith("\n")
+                self._output.append(text, source)
+        
+        loop.add_reader(fd, on_readable)
+        try:
+            await ended
+        finally:
+            loop.remove_reader(fd)
+            del self._output_fds[fd]
+            if fd == self._master:
+                self._master = None
+            os.close(fd)
+            source = Source(stream, time.monotonic(), OUTPUT, self.name)
+            if terminal:
+                if tail := decoder.decode(b"", final=True):
+                    self._output.append(tail, source)
+            else:
+                self._output.extend(lines.flush(), source)
+    
+    def _output_ended(self) -> None:
+        # Mark process as stopped if it exited
+        if self._state == GatewayState.RUNNING:
+            self._state = GatewayState.STOPPED
+            self.notice("[GATEWAY] Process exited", "exited")
+            if self._watching is not None:
+                self.notice("[GATEWAY] Waiting for file changes to restart")
+            elif self._owns_output:
+                self._output.close()
     
     async def wait(self) -> int:
         """
-        Wait for the process to complete.
+        Wait for the process to complete (across restarts, and in watch
+        mode until watching ends).
         
         Returns:
             The process exit code.
         """
         if self._process is None:
             return -1
-        return await self._process.wait()
\ No newline at end of file
+        while True:
+            code = await self._process.wait()
+            if self._restarting is not None:
+                await self._restarting.wait()
+            elif self._watching is not None:
+                await self._watching.wait()
+            else:
+                return code
\ No newline at end of file
@@ -0,0 +1,69 @@
+import codecs
+from typing import List
+
+DEFAULT_MAX_LINE_LENGTH = 64 * 1024
+
+
+class LineDecoder:
+    """
+    Turns arbitrary chunks of process output into complete lines.
+
+    Chunks are decoded with an incremental UTF-8 decoder (a character split
+    across two reads is kept intact) and split in one `str.split` call each.
+    Lines longer than `max_line_length` characters are cut and end with a
+    truncation marker; the rest of such a line is counted, not buffered, so
+    a process printing megabytes without a newline uses bounded memory.
+    """
+
+    def __init__(self, max_line_length: int = DEFAULT_MAX_LINE_LENGTH):
+        if max_line_length < 1:
+            raise ValueError("max_line_length must be at least 1")
+        self._max = max_line_length
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+        # Characters of the unfinished line dropped past the limit
+        self._dropped = 0
+
+    def feed(self, data) -> List[str]:
+        """
+        Decode a chunk (bytes or a memoryview into a reused buffer).
+
+        Returns:
+            The lines completed by this chunk, without line endings.
+        """
+        text = self._decoder.decode(data)
+        if not text:
+            return []
+        lines = text.split("\n")
+        if self._partial:
+            lines[0] = self._partial + lines[0]
+        partial = lines.pop()
+        if lines:
+            # Only a chunk longer than the limit can contain an over-long line
+            if len(text) + len(self._partial) > self._max or self._dropped:
+                first = self._cap(lines[0], self._dropped)
+                lines = [first] + [self._cap(line, 0) for line in lines[1:]]
+                self._dropped = 0
+            lines = [line.rstrip() for line in lines]
+        if len(partial) > self._max:
+            self._dropped += len(partial) - self._max
+            partial = partial[:self._max]
+        self._partial = partial
+        return lines
+
+    def flush(self) -> List[str]:
+        """The unfinished last line (plus any bytes of an incomplete character), at end of output."""
+        text = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        dropped, self._dropped = self._dropped, 0
+        if not text and not dropped:
+            return []
+        return [self._cap(text, dropped).rstrip()]
+
+    def _cap(self, line: str, dropped: int) -> str:
+        if len(line) > self._max:
+            dropped += len(line) - self._max
+            line = line[:self._max]
+        if dropped:
+            return f"{line} [GATEWAY] ... {dropped} more characters truncated"
+        return line
@@ -0,0 +1,85 @@
+"""
+Output throughput benchmark for the gateway: lines per second from a process
+into the scrollback, through Gateway's chunked reader (readv into a reused
+buffer plus LineDecoder) and, for comparison, through the asyncio
+StreamReader.readline() loop it replaced.
+
+    python -m devgateway.gateway.output_benchmark [--lines N] [--runs N]
+
+The process is `cat` of a generated log file of ~60-byte lines; the best of
+`--runs` runs is reported. A final check streams a line longer than the
+line limit followed by a short one, which readline() can't get past.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from devgateway.gateway.gateway import DEFAULT_SCROLLBACK_BYTES, DEFAULT_SCROLLBACK_LINES, Gateway
+from devgateway.gateway.line_decoder import DEFAULT_MAX_LINE_LENGTH
+from devgateway.gateway.output_buffer import OutputBuffer, Source
+
+SOURCE = Source("stdout", 0.0)
+
+
+async def readline_loop(path: str, max_line_length: int) -> OutputBuffer:
+    """The reader before chunked decoding: one readline() and append per line."""
+    output = OutputBuffer(DEFAULT_SCROLLBACK_LINES, DEFAULT_SCROLLBACK_BYTES)
+    process = await asyncio.create_subprocess_exec(
+        "cat", path, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=max_line_length
+    )
+    count = 0
+    try:
+        while line := await process.stdout.readline():
+            output.append(line.decode("utf-8", errors="replace").rstrip(), SOURCE)
+            count += 1
+            if count % 256 == 0:
+                await asyncio.sleep(0)
+    except ValueError as e:
+        output.append(f"[readline] {e}", SOURCE)
+    await process.wait()
+    return output
+
+
+async def chunked_reader(path: str, max_line_length: int) -> OutputBuffer:
+    gateway = Gateway("benchmark", os.path.dirname(path), ["cat", path], max_line_length=max_line_length)
+    await gateway.run()
+    await gateway.wait()
+    await gateway.drain(timeout=60)
+    return gateway.output
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure gateway output throughput")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="lines in the log (default 1000000)")
+    parser.add_argument("--runs", type=int, default=3, help="runs per reader, best one counts (default 3)")
+    args = parser.parse_args()
+    readers = (("readline() loop", readline_loop), ("chunked reader", chunked_reader))
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "log")
+        with open(log, "w") as f:
+            for i in range(args.lines):
+                f.write(f"2026-10-18T12:00:00Z INFO request {i} handled in {i % 97} ms - ok\n")
+        for name, reader in readers:
+            best = 0.0
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                await reader(log, DEFAULT_MAX_LINE_LENGTH)
+                best = max(best, args.lines / (time.perf_counter() - started))
+            print(f"{name:<16} {best:>12,.0f} lines/s")
+
+        long_line = os.path.join(directory, "long")
+        with open(long_line, "w") as f:
+            f.write("x" * (DEFAULT_MAX_LINE_LENGTH * 3) + "\nafter\n")
+        for name, reader in readers:
+            output = await reader(long_line, DEFAULT_MAX_LINE_LENGTH)
+            batch = await output.read(output.first_seq, max_lines=output.next_seq - output.first_seq)
+            lines = batch.lines if batch else []
+            print(f"{name:<16} long line: {'ok' if 'after' in lines else 'output stopped'} "
+                  f"({[line if len(line) < 80 else '...' + line[-50:] for line in lines if line.startswith(('x', '[readline]'))]})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,219 @@
+import asyncio
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+
+class Source(NamedTuple):
+    """Where and when a run of entries came from (shared by the lines of one read)."""
+    stream: str
+    """"stdout", "stderr", "pty" (terminal chunks) or "gateway" (agent notices)."""
+    time: float
+    """time.monotonic() when the output was read or the event happened."""
+    event: str = "output"
+    """"output" for process output, otherwise the lifecycle event of a notice."""
+    process: Optional[str] = None
+    """Name of the supervised process, if there are several."""
+    fields: Optional[dict] = None
+    """Event details (e.g. exit code) passed on in the frame."""
+
+
+class OutputBatch(NamedTuple):
+    """A run of consecutive output lines."""
+    seq: int
+    lines: List[str]
+    dropped: int
+    """Lines skipped right before `seq` because they left the scrollback."""
+    sources: List[Source]
+    """The Source of each line in `lines`."""
+
+
+class OutputBuffer:
+    """
+    Bounded scrollback for a process's console output.
+
+    Keeps at most `max_lines` lines and `max_bytes` characters; the oldest
+    lines are evicted first. Every line gets a monotonically increasing
+    sequence number so readers can resume where they left off, and keeps
+    the Source it was appended with. Appending never blocks, no matter how
+    far behind a reader is.
+    """
+
+    def __init__(self, max_lines: int, max_bytes: int):
+        if max_lines < 1 or max_bytes < 1:
+            raise ValueError("OutputBuffer limits must be at least 1")
+        self._max_lines = max_lines
+        self._max_bytes = max_bytes
+        self._ring: List[Optional[str]] = [None] * max_lines
+        self._sources: List[Optional[Source]] = [None] * max_lines
+        self._first_seq = 0
+        self._next_seq = 0
+        self._size = 0
+        self._waiter: Optional[asyncio.Future] = None
+        self._closed = False
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest buffered line."""
+        return self._first_seq
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next appended line will get."""
+        return self._next_seq
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def append(self, line: str, source: Source) -> int:
+        """
+        Add a line to the scrollback and wake any readers.
+
+        Returns:
+            The sequence number of the line, or -1 if the buffer is closed.
+        """
+        if self._closed:
+            return -1
+        if len(line) > self._max_bytes:
+            line = line[:self._max_bytes]
+        seq = self._next_seq
+        if seq - self._first_seq == self._max_lines:
+            self._evict()
+        self._ring[seq % self._max_lines] = line
+        self._sources[seq % self._max_lines] = source
+        self._size += len(line)
+        self._next_seq = seq + 1
+        while self._size > self._max_bytes:
+            self._evict()
+        self._wake()
+        return seq
+
+    def extend(self, lines: List[str], source: Source) -> None:
+        """Add several lines from the same source at once, waking readers once."""
+        if self._closed or not lines:
+            return
+        max_lines, max_bytes, ring, sources = self._max_lines, self._max_bytes, self._ring, self._sources
+        seq = self._next_seq
+        for line in lines:
+            if len(line) > max_bytes:
+                line = line[:max_bytes]
+            if seq - self._first_seq == max_lines:
+                self._evict()
+            ring[seq % max_lines] = line
+            sources[seq % max_lines] = source
+            self._size += len(line)
+            seq += 1
+            self._next_seq = seq
+            while self._size > max_bytes:
+                self._evict()
+        self._wake()
+
+    def reopen(self) -> None:
+        """Accept lines again after `close()`, continuing the sequence numbers."""
+        self._closed = False
+
+    def close(self) -> None:
+        """Signal end of output; readers stop once they have drained the buffer."""
+        self._closed = True
+        self._wake()
+
+    async def read(self, cursor: int, max_lines: int = 256) -> Optional[OutputBatch]:
+        """
+        Wait for lines at or after `cursor`.
+
+        Args:
+            cursor: Sequence number of the first line wanted.
+            max_lines: Upper bound on the batch size.
+
+        Returns:
+            The next batch, or None once the buffer is closed and drained.
+        """
+        await self._wait_past(cursor)
+
+        dropped = 0
+        if cursor < self._first_seq:
+            dropped = self._first_seq - cursor
+            cursor = self._first_seq
+        end = min(self._next_seq, cursor + max_lines)
+        lines, sources = self._slice(cursor, end)
+        if not lines and not dropped:
+            return None
+        return OutputBatch(cursor, lines, dropped, sources)
+
+    async def read_coalesced(
+        self, cursor: int, max_bytes: int, max_latency: float, max_lines: int = 1024
+    ) -> Optional[OutputBatch]:
+        """
+        Like `read`, but keeps collecting lines for up to `max_latency`
+        seconds (or roughly `max_bytes` characters, or `max_lines` lines)
+        after the first one arrives, so callers can emit one write per batch
+        instead of per line.
+
+        Returns:
+            The next batch, or None once the buffer is closed and drained.
+        """
+        batch = await self.read(cursor)
+        if batch is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_latency
+        lines, sources = batch.lines, batch.sources
+        size = sum(len(line) for line in lines)
+        cursor = batch.seq + len(lines)
+        while size < max_bytes and len(lines) < max_lines and not self._closed:
+            if self._next_seq <= cursor:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wait_past(cursor), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if cursor < self._first_seq:
+                break
+            end = min(self._next_seq, cursor + max_lines - len(lines))
+            more, more_sources = self._slice(cursor, end)
+            cursor = end
+            lines.extend(more)
+            sources.extend(more_sources)
+            size += sum(len(line) for line in more)
+        return OutputBatch(batch.seq, lines, batch.dropped, sources)
+
+    async def lines(self, since: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Iterate over output lines until the buffer is closed.
+
+        Args:
+            since: Sequence number of the last line already seen. When
+                omitted, iteration starts at the oldest buffered line.
+        """
+        cursor = self._first_seq if since is None else since + 1
+        while (batch := await self.read(cursor)) is not None:
+            if batch.dropped:
+                yield f"[GATEWAY] {batch.dropped} lines dropped"
+            for line in batch.lines:
+                yield line
+            cursor = batch.seq + len(batch.lines)
+
+    async def _wait_past(self, cursor: int) -> None:
+        while self._next_seq <= cursor and not self._closed:
+            if self._waiter is None:
+                self._waiter = asyncio.get_running_loop().create_future()
+            await asyncio.shield(self._waiter)
+
+    def _slice(self, start: int, end: int) -> Tuple[List[str], List[Source]]:
+        indexes = [seq % self._max_lines for seq in range(start, end)]
+        return [self._ring[i] for i in indexes], [self._sources[i] for i in indexes]
+
+    def _evict(self) -> None:
+        index = self._first_seq % self._max_lines
+        self._size -= len(self._ring[index])
+        self._ring[index] = None
+        self._sources[index] = None
+        self._first_seq += 1
+
+    def _wake(self) -> None:
+        if self._waiter is not None:
+            if not self._waiter.done():
+                self._waiter.set_result(None)
+            self._waiter = None
@@ -0,0 +1,121 @@
+"""
+Start-up benchmark for the gateway agent: the time from launching the agent
+to the first output line of the process it runs, which is what a user waits
+for after starting a project.
+
+    python -B -m devgateway.gateway.startup_benchmark [--runs N] [--scan DIR ...] [-- AGENT COMMAND ...]
+
+The agent command defaults to this interpreter running devgateway.gateway.agent;
+compare launchers by passing one, e.g. `-- uv run python -m devgateway.gateway.agent`.
+
+Cold launches start the way a new container does: bytecode written by
+earlier launches (.pyc files under the scanned directories that weren't there
+when the benchmark started) is deleted first, and the page cache is dropped
+when allowed (root with a writable /proc/sys/vm/drop_caches). Bytecode that
+shipped with the image stays; -B keeps the benchmark's own imports from
+writing any. Warm launches reuse everything; the first one is discarded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import time
+from typing import List, Sequence, Set
+
+import devgateway
+
+MARKER = "gateway-startup-benchmark"
+DROP_CACHES = "/proc/sys/vm/drop_caches"
+
+
+def bytecode_files(directories: Sequence[str]) -> Set[str]:
+    return {
+        os.path.join(directory, name)
+        for top in directories
+        for directory, _, files in os.walk(top)
+        for name in files
+        if name.endswith(".pyc")
+    }
+
+
+def drop_page_cache() -> bool:
+    """Drop the kernel's page cache, if permitted."""
+    os.sync()
+    try:
+        with open(DROP_CACHES, "w") as f:
+            f.write("3\n")
+    except OSError:
+        return False
+    return True
+
+
+def launch(command: List[str], env: dict) -> float:
+    """Seconds from starting `command` until the agent prints the process's first line."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        for line in process.stdout:
+            if line.rstrip(b"\r\n") == MARKER.encode():
+                return time.perf_counter() - started
+        raise RuntimeError(f"Agent exited with code {process.wait()} before the process printed anything")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def summary(name: str, seconds: List[float]) -> str:
+    ms = sorted(s * 1000 for s in seconds)
+    p90 = ms[min(len(ms) - 1, round(0.9 * (len(ms) - 1)))]
+    return (
+        f"{name:<5} runs={len(ms):<3} median {statistics.median(ms):7.1f} ms   "
+        f"min {ms[0]:7.1f}   p90 {p90:7.1f}   max {ms[-1]:7.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the gateway agent's time to first process output")
+    parser.add_argument("--runs", type=int, default=10, help="launches per mode (default 10)")
+    parser.add_argument(
+        "--scan", action="append", default=[],
+        help="directory whose new bytecode cold launches delete (default: devgateway and site-packages)",
+    )
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="agent command (after --)")
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    command = command or [sys.executable, "-m", "devgateway.gateway.agent"]
+    scan = args.scan or [os.path.dirname(devgateway.__file__), sysconfig.get_path("purelib")]
+    shipped = bytecode_files(scan)
+
+    with tempfile.TemporaryDirectory() as working_dir:
+        env = {
+            **os.environ,
+            "GATEWAY_PROJECT_ID": "benchmark",
+            "GATEWAY_WORKING_DIR": working_dir,
+            "GATEWAY_COMMAND": json.dumps(["echo", MARKER]),
+            "GATEWAY_OUTPUT_FORMAT": "text",
+        }
+        print(f"Agent command: {' '.join(command)}")
+
+        cold, dropped = [], True
+        for _ in range(args.runs):
+            for path in bytecode_files(scan) - shipped:
+                os.unlink(path)
+            dropped = drop_page_cache() and dropped
+            cold.append(launch(command, env))
+
+        launch(command, env)
+        warm = [launch(command, env) for _ in range(args.runs)]
+
+    print(summary("cold", cold) + ("" if dropped else "   (page cache not dropped: needs root)"))
+    print(summary("warm", warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+import asyncio
+import json
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+from devgateway.gateway.frames import event
+from devgateway.gateway.gateway import (
+    DEFAULT_COLUMNS,
+    DEFAULT_ROWS,
+    DEFAULT_SCROLLBACK_BYTES,
+    DEFAULT_SCROLLBACK_LINES,
+    Gateway,
+    GatewayState,
+)
+from devgateway.gateway.line_decoder import DEFAULT_MAX_LINE_LENGTH
+from devgateway.gateway.output_buffer import OutputBuffer
+
+if TYPE_CHECKING:
+    from devgateway.gateway.watcher import FileWatcher
+
+
+class RestartPolicy(str, Enum):
+    NEVER = "never"
+    ON_FAILURE = "on-failure"
+    """Restart when the process exits with a non-zero code."""
+    ALWAYS = "always"
+
+
+class Condition(str, Enum):
+    """What a process waits for in a dependency before starting."""
+    STARTED = "started"
+    COMPLETED = "completed"
+    """The dependency exited with code 0 (e.g. an install or build step)."""
+
+
+class ProcessState(str, Enum):
+    WAITING = "waiting"
+    """Waiting for its dependencies."""
+    RUNNING = "running"
+    BACKOFF = "backoff"
+    """Exited; restarting after a delay."""
+    COMPLETED = "completed"
+    """Exited with code 0 and not restarted."""
+    FAILED = "failed"
+    """Exited with an error (or a dependency failed) and not restarted."""
+    STOPPED = "stopped"
+
+
+class ProcessSpec(NamedTuple):
+    """A named process of a multi-process project (one GATEWAY_PROCESSES entry)."""
+    name: str
+    command: List[str]
+    working_directory: Optional[str] = None
+    env: Dict[str, str] = {}
+    depends_on: Dict[str, Condition] = {}
+    restart: RestartPolicy = RestartPolicy.ON_FAILURE
+    watch: bool = False
+    """Restart when files in its working directory change (see Supervisor.watch)."""
+
+
+def parse_processes(text: str) -> List[ProcessSpec]:
+    """
+    Parse GATEWAY_PROCESSES: a JSON list of
+    {"name", "command", "working_directory"?, "env"?, "depends_on"?, "restart"?, "watch"?}.
+    `depends_on` is a list of names (wait until they started) or an object
+    mapping names to "started" or "completed".
+
+    Raises:
+        ValueError: If the configuration is malformed, names repeat,
+            a dependency is unknown or dependencies form a cycle.
+    """
+    try:
+        entries = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"GATEWAY_PROCESSES is not valid JSON: {e}")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("GATEWAY_PROCESSES must be a non-empty list")
+
+    specs: List[ProcessSpec] = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("name"):
+            raise ValueError("Every process needs a name")
+        name = str(entry["name"])
+        command = entry.get("command")
+        if isinstance(command, str):
+            command = command.split()
+        if not command:
+            raise ValueError(f"Process {name} has no command")
+        depends_on = entry.get("depends_on") or {}
+        if isinstance(depends_on, list):
+            depends_on = {dependency: Condition.STARTED for dependency in depends_on}
+        try:
+            specs.append(ProcessSpec(
+                name,
+                [str(part) for part in command],
+                entry.get("working_directory"),
+                {str(k): str(v) for k, v in (entry.get("env") or {}).items()},
+                {str(k): Condition(v) for k, v in depends_on.items()},
+                RestartPolicy(entry.get("restart", RestartPolicy.ON_FAILURE.value)),
+                bool(entry.get("watch", False)),
+            ))
+        except (AttributeError, ValueError) as e:
+            raise ValueError(f"Invalid configuration for process {name}: {e}")
+
+    names = {spec.name for spec in specs}
+    if len(names) != len(specs):
+        raise ValueError("Process names must be unique")
+    for spec in specs:
+        unknown = set(spec.depends_on) - names
+        if unknown:
+            raise ValueError(f"Process {spec.name} depends on unknown processes: {', '.join(sorted(unknown))}")
+
+    # Cycles would leave processes waiting forever
+    dependencies = {spec.name: set(spec.depends_on) for spec in specs}
+    while dependencies:
+        ready = [name for name, pending in dependencies.items() if not pending]
+        if not ready:
+            raise ValueError(f"Dependency cycle between processes: {', '.join(sorted(dependencies))}")
+        for name in ready:
+            del dependencies[name]
+        for pending in dependencies.values():
+            pending.difference_update(ready)
+    return specs
+
+
+class SupervisedProcess:
+    """A process's Gateway plus its supervision state."""
+
+    def __init__(self, spec: ProcessSpec, gateway: Gateway):
+        self.spec = spec
+        self.gateway = gateway
+        self.state = ProcessState.WAITING
+        self.started = False
+        self.restarts = 0
+        self.exit_code: Optional[int] = None
+        self.retry_in: Optional[float] = None
+        # Consecutive quick crashes, the backoff exponent
+        self.crashes = 0
+        # Set by Supervisor.restart to cut a backoff delay short
+        self.restart_now = False
+        # Number of state changes so far
+        self.transitions = 0
+
+    def status(self) -> dict:
+        return {
+            "state": self.state.value,
+            "pid": self.gateway.pid if self.state == ProcessState.RUNNING else None,
+            "restarts": self.restarts,
+            "exit_code": self.exit_code,
+            "retry_in": self.retry_in,
+        }
+
+
+class Supervisor:
+    """
+    Runs the named processes of a multi-service project side by side in one
+    agent, so a project with several repos doesn't need a container per
+    service.
+
+    Each process gets its own Gateway; they all write to one shared
+    scrollback, so output keeps its order across processes, and every entry
+    is tagged with its process name. A process starts once its dependencies
+    have started (or completed, for "completed" dependencies). Crashed
+    processes are restarted per their RestartPolicy, after an exponential
+    backoff that resets once a run lasted `stable_seconds`. Every state
+    change is published as a "process" notice carrying the process status.
+
+    Offers the same run/wait/notice/send_input/send_signal/restart/resize
+    interface as Gateway, so the agent can drive either.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        working_directory: str,
+        specs: List[ProcessSpec],
+        scrollback_lines: int = DEFAULT_SCROLLBACK_LINES,
+        scrollback_bytes: int = DEFAULT_SCROLLBACK_BYTES,
+        pty: bool = False,
+        columns: int = DEFAULT_COLUMNS,
+        rows: int = DEFAULT_ROWS,
+        max_line_length: int = DEFAULT_MAX_LINE_LENGTH,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        stable_seconds: float = 10.0,
+    ):
+        self.project_id = project_id
+        self.pty = pty
+        self._output = OutputBuffer(scrollback_lines, scrollback_bytes)
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        self._stable_seconds = stable_seconds
+        self._processes: Dict[str, SupervisedProcess] = {}
+        for spec in specs:
+            gateway = Gateway(
+                project_id,
+                spec.working_directory or working_directory,
+                spec.command,
+                pty=pty,
+                columns=columns,
+                rows=rows,
+                max_line_length=max_line_length,
+                name=spec.name,
+                env=spec.env,
+                output=self._output,
+            )
+            self._processes[spec.name] = SupervisedProcess(spec, gateway)
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._watching = False
+        # Replaced on every state change; waiters hold on to the one they saw
+        self._changed = asyncio.Event()
+
+    @property
+    def output(self) -> OutputBuffer:
+        """Shared scrollback of all processes."""
+        return self._output
+
+    def process(self, name: Optional[str] = None) -> Gateway:
+        """
+        The Gateway of process `name`, or of the first configured process.
+
+        Raises:
+            KeyError: If there is no such process.
+        """
+        if name is None:
+            return next(iter(self._processes.values())).gateway
+        return self._processes[name].gateway
+
+    @property
+    def watch_roots(self) -> List[str]:
+        """Working directories of the processes that restart on file changes."""
+        return sorted({process.gateway.working_directory for process in self._processes.values() if process.spec.watch})
+    
+    def status(self) -> Dict[str, dict]:
+        return {name: process.status() for name, process in self._processes.items()}
+
+    def notice(self, message: str, event_name: str = "notice", **fields) -> None:
+        """Add an agent-level status message (not about one process) to the output."""
+        if self.pty:
+            message = f"\r\n{message}\r\n"
+        self._output.append(message, event(event_name, **fields))
+
+    async def run(self) -> None:
+        """Start supervising; processes start as their dependencies allow."""
+        self._tasks = [asyncio.create_task(self._supervise(process)) for process in self._processes.values()]
+
+    async def wait(self) -> int:
+        """
+        Wait until no process is running or due to restart (in watch mode,
+        until watching ends).
+
+        Returns:
+            0 if every process completed, else the exit code of the first
+            one that failed (1 if it never ran).
+        """
+        # `restart` may add tasks for processes that had already ended
+        while True:
+            changed = self._changed
+            if not all(task.done() for task in self._tasks):
+                await asyncio.wait(self._tasks)
+            elif self._watching and not self._stopping:
+                await changed.wait()
+            else:
+                break
+        self._output.close()
+        for process in self._processes.values():
+            if process.state == ProcessState.FAILED:
+                return process.exit_code or 1
+        return 0
+
+    async def shutdown(self) -> None:
+        """Stop every process and cancel pending restarts."""
+        self._stopping = True
+        self._notify()
+        await asyncio.gather(*(
+            process.gateway.shutdown() for process in self._processes.values()
+            if process.gateway.state in (GatewayState.RUNNING, GatewayState.PAUSED)
+        ))
+        await asyncio.gather(*self._tasks)
+
+    async def send_input(self, input_text: str, newline: bool = True, process: Optional[str] = None) -> None:
+        """Send input to process `process` (by default the first one)."""
+        await self.process(process).send_input(input_text, newline)
+
+    def send_signal(self, signum: int, process: Optional[str] = None) -> None:
+        """Send a signal to process `process` (by default the first one)."""
+        self.process(process).send_signal(signum)
+    
+    async def restart(self, name: Optional[str] = None) -> None:
+        """
+        Restart process `name` (by default the first one) right away: a
+        running process is replaced, one waiting out a backoff delay is
+        started now and one that ended is started again.
+        
+        Raises:
+            KeyError: If there is no such process.
+            RuntimeError: If it hasn't started yet or the agent is stopping.
+        """
+        process = self._processes[name] if name is not None else next(iter(self._processes.values()))
+        if self._stopping:
+            raise RuntimeError("Processes are being stopped")
+        if process.state == ProcessState.WAITING:
+            raise RuntimeError(f"{process.spec.name} is waiting for its dependencies")
+        process.restarts += 1
+        process.crashes = 0
+        if process.state == ProcessState.RUNNING:
+            await process.gateway.restart()
+            self._set_state(
+                process, ProcessState.RUNNING,
+                f"[GATEWAY] {process.spec.name} restarted with PID {process.gateway.pid}",
+            )
+        elif process.state == ProcessState.BACKOFF:
+            process.restart_now = True
+            self._notify()
+        else:
+            self._tasks.append(asyncio.create_task(self._supervise(process)))
+            self._notify()
+    
+    async def watch(self, watcher: "FileWatcher") -> None:
+        """
+        Watch mode: restart the processes configured with "watch" whenever
+        `watcher` reports changed files in their working directory,
+        including ones that crashed or completed, and report each reload
+        with its change-to-restart latency. Runs until cancelled.
+        """
+        self._watching = True
+        try:
+            async for change in watcher.changes():
+                for process in self._processes.values():
+                    root = process.gateway.working_directory.rstrip("/")
+                    paths = [path for path in change.paths if path == root or path.startswith(root + "/")]
+                    if not process.spec.watch or not paths or process.state == ProcessState.WAITING:
+                        continue
+                    started = time.monotonic()
+                    transitions = process.transitions
+                    try:
+                        await self.restart(process.spec.name)
+                    except RuntimeError as e:
+                        process.gateway.notice(f"[GATEWAY] Not restarting {process.spec.name}: {e}", "error")
+                        continue
+                    # Processes that had ended or were backing off start in their own task
+                    try:
+                        async with asyncio.timeout(10):
+                            while process.transitions == transitions:
+                                await self._changed.wait()
+                    except TimeoutError:
+                        pass
+                    if process.state == ProcessState.RUNNING:
+                        process.gateway.notice_reload(change._replace(paths=paths), root, started)
+        finally:
+            self._watching = False
+            self._notify()
+    
+    def resize(self, columns: int, rows: int) -> None:
+        for process in self._processes.values():
+            process.gateway.resize(columns, rows)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _set_state(self, process: SupervisedProcess, state: ProcessState, message: str) -> None:
+        process.state = state
+        process.transitions += 1
+        process.gateway.notice(message, "process", **process.status())
+        self._notify()
+
+    async def _supervise(self, process: SupervisedProcess) -> None:
+        name = process.spec.name
+        failed = await self._wait_for_dependencies(process)
+        if failed:
+            self._set_state(process, ProcessState.FAILED, f"[GATEWAY] Not starting {name}: {failed}")
+            return
+        if self._stopping:
+            self._set_state(process, ProcessState.STOPPED, f"[GATEWAY] {name} stopped")
+            return
+
+        while True:
+            gateway = process.gateway
+            started_at = time.monotonic()
+            try:
+                if gateway.state == GatewayState.PENDING:
+                    # First run, or the last restart failed to spawn
+                    await gateway.run()
+                else:
+                    await gateway.restart()
+            except Exception as e:
+                gateway.notice(f"[GATEWAY] Error starting {name}: {e}", "error")
+                process.exit_code = None
+            else:
+                process.started = True
+                process.retry_in = None
+                self._set_state(process, ProcessState.RUNNING, f"[GATEWAY] {name} running with PID {gateway.pid}")
+                process.exit_code = await gateway.wait()
+                await gateway.drain()
+
+            if self._stopping:
+                self._set_state(process, ProcessState.STOPPED, f"[GATEWAY] {name} stopped")
+                return
+            code = process.exit_code
+            policy = process.spec.restart
+            if policy == RestartPolicy.NEVER or (policy == RestartPolicy.ON_FAILURE and code == 0):
+                if code == 0:
+                    self._set_state(process, ProcessState.COMPLETED, f"[GATEWAY] {name} completed")
+                elif code is None:
+                    self._set_state(process, ProcessState.FAILED, f"[GATEWAY] {name} could not be started")
+                else:
+                    self._set_state(process, ProcessState.FAILED, f"[GATEWAY] {name} failed with code {code}")
+                return
+
+            if time.monotonic() - started_at >= self._stable_seconds:
+                process.crashes = 0
+            process.retry_in = min(self._backoff_max, self._backoff_initial * 2 ** process.crashes)
+            process.crashes += 1
+            process.restarts += 1
+            self._set_state(
+                process,
+                ProcessState.BACKOFF,
+                f"[GATEWAY] {name} {'exited with code ' + str(code) if code is not None else 'could not be started'}, "
+                f"restarting in {process.retry_in:g}s",
+            )
+            changed = self._changed
+            deadline = time.monotonic() + process.retry_in
+            while not self._stopping and not process.restart_now and (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                changed = self._changed
+            process.restart_now = False
+            if self._stopping:
+                self._set_state(process, ProcessState.STOPPED, f"[GATEWAY] {name} stopped")
+                return
+
+    async def _wait_for_dependencies(self, process: SupervisedProcess) -> Optional[str]:
+        """Wait until the dependencies are met; returns why they never will be, if so."""
+        while not self._stopping:
+            changed = self._changed
+            waiting = False
+            for name, condition in process.spec.depends_on.items():
+                dependency = self._processes[name]
+                if condition == Condition.COMPLETED:
+                    if dependency.state in (ProcessState.FAILED, ProcessState.STOPPED):
+                        return f"{name} did not complete"
+                    waiting |= dependency.state != ProcessState.COMPLETED
+                elif not dependency.started:
+                    if dependency.state in (ProcessState.FAILED, ProcessState.STOPPED):
+                        return f"{name} did not start"
+                    waiting = True
+            if not waiting:
+                return None
+            await changed.wait()
+        return None
@@ -0,0 +1,238 @@
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import json
+import os
+import re
+import struct
+import time
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Sequence
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Saving a file ends with a close (or a rename, for editors that write a
+# temporary file first); IN_MODIFY would fire for every write in between
+WATCH_MASK = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")
+
+DEFAULT_IGNORE = (
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", ".mypy_cache", ".pytest_cache",
+    "*.pyc", "*.swp", "*.swx", "*~", ".#*", "*.log",
+)
+DEFAULT_DEBOUNCE = 0.2
+
+
+class WatchOptions(NamedTuple):
+    """File watching configuration (GATEWAY_WATCH)."""
+    ignore: Sequence[str] = DEFAULT_IGNORE
+    debounce: float = DEFAULT_DEBOUNCE
+    """Seconds without further changes before a burst counts as done."""
+
+
+def parse_watch_options(text: str) -> Optional[WatchOptions]:
+    """
+    Parse GATEWAY_WATCH: empty or "0" (off), "1" (defaults), or a JSON object
+    {"ignore": [pattern, ...], "debounce_ms": n}. Ignore patterns are added
+    to DEFAULT_IGNORE.
+
+    Raises:
+        ValueError: If the configuration is malformed.
+    """
+    text = text.strip()
+    if text in ("", "0", "false"):
+        return None
+    if text in ("1", "true"):
+        return WatchOptions()
+    try:
+        options = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"GATEWAY_WATCH is not valid JSON: {e}")
+    if not isinstance(options, dict):
+        raise ValueError("GATEWAY_WATCH must be 1 or a JSON object")
+    ignore = options.get("ignore") or []
+    if not isinstance(ignore, list):
+        raise ValueError("GATEWAY_WATCH ignore must be a list of patterns")
+    try:
+        debounce = float(options.get("debounce_ms", DEFAULT_DEBOUNCE * 1000)) / 1000
+    except (TypeError, ValueError):
+        raise ValueError("GATEWAY_WATCH debounce_ms must be a number")
+    return WatchOptions((*DEFAULT_IGNORE, *(str(pattern) for pattern in ignore)), max(debounce, 0.0))
+
+
+class Change(NamedTuple):
+    """A debounced burst of file changes."""
+    paths: List[str]
+    """Changed files (absolute paths, sorted)."""
+    time: float
+    """time.monotonic() when the first change of the burst was read."""
+
+
+class FileWatcher:
+    """
+    Recursive file watcher for the project directories, using Linux
+    inotify through ctypes (no dependencies, no polling).
+
+    Directories matching an ignore pattern aren't watched at all, so large
+    trees like node_modules cost nothing; files matching one are skipped.
+    Patterns are matched against every path component (fnmatch style, e.g.
+    "node_modules" or "*.log"), or against the whole path relative to the
+    watched directory when they contain a slash ("build/cache").
+
+    Changes are collected into bursts: `changes()` yields once no further
+    change arrived for `debounce` seconds (or a burst has lasted 10x that),
+    so a save-all or a git checkout restarts the project once.
+    """
+
+    def __init__(self, roots: Sequence[str], options: WatchOptions = WatchOptions()):
+        self._roots = [os.path.abspath(root) for root in roots]
+        self._debounce = options.debounce
+        component_patterns = [p for p in options.ignore if "/" not in p]
+        path_patterns = [p.strip("/") for p in options.ignore if "/" in p]
+        self._ignore_component = re.compile("|".join(map(fnmatch.translate, component_patterns)) or "(?!)")
+        self._ignore_path = re.compile("|".join(map(fnmatch.translate, path_patterns)) or "(?!)")
+        self._fd: Optional[int] = None
+        self._watches: Dict[int, str] = {}
+        self._pending: Dict[str, None] = {}
+        self._first_change: Optional[float] = None
+        self._changed = asyncio.Event()
+        self._buffer = bytearray(64 * 1024)
+        self.limit_reached = False
+
+    @property
+    def watched_directories(self) -> int:
+        return len(self._watches)
+
+    def start(self) -> None:
+        """
+        Start watching (the initial scan happens here).
+
+        Raises:
+            OSError: If inotify isn't available.
+        """
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1 failed: {os.strerror(code)}")
+        self._fd = fd
+        for root in self._roots:
+            self._add_tree(root)
+        asyncio.get_running_loop().add_reader(fd, self._read_events)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+
+    async def changes(self) -> AsyncIterator[Change]:
+        """Yield each debounced burst of changes until closed."""
+        while self._fd is not None:
+            changed = self._changed
+            await changed.wait()
+            deadline = self._first_change + self._debounce * 10
+            while True:
+                self._changed = changed = asyncio.Event()
+                timeout = min(self._debounce, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            paths, first = sorted(self._pending), self._first_change
+            self._pending = {}
+            self._first_change = None
+            yield Change(paths, first)
+
+    def _ignored(self, path: str, root: str) -> bool:
+        relative = os.path.relpath(path, root)
+        if relative == ".":
+            return False
+        return (
+            any(self._ignore_component.match(part) for part in relative.split(os.sep))
+            or self._ignore_path.match(relative) is not None
+        )
+
+    def _root_of(self, path: str) -> str:
+        return next((root for root in self._roots if path == root or path.startswith(root + os.sep)), path)
+
+    def _add_tree(self, top: str, report: bool = False) -> None:
+        """Watch `top` and every directory below it; with `report`, count the files found as changed."""
+        root = self._root_of(top)
+        for directory, subdirectories, files in os.walk(top):
+            if not self._add_watch(directory):
+                return
+            subdirectories[:] = [
+                name for name in subdirectories if not self._ignored(os.path.join(directory, name), root)
+            ]
+            if report:
+                for name in files:
+                    self._change(os.path.join(directory, name), root)
+
+    def _add_watch(self, directory: str) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+            return True
+        code = ctypes.get_errno()
+        if code == errno.ENOSPC:
+            # fs.inotify.max_user_watches; changes deeper down go unnoticed
+            self.limit_reached = True
+            return False
+        return True  # Vanished or unreadable; skip it
+
+    def _change(self, path: str, root: str) -> None:
+        if self._ignored(path, root):
+            return
+        if self._first_change is None:
+            self._first_change = time.monotonic()
+        self._pending[path] = None
+        self._changed.set()
+
+    def _read_events(self) -> None:
+        try:
+            size = os.readv(self._fd, [self._buffer])
+        except BlockingIOError:
+            return
+        data = memoryview(self._buffer)[:size]
+        offset = 0
+        while offset + EVENT_HEADER.size <= size:
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = bytes(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]).rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; report the roots as changed
+                for root in self._roots:
+                    self._change(root, root)
+                continue
+            directory = self._watches.get(wd)
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            root = self._root_of(directory)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not self._ignored(path, root):
+                    # Files may have been created before the watch was in place
+                    self._add_tree(path, report=True)
+                    self._change(path, root)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._change(path, root)
+                continue
+            self._change(path, root)
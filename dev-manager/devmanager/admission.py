@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from devmanager.config import settings
+from devmanager.engine import DockerEngine, DockerEngineError
+from devmanager.gateway.gateway import ResourceLimits
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a gateway can't be admitted now or later (queue full, too large)."""
+
+
+class AdmissionScheduler:
+    """
+    Tracks the CPU and memory committed to gateways against the host's
+    capacity and decides when a gateway may start.
+
+    Starts that fit are admitted immediately. Others wait in a FIFO queue
+    (strictly in order, so large requests aren't starved by small ones) until
+    enough committed capacity is released, and are rejected once the queue is
+    full. Capacity comes from `host_cpus`/`host_memory_mb` or, when those are
+    0, from the Docker host, scaled by the overcommit ratios.
+    """
+
+    def __init__(self, engine: DockerEngine):
+        self._engine = engine
+        self._committed: Dict[str, ResourceLimits] = {}
+        # Insertion-ordered: the head of the queue is admitted first
+        self._queue: Dict[str, Tuple[ResourceLimits, asyncio.Future]] = {}
+        self.cpu_capacity: Optional[float] = None
+        self.memory_capacity_mb: Optional[int] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """Determines host capacity. Without it every start is admitted."""
+        cpus, memory_mb = settings.host_cpus, settings.host_memory_mb
+        if not cpus or not memory_mb:
+            try:
+                info = await self._engine.info()
+                cpus = cpus or info.get("NCPU", 0)
+                memory_mb = memory_mb or info.get("MemTotal", 0) // (1024 * 1024)
+            except DockerEngineError as e:
+                logger.warning("Failed to read Docker host capacity, admission control disabled: %s", e)
+        self.cpu_capacity = cpus * settings.cpu_overcommit_ratio if cpus else None
+        self.memory_capacity_mb = int(memory_mb * settings.memory_overcommit_ratio) if memory_mb else None
+
+    @property
+    def running(self) -> int:
+        """Number of gateways holding committed capacity."""
+        return len(self._committed)
+
+    @property
+    def committed_cpus(self) -> float:
+        return sum(limits.cpus for limits in self._committed.values())
+
+    @property
+    def committed_memory_mb(self) -> int:
+        return sum(limits.memory_mb for limits in self._committed.values())
+
+    def _fits(self, limits: ResourceLimits, committed_cpus: float = 0.0, committed_memory_mb: int = 0) -> bool:
+        if self.cpu_capacity is not None and committed_cpus + limits.cpus > self.cpu_capacity:
+            return False
+        if self.memory_capacity_mb is not None and committed_memory_mb + limits.memory_mb > self.memory_capacity_mb:
+            return False
+        return True
+
+    def would_admit(self, limits: ResourceLimits) -> bool:
+        """Whether a start with these limits would be admitted right now."""
+        return not self._queue and self._fits(limits, self.committed_cpus, self.committed_memory_mb)
+
+    def reserve(self, project_id: str, limits: ResourceLimits) -> Optional[asyncio.Future]:
+        """
+        Asks for capacity to start a gateway.
+
+        Returns:
+            None if the gateway is admitted right away, otherwise a future that
+            resolves once it is (cancelled if `release` is called first).
+
+        Raises:
+            AdmissionRejected: If the gateway could never fit or the queue is full.
+        """
+        if project_id in self._committed:
+            return None
+        if not self._fits(limits):
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Requested resources ({limits.cpus:g} CPUs, {limits.memory_mb} MB) exceed host capacity"
+            )
+        if self.would_admit(limits):
+            self.commit(project_id, limits)
+            return None
+        if len(self._queue) >= settings.admission_queue_size:
+            self.rejected += 1
+            raise AdmissionRejected("Host is at capacity and the start queue is full")
+        future = asyncio.get_running_loop().create_future()
+        self._queue[project_id] = (limits, future)
+        self.queued += 1
+        return future
+
+    def commit(self, project_id: str, limits: ResourceLimits) -> None:
+        """
+        Counts a gateway's limits as committed, regardless of capacity (used for
+        admitted starts and for containers adopted or restarted outside the queue).
+        """
+        if project_id not in self._committed:
+            self._committed[project_id] = limits
+            self.admitted += 1
+
+    def release(self, project_id: str) -> None:
+        """Frees a gateway's committed capacity (or its queue slot) and admits waiting starts."""
+        queued = self._queue.pop(project_id, None)
+        if queued:
+            queued[1].cancel()
+        self._committed.pop(project_id, None)
+        self._drain()
+
+    def _drain(self) -> None:
+        while self._queue:
+            project_id, (limits, future) = next(iter(self._queue.items()))
+            if not self._fits(limits, self.committed_cpus, self.committed_memory_mb):
+                return
+            del self._queue[project_id]
+            self.commit(project_id, limits)
+            if not future.done():
+                future.set_result(None)
+
+    def queue_position(self, project_id: str) -> Optional[int]:
+        """1-based position of a waiting start, or None if it isn't queued."""
+        for position, queued_id in enumerate(self._queue, 1):
+            if queued_id == project_id:
+                return position
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "cpu_capacity": self.cpu_capacity,
+            "memory_capacity_mb": self.memory_capacity_mb,
+            "committed_cpus": self.committed_cpus,
+            "committed_memory_mb": self.committed_memory_mb,
+            "running": self.running,
+            "queue": list(self._queue),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
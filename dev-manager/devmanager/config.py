@@ -1,15 +1,71 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List
 import os
 
 class Settings(BaseSettings):
     """Gateway Manager configuration."""
     
+    model_config = SettingsConfigDict(env_file=".env")
+    
     internal_api_token: str = "dev-secret-token"
     gateway_http_port: int = 8080
     gateway_image: str = "dev-gateway:latest"
     storage_path: str = os.path.join(os.getcwd(), "storage")
-    
-    class Config:
-        env_file = ".env"
+    # SQLite database for gateway records and events; empty = <storage_path>/devmanager.db
+    state_db_path: str = ""
+    docker_host: str = "unix:///var/run/docker.sock"
+    # Several Docker endpoints to spread gateways over (JSON list); empty = docker_host only
+    docker_hosts: List[str] = []
+    placement_candidates: int = 2
+    docker_max_connections: int = 64
+    docker_max_idle_connections: int = 16
+    console_buffer_lines: int = 10000
+    console_buffer_bytes: int = 8 * 1024 * 1024
+    console_batch_latency_ms: int = 16
+    console_batch_max_bytes: int = 64 * 1024
+    console_per_message_deflate: bool = True
+    gateway_output_batch_ms: int = 16
+    # Per-gateway output rate limit (0 = unlimited); policy: drop, sample or backpressure
+    output_rate_lines: float = 0.0
+    output_rate_bytes: float = 0.0
+    output_burst_seconds: float = 2.0
+    output_policy: str = "drop"
+    output_sample_every: int = 100
+    output_collapse_repeats: bool = False
+    # On-disk output history under <storage_path>/logs; retention applies per gateway
+    log_archive_enabled: bool = True
+    log_segment_bytes: int = 16 * 1024 * 1024
+    log_block_bytes: int = 64 * 1024
+    log_flush_seconds: float = 1.0
+    log_retention_bytes: int = 256 * 1024 * 1024
+    log_retention_hours: float = 7 * 24
+    # Searches stop (returning what they found so far) after this long
+    log_search_timeout_seconds: float = 2.0
+    # Standby agent containers kept per host for fast starts (0 = no pool)
+    gateway_pool_size: int = 0
+    # Port of the agent's control endpoint (signals, restarts, status) in gateway
+    # containers, published on an ephemeral host port when set (e.g. 7070);
+    # 0 = off, Docker operations only
+    gateway_control_port: int = 0
+    bulk_concurrency: int = 16
+    bulk_timeout_seconds: float = 60.0
+    shutdown_concurrency: int = 32
+    shutdown_deadline_seconds: float = 20.0
+    # Auto-pause gateways idle this long (0 = never; enable per project with
+    # PUT /gateways/{project_id}/idle-policy)
+    idle_pause_minutes: float = 0.0
+    idle_check_interval_seconds: float = 30.0
+    # Default cgroup limits per gateway container (0 = unlimited). Admission
+    # control only counts CPUs and memory, so it stays idle until they're set
+    gateway_cpus: float = 0.0
+    gateway_cpu_shares: int = 0
+    gateway_memory_mb: int = 0
+    gateway_pids_limit: int = 0
+    # Admission capacity; 0 = detect from the Docker host
+    host_cpus: float = 0.0
+    host_memory_mb: int = 0
+    cpu_overcommit_ratio: float = 1.0
+    memory_overcommit_ratio: float = 1.0
+    admission_queue_size: int = 32
 
 settings = Settings()
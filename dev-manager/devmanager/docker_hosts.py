@@ -0,0 +1,96 @@
+import hashlib
+from bisect import bisect
+from typing import Callable, Dict, List, Optional, Tuple
+
+from devmanager.admission import AdmissionScheduler
+from devmanager.config import settings
+from devmanager.engine import DockerEngine
+from devmanager.gateway.docker_events import DockerEventMonitor
+from devmanager.gateway.log_multiplexer import LogMultiplexer
+from devmanager.gateway_pool import GatewayPool
+
+
+class DockerHost:
+    """
+    One Docker endpoint and everything the manager runs against it: the
+    engine client, log multiplexer, event monitor, warm pool and admission
+    scheduler. Gateways are pinned to the host they were placed on.
+    """
+
+    def __init__(self, engine: DockerEngine, on_event: Callable[["DockerHost", dict], None]):
+        self.engine = engine
+        self.url = engine.url
+        self.logs = LogMultiplexer(engine)
+        self.events = DockerEventMonitor(engine, lambda event: on_event(self, event))
+        self.pool = GatewayPool(engine, settings.gateway_pool_size)
+        self.admission = AdmissionScheduler(engine)
+        # Draining hosts get no new gateways
+        self.draining = False
+
+    async def start(self) -> None:
+        await self.admission.start()
+        self.events.start()
+
+    @property
+    def load(self) -> float:
+        """Fraction of the host's capacity committed (gateway count if capacity is unknown)."""
+        admission = self.admission
+        fractions = []
+        if admission.cpu_capacity:
+            fractions.append(admission.committed_cpus / admission.cpu_capacity)
+        if admission.memory_capacity_mb:
+            fractions.append(admission.committed_memory_mb / admission.memory_capacity_mb)
+        return max(fractions) if fractions else float(admission.running)
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "draining": self.draining,
+            "load": self.load,
+            "events_connected": self.events.connected,
+            "log_streams": self.logs.active_streams,
+            "pool": self.pool.stats(),
+            "admission": self.admission.stats(),
+        }
+
+    async def close(self) -> None:
+        await self.pool.close()
+        await self.events.close()
+        await self.logs.close()
+        await self.engine.close()
+
+
+class HashRing:
+    """
+    Consistent hash ring over host URLs with virtual nodes, so adding or
+    removing a host only changes the preferred host of ~1/N of the projects.
+    """
+
+    def __init__(self, virtual_nodes: int = 64):
+        self._virtual_nodes = virtual_nodes
+        self._points: List[Tuple[int, str]] = []
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def add(self, node: str) -> None:
+        self._points.extend((self._hash(f"{node}#{i}"), node) for i in range(self._virtual_nodes))
+        self._points.sort()
+
+    def remove(self, node: str) -> None:
+        self._points = [point for point in self._points if point[1] != node]
+
+    def preferred(self, key: str, count: int, exclude: Optional[set] = None) -> List[str]:
+        """The first `count` distinct nodes clockwise from `key`'s position."""
+        if not self._points:
+            return []
+        nodes: List[str] = []
+        start = bisect(self._points, (self._hash(key), ""))
+        for i in range(len(self._points)):
+            node = self._points[(start + i) % len(self._points)][1]
+            if node not in nodes and (not exclude or node not in exclude):
+                nodes.append(node)
+                if len(nodes) == count:
+                    break
+        return nodes
@@ -0,0 +1,3 @@
+from devmanager.engine.client import DockerEngine, DockerEngineError
+
+__all__ = ["DockerEngine", "DockerEngineError"]
\ No newline at end of file
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from devmanager.config import settings
+from devmanager.engine.http import HTTPConnectionPool, HTTPError, HTTPResponse
+from devmanager.metrics import Histogram, docker_api_seconds
+
+
+class DockerEngineError(Exception):
+    """Raised when the Docker Engine API returns an error or cannot be reached."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class DockerEngine:
+    """
+    Asyncio-native client for the Docker Engine HTTP API.
+
+    A single instance is shared by every Gateway so all container operations
+    reuse one keep-alive connection pool instead of blocking the event loop.
+    """
+
+    API_VERSION = "v1.41"
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_idle_connections: Optional[int] = None,
+    ):
+        self.url = url or settings.docker_host
+        self._pool = HTTPConnectionPool(
+            self.url,
+            max_connections=max_connections or settings.docker_max_connections,
+            max_idle=max_idle_connections or settings.docker_max_idle_connections,
+        )
+
+    @property
+    def pool(self) -> HTTPConnectionPool:
+        return self._pool
+
+    def _path(self, path: str) -> str:
+        return f"/{self.API_VERSION}{path}"
+
+    def _timer(self, method: str, path: str) -> Histogram:
+        # Container ids/names are folded so the endpoint label stays low-cardinality
+        parts = path.split("/")
+        if len(parts) > 2 and parts[1] == "containers" and parts[2] not in ("create", "json"):
+            parts[2] = "{id}"
+        return docker_api_seconds.labels(self.url, method, "/".join(parts))
+
+    async def _call(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        json_body: Any = None,
+        timeout: Optional[float] = 30.0,
+        allowed: tuple = (),
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await self._pool.request(
+                method, self._path(path), params=params, json_body=json_body, timeout=timeout
+            )
+        except HTTPError as e:
+            raise DockerEngineError(str(e)) from e
+        finally:
+            self._timer(method, path).observe(time.perf_counter() - started)
+
+        if response.status >= 400 and response.status not in allowed:
+            raise DockerEngineError(self._error_message(response), response.status)
+        if response.headers.get("content-type", "").startswith("application/json"):
+            return response.json()
+        return response.body
+
+    @staticmethod
+    def _error_message(response: HTTPResponse) -> str:
+        try:
+            return response.json()["message"]
+        except Exception:
+            return f"Docker API error {response.status} {response.reason}".strip()
+
+    async def stream(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        json_body: Any = None,
+    ) -> HTTPResponse:
+        """Open a streaming request. The caller must close the returned response."""
+        started = time.perf_counter()
+        try:
+            response = await self._pool.stream(
+                method, self._path(path), params=params, json_body=json_body
+            )
+        except HTTPError as e:
+            raise DockerEngineError(str(e)) from e
+        finally:
+            self._timer(method, path).observe(time.perf_counter() - started)
+
+        if response.status >= 400:
+            try:
+                await response.read()
+            finally:
+                response.close()
+            raise DockerEngineError(self._error_message(response), response.status)
+        return response
+
+    async def upgrade(
+        self, method: str, path: str, params: Optional[dict] = None
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open a hijacked raw connection (attach/exec style endpoints)."""
+        started = time.perf_counter()
+        try:
+            return await self._pool.upgrade(method, self._path(path), params=params)
+        except HTTPError as e:
+            raise DockerEngineError(str(e)) from e
+        finally:
+            self._timer(method, path).observe(time.perf_counter() - started)
+
+    # --- Containers ---
+
+    async def create_container(self, name: Optional[str], config: Dict[str, Any]) -> str:
+        """Create a container and return its id."""
+        result = await self._call("POST", "/containers/create", params={"name": name}, json_body=config)
+        return result["Id"]
+
+    async def start_container(self, container_id: str) -> None:
+        # 304: already started
+        await self._call("POST", f"/containers/{container_id}/start", allowed=(304,))
+
+    async def stop_container(self, container_id: str, timeout: int = 10) -> None:
+        # The daemon only answers once the container is down, so wait past the grace period
+        await self._call(
+            "POST",
+            f"/containers/{container_id}/stop",
+            params={"t": timeout},
+            timeout=timeout + 30,
+            allowed=(304,),
+        )
+
+    async def kill_container(self, container_id: str, signal: Optional[str] = None) -> None:
+        await self._call("POST", f"/containers/{container_id}/kill", params={"signal": signal})
+
+    async def pause_container(self, container_id: str) -> None:
+        await self._call("POST", f"/containers/{container_id}/pause")
+
+    async def unpause_container(self, container_id: str) -> None:
+        await self._call("POST", f"/containers/{container_id}/unpause")
+
+    async def remove_container(self, container_id: str, force: bool = False) -> None:
+        await self._call(
+            "DELETE",
+            f"/containers/{container_id}",
+            params={"force": "true" if force else "false"},
+            allowed=(404,),
+        )
+
+    async def update_container(self, container_id: str, resources: Dict[str, Any]) -> None:
+        """Change cgroup limits (NanoCpus, Memory, PidsLimit, ...) of a container."""
+        await self._call("POST", f"/containers/{container_id}/update", json_body=resources)
+
+    async def rename_container(self, container_id: str, name: str) -> None:
+        await self._call("POST", f"/containers/{container_id}/rename", params={"name": name})
+
+    async def attach_stdin(self, container_id: str) -> asyncio.StreamWriter:
+        """
+        Open a persistent stdin stream into a container created with OpenStdin.
+
+        Returns:
+            A writer whose bytes are delivered to the container's stdin.
+        """
+        _, writer = await self.upgrade(
+            "POST",
+            f"/containers/{container_id}/attach",
+            params={"stream": "1", "stdin": "1"},
+        )
+        return writer
+
+    async def container_stats(self, container_id: str) -> Dict[str, Any]:
+        """One stats sample (includes precpu_stats, so it takes about a second)."""
+        return await self._call("GET", f"/containers/{container_id}/stats", params={"stream": "false"})
+
+    async def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        return await self._call("GET", f"/containers/{container_id}/json")
+
+    async def list_containers(self, all: bool = False, filters: Optional[dict] = None) -> List[Dict[str, Any]]:
+        params = {"all": "true" if all else "false"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        return await self._call("GET", "/containers/json", params=params)
+
+    async def wait_container(self, container_id: str) -> int:
+        """Block (without holding a pooled connection) until the container stops."""
+        response = await self.stream("POST", f"/containers/{container_id}/wait")
+        try:
+            await response.read()
+        finally:
+            response.close()
+        return (response.json() or {}).get("StatusCode", -1)
+
+    # --- System ---
+
+    async def info(self) -> Dict[str, Any]:
+        """Host information, including NCPU and MemTotal."""
+        return await self._call("GET", "/info")
+
+    async def close(self) -> None:
+        await self._pool.close()
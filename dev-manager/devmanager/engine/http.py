@@ -0,0 +1,352 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit, unquote
+
+
+class HTTPError(Exception):
+    """Raised when the connection fails or the peer sends a malformed response."""
+
+
+class HTTPConnection:
+    """
+    A single HTTP/1.1 connection over a unix or TCP socket.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.reused = False
+
+    @property
+    def is_usable(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self) -> None:
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+class HTTPResponse:
+    """
+    Response returned by `HTTPConnectionPool.request`.
+
+    Buffered responses carry their body in `body`. Streamed responses must be
+    consumed with `iter_chunks` and closed with `close`.
+    """
+
+    def __init__(
+        self,
+        status: int,
+        reason: str,
+        headers: Dict[str, str],
+        connection: HTTPConnection,
+        pool: "HTTPConnectionPool",
+        method: str = "GET",
+    ):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = b""
+        self._connection: Optional[HTTPConnection] = connection
+        self._pool = pool
+        self._chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+        length = headers.get("content-length")
+        self._remaining = int(length) if length is not None else None
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            # Never carry a body, whatever the headers say; Docker answers
+            # start/stop/kill/... with a bare 204 and no Content-Length
+            self._chunked = False
+            self._remaining = 0
+        self._complete = False
+
+    @property
+    def keep_alive(self) -> bool:
+        if self.status == 101 or self.headers.get("connection", "").lower() == "close":
+            return False
+        return self._chunked or self._remaining is not None
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    async def read(self) -> bytes:
+        """Read the remaining body into `body` and return it."""
+        parts = [chunk async for chunk in self.iter_chunks()]
+        self.body = b"".join(parts)
+        return self.body
+
+    async def iter_chunks(self, size: int = 65536) -> AsyncIterator[bytes]:
+        """Yield body chunks as they arrive, decoding chunked transfer encoding."""
+        if self._connection is None or self._complete:
+            return
+        reader = self._connection.reader
+        if self._chunked:
+            while True:
+                size_line = await reader.readline()
+                if not size_line:
+                    raise HTTPError("Connection closed mid-chunk")
+                chunk_size = int(size_line.split(b";", 1)[0].strip(), 16)
+                if chunk_size == 0:
+                    # Skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunk = await reader.readexactly(chunk_size)
+                await reader.readexactly(2)
+                yield chunk
+        elif self._remaining is not None:
+            while self._remaining > 0:
+                chunk = await reader.read(min(size, self._remaining))
+                if not chunk:
+                    raise HTTPError("Connection closed before end of body")
+                self._remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await reader.read(size)
+                if not chunk:
+                    break
+                yield chunk
+        self._complete = True
+
+    def detach(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Take over the raw socket, e.g. after a protocol upgrade."""
+        if self._connection is None:
+            raise HTTPError("Response is already closed")
+        connection, self._connection = self._connection, None
+        return connection.reader, connection.writer
+
+    def close(self) -> None:
+        """Release the connection, returning it to the pool if it is reusable."""
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        if self._complete and self.keep_alive:
+            self._pool._release(connection)
+        else:
+            connection.close()
+
+
+class HTTPConnectionPool:
+    """
+    Keep-alive HTTP/1.1 client for a single endpoint.
+
+    Supports `unix:///path/to.sock`, `tcp://host:port` and `http://host:port`
+    URLs. Short requests share a bounded set of persistent connections;
+    streaming requests get a dedicated connection that is not counted against
+    the limit, so long-lived log or event streams never starve other calls.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 64,
+        max_idle: int = 16,
+        idle_timeout: float = 30.0,
+    ):
+        self.url = url
+        parts = urlsplit(url)
+        if parts.scheme in ("unix", "http+unix"):
+            self._unix_path: Optional[str] = unquote(parts.netloc) + parts.path
+            self._host = "localhost"
+            self._port = 0
+        elif parts.scheme in ("tcp", "http"):
+            self._unix_path = None
+            self._host = parts.hostname or "localhost"
+            self._port = parts.port or 80
+        else:
+            raise ValueError(f"Unsupported endpoint URL: {url}")
+
+        self._max_idle = max_idle
+        self._idle_timeout = idle_timeout
+        self._idle: List[HTTPConnection] = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self._closed = False
+
+    @property
+    def host(self) -> str:
+        """Host name of the endpoint ("localhost" for unix sockets)."""
+        return self._host
+
+    @property
+    def idle_connections(self) -> int:
+        return len(self._idle)
+
+    async def _connect(self) -> HTTPConnection:
+        if self._unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(self._unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(self._host, self._port)
+        return HTTPConnection(reader, writer)
+
+    async def _acquire(self) -> HTTPConnection:
+        now = time.monotonic()
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.is_usable and now - connection.last_used < self._idle_timeout:
+                connection.reused = True
+                return connection
+            connection.close()
+        return await self._connect()
+
+    def _release(self, connection: HTTPConnection) -> None:
+        if self._closed or len(self._idle) >= self._max_idle or not connection.is_usable:
+            connection.close()
+            return
+        connection.last_used = time.monotonic()
+        self._idle.append(connection)
+
+    def _encode(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict],
+        body: Optional[bytes],
+        headers: Optional[Dict[str, str]],
+    ) -> bytes:
+        if params:
+            query = urlencode({k: v for k, v in params.items() if v is not None}, doseq=True)
+            if query:
+                path = f"{path}?{query}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self._host}"]
+        all_headers = {"Content-Length": str(len(body or b""))}
+        all_headers.update(headers or {})
+        lines.extend(f"{k}: {v}" for k, v in all_headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+    async def _send(self, connection: HTTPConnection, method: str, payload: bytes) -> HTTPResponse:
+        connection.writer.write(payload)
+        await connection.writer.drain()
+        head = await connection.reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        version, status, *reason = status_line.split(" ", 2)
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        return HTTPResponse(int(status), reason[0] if reason else "", headers, connection, self, method)
+
+    async def _open(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict],
+        body: Optional[bytes],
+        headers: Optional[Dict[str, str]],
+        pooled: bool,
+    ) -> HTTPResponse:
+        payload = self._encode(method, path, params, body, headers)
+        connection = await (self._acquire() if pooled else self._connect())
+        try:
+            return await self._send(connection, method, payload)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            connection.close()
+            if not connection.reused:
+                raise HTTPError(f"{method} {path} failed: {e}") from e
+        except BaseException:
+            connection.close()
+            raise
+        # The peer dropped an idle keep-alive connection; retry once on a fresh one
+        connection = await self._connect()
+        try:
+            return await self._send(connection, method, payload)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            connection.close()
+            raise HTTPError(f"{method} {path} failed: {e}") from e
+        except BaseException:
+            connection.close()
+            raise
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        json_body=None,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = 30.0,
+    ) -> HTTPResponse:
+        """
+        Perform a request and buffer the whole response body.
+
+        Raises:
+            HTTPError: If the connection fails or times out.
+        """
+        if self._closed:
+            raise HTTPError("Connection pool is closed")
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers = {"Content-Type": "application/json", **(headers or {})}
+
+        async with self._slots:
+            response = None
+            try:
+                async with asyncio.timeout(timeout):
+                    response = await self._open(method, path, params, body, headers, pooled=True)
+                    await response.read()
+            except TimeoutError as e:
+                raise HTTPError(f"{method} {path} timed out after {timeout}s") from e
+            finally:
+                if response is not None:
+                    response.close()
+        return response
+
+    async def stream(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        json_body=None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> HTTPResponse:
+        """
+        Perform a request on a dedicated connection and return the response
+        with its body unread. The caller must `close()` it.
+        """
+        if self._closed:
+            raise HTTPError("Connection pool is closed")
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers = {"Content-Type": "application/json", **(headers or {})}
+        return await self._open(method, path, params, body, headers, pooled=False)
+
+    async def upgrade(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        protocol: str = "tcp",
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """
+        Perform a request asking the peer to switch protocols and hand back
+        the raw socket (Docker's "hijacked" attach connections).
+
+        Raises:
+            HTTPError: If the peer refuses the upgrade.
+        """
+        if self._closed:
+            raise HTTPError("Connection pool is closed")
+        response = await self._open(
+            method,
+            path,
+            params,
+            None,
+            {"Connection": "Upgrade", "Upgrade": protocol},
+            pooled=False,
+        )
+        # Older engines answer 200 and hijack the connection anyway
+        if response.status not in (101, 200):
+            await response.read()
+            response.close()
+            raise HTTPError(f"{method} {path} refused upgrade: {response.status} {response.body[:200]!r}")
+        return response.detach()
+
+    async def close(self) -> None:
+        self._closed = True
+        while self._idle:
+            self._idle.pop().close()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+from devmanager.engine import DockerEngine, DockerEngineError
+from devmanager.gateway.gateway import LABEL_MANAGED
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], None]
+
+
+class DockerEventMonitor:
+    """
+    Single consumer of the Docker `/events` stream for all managed containers.
+
+    Decoded container events are handed to `handler`, which keeps every
+    Gateway's state up to date push-style. The stream is reopened with
+    `since` after errors so no event is lost across reconnects.
+    """
+
+    def __init__(self, engine: DockerEngine, handler: EventHandler):
+        self._engine = engine
+        self._handler = handler
+        self._task: Optional[asyncio.Task] = None
+        self._last_event_time: Optional[int] = None
+        self.connected = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                await self._consume()
+                backoff = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Docker event stream failed, reconnecting: %s", e)
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _consume(self) -> None:
+        since = self._last_event_time if self._last_event_time is not None else int(time.time())
+        response = await self._engine.stream(
+            "GET",
+            "/events",
+            params={
+                "since": str(since),
+                "filters": json.dumps({
+                    "type": ["container"],
+                    "label": [f"{LABEL_MANAGED}=true"],
+                }),
+            },
+        )
+        self.connected = True
+        buffer = b""
+        try:
+            async for chunk in response.iter_chunks():
+                buffer += chunk
+                *events, buffer = buffer.split(b"\n")
+                for raw in events:
+                    if raw.strip():
+                        self._dispatch(json.loads(raw))
+        finally:
+            response.close()
+        raise DockerEngineError("Docker event stream ended")
+
+    def _dispatch(self, event: dict) -> None:
+        self._last_event_time = event.get("time", self._last_event_time)
+        try:
+            self._handler(event)
+        except Exception:
+            logger.exception("Failed to handle Docker event %s", event.get("Action"))
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
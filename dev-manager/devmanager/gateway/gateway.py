@@ -1,9 +1,54 @@
 import asyncio
-import docker
+import hashlib
+import hmac
 import json
+import time
 from enum import Enum
-from typing import Optional, List
+from typing import Callable, Dict, NamedTuple, Optional, List, Union
 from devmanager.config import settings
+from devmanager.engine import DockerEngine, DockerEngineError
+from devmanager.engine.http import HTTPConnectionPool, HTTPError
+from devmanager.gateway.log_bus import LogBus
+from devmanager.gateway.log_multiplexer import LogMultiplexer
+from devmanager.gateway.output_limiter import OutputLimiter, OutputPolicy
+from devmanager.metrics import (
+    console_echo_seconds,
+    gateway_first_output_seconds,
+    gateway_operation_seconds,
+    process_first_output_seconds,
+    process_reload_seconds,
+    timed,
+)
+
+# Labels put on every container the manager creates, used to find them again
+# after a manager restart
+LABEL_MANAGED = "devmanager.managed"
+LABEL_POOL = "devmanager.pool"
+LABEL_PROJECT_ID = "devmanager.project_id"
+LABEL_WORKING_DIRECTORY = "devmanager.working_directory"
+LABEL_COMMAND = "devmanager.command"
+LABEL_LIMITS = "devmanager.limits"
+LABEL_PTY = "devmanager.pty"
+LABEL_PROCESSES = "devmanager.processes"
+LABEL_WATCH = "devmanager.watch"
+
+CONTAINER_PREFIX = "dev-gateway-"
+
+class GatewayControlError(Exception):
+    """Raised when the agent's control endpoint can't be reached or refuses a request."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+def control_token(project_id: str) -> str:
+    """
+    Secret for a project's agent control endpoint. Derived from the internal
+    API token, so containers adopted after a manager restart stay reachable.
+    """
+    return hmac.new(
+        settings.internal_api_token.encode(), f"control:{project_id}".encode(), hashlib.sha256
+    ).hexdigest()
 
 class GatewayState(Enum):
     PENDING = "pending"
@@ -11,73 +56,542 @@ class GatewayState(Enum):
     PAUSED = "paused"
     STOPPED = "stopped"
 
+class ResourceLimits(NamedTuple):
+    """cgroup limits for a gateway container. 0 means unlimited."""
+    cpus: float = 0.0
+    cpu_shares: int = 0
+    memory_mb: int = 0
+    pids_limit: int = 0
+
+    @classmethod
+    def from_settings(cls, **overrides: Optional[float]) -> "ResourceLimits":
+        """Configured defaults, with any non-None overrides applied."""
+        limits = cls(
+            settings.gateway_cpus,
+            settings.gateway_cpu_shares,
+            settings.gateway_memory_mb,
+            settings.gateway_pids_limit,
+        )
+        return limits._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+    @classmethod
+    def from_label(cls, value: Optional[str]) -> "ResourceLimits":
+        try:
+            return cls(**json.loads(value))
+        except (TypeError, ValueError):
+            return cls.from_settings()
+
+    def to_label(self) -> str:
+        return json.dumps(self._asdict())
+
+    def to_resources(self) -> dict:
+        """The HostConfig / container update fields for these limits."""
+        resources = {}
+        if self.cpus:
+            resources["NanoCpus"] = int(self.cpus * 1e9)
+        if self.cpu_shares:
+            resources["CpuShares"] = self.cpu_shares
+        if self.memory_mb:
+            resources["Memory"] = self.memory_mb * 1024 * 1024
+            resources["MemorySwap"] = resources["Memory"]  # No swap on top of the limit
+        if self.pids_limit:
+            resources["PidsLimit"] = self.pids_limit
+        return resources
+
+def build_container_config(
+    env: Dict[str, str],
+    labels: Dict[str, str],
+    stdin: bool = False,
+    limits: Optional[ResourceLimits] = None,
+) -> dict:
+    """Docker create-container body for a dev-gateway agent container."""
+    base_env = {
+        "GATEWAY_OUTPUT_BATCH_MS": str(settings.gateway_output_batch_ms),
+        # Structured output frames instead of plain text (see StreamDemuxer)
+        "GATEWAY_OUTPUT_FORMAT": "frames",
+    }
+    base_env.update(env)
+    config = {
+        "Image": settings.gateway_image,
+        "Env": [f"{k}={v}" for k, v in base_env.items()],
+        "Labels": {LABEL_MANAGED: "true", **labels},
+        "OpenStdin": stdin,
+        "StdinOnce": False,
+        "HostConfig": {
+            "AutoRemove": True,  # Cleanup on stop
+            **(limits.to_resources() if limits else {}),
+        },
+    }
+    if settings.gateway_control_port:
+        port = f"{settings.gateway_control_port}/tcp"
+        config["Env"].append(f"GATEWAY_CONTROL_PORT={settings.gateway_control_port}")
+        config["ExposedPorts"] = {port: {}}
+        # Empty HostPort: Docker picks a free one (see Gateway.control)
+        config["HostConfig"]["PortBindings"] = {port: [{"HostPort": ""}]}
+    return config
+
 class Gateway:
     """
     Manages a single project execution as a Docker container.
     """
     
-    def __init__(self, project_id: str, working_directory: str, command: List[str]):
+    def __init__(
+        self,
+        project_id: str,
+        working_directory: str,
+        command: List[str],
+        engine: DockerEngine,
+        logs: LogMultiplexer,
+        limits: Optional[ResourceLimits] = None,
+        owner: Optional[str] = None,
+        pty: bool = False,
+        processes: Optional[List[dict]] = None,
+        watch: Optional[dict] = None,
+    ):
         self.project_id = project_id
         self.working_directory = working_directory
         self.command = command
+        # Named processes the agent supervises instead of running `command`
+        # (GATEWAY_PROCESSES), and their last reported status by name
+        self.processes = processes
+        self.process_states: Dict[str, dict] = {}
+        # Watch mode options (GATEWAY_WATCH; {} = defaults), None = off
+        self.watch = watch
+        self.limits = limits or ResourceLimits.from_settings()
+        self.owner = owner
+        # PTY gateways produce raw terminal chunks instead of lines (see notice())
+        self.pty = pty
+        self._line_open = False
         self._state = GatewayState.PENDING
-        self._container = None
-        self._output_queue = asyncio.Queue()
-        self._docker_client = docker.from_env()
+        self._engine = engine
+        self._logs = logs
+        self._container_id: Optional[str] = None
+        self._output = LogBus(settings.console_buffer_lines, settings.console_buffer_bytes)
+        self._limiter = OutputLimiter(
+            self._output.publish,
+            settings.output_rate_lines,
+            settings.output_rate_bytes,
+            settings.output_burst_seconds,
+            OutputPolicy(settings.output_policy),
+            settings.output_sample_every,
+            # Repeated chunks (spinners, redraws) aren't repeated lines
+            settings.output_collapse_repeats and not pty,
+            self.notice,
+        )
         self._stream_task = None
+        self._stdin: Optional[asyncio.StreamWriter] = None
+        self._stdin_lock = asyncio.Lock()
+        # Keep-alive client for the agent's control endpoint, opened on first use
+        self._control: Optional[HTTPConnectionPool] = None
+        self._input_sent_at: Optional[float] = None
+        self._run_started_at: Optional[float] = None
+        self.first_output_latency: Optional[float] = None
+        # From framed agent output: process start in the agent's monotonic clock,
+        # the agent sequence number expected next, lines per stream
+        self._process_started_at: Optional[float] = None
+        self.process_first_output_latency: Optional[float] = None
+        self._agent_seq: Optional[int] = None
+        self.agent_lines_dropped = 0
+        self.stream_lines: Dict[str, int] = {}
+        self.reloads = 0
+        self.last_reload_latency: Optional[float] = None
+        self.pooled = False
+        self._shutting_down = False
+        self.exit_code: Optional[int] = None
+        self.oom_killed = False
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.state_changed_at = self.created_at
+        # Idle policy bookkeeping (see IdlePolicy)
+        self.last_activity = time.monotonic()
+        self.auto_paused = False
+        self.cpu_seconds_reclaimed = 0.0
+        # Called with (gateway, new_state) on every state change
+        self.on_state_change: Optional[Callable[["Gateway", GatewayState], None]] = None
 
     @property
     def state(self) -> GatewayState:
         return self._state
 
+    def touch(self) -> None:
+        """Records API activity, which keeps the gateway from being idle-paused."""
+        self.last_activity = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        """Seconds since the last output, console (dis)connect or API activity."""
+        return time.monotonic() - max(self.last_activity, self._output.last_activity)
+
+    def _set_state(self, state: GatewayState) -> None:
+        if state != self._state:
+            self._state = state
+            self.state_changed_at = time.time()
+            if state == GatewayState.RUNNING and self.started_at is None:
+                self.started_at = self.state_changed_at
+            if state != GatewayState.PAUSED:
+                self.auto_paused = False
+            if self.on_state_change:
+                self.on_state_change(self, state)
+
     @property
-    def output_queue(self) -> asyncio.Queue:
-        return self._output_queue
+    def container_name(self) -> str:
+        return f"{CONTAINER_PREFIX}{self.project_id}"
 
-    async def run(self) -> None:
-        """Starts the gateway container."""
+    @property
+    def engine(self) -> DockerEngine:
+        """Client for the Docker host this gateway runs on."""
+        return self._engine
+
+    @property
+    def container_id(self) -> Optional[str]:
+        return self._container_id
+
+    @property
+    def output(self) -> LogBus:
+        """Broadcast bus carrying the container's console output."""
+        return self._output
+
+    def notice(self, message: str) -> None:
+        """
+        Publishes a manager/container status message. For PTY gateways it is
+        put on a line of its own so it doesn't run into terminal output.
+        """
+        if not self.pty:
+            self._output.publish(message)
+            return
+        prefix = "\r\n" if self._line_open else ""
+        self._line_open = False
+        self._output.publish(f"{prefix}{message}\r\n")
+
+    @property
+    def limiter(self) -> OutputLimiter:
+        """Rate limiter between the container's log stream and `output`."""
+        return self._limiter
+
+    @timed(gateway_operation_seconds.labels("run"))
+    async def run(self, pooled_container_id: Optional[str] = None) -> None:
+        """
+        Starts the gateway container.
+        
+        Args:
+            pooled_container_id: An idle standby container from the GatewayPool
+                to bind to this project instead of creating a new one.
+        """
         if self._state != GatewayState.PENDING:
             raise RuntimeError(f"Cannot run gateway in state {self._state}")
+        self._run_started_at = asyncio.get_running_loop().time()
 
+        try:
+            if pooled_container_id:
+                try:
+                    await self._bind_pooled(pooled_container_id)
+                except DockerEngineError as e:
+                    # The standby container is unusable; fall back to a cold start
+                    self.notice(f"[MANAGER] Pooled container unavailable, starting a new one: {e}")
+                    await self._engine.remove_container(pooled_container_id, force=True)
+                    self._container_id = None
+            if not self._container_id:
+                await self._create_container()
+            self._set_state(GatewayState.RUNNING)
+            
+            # Start streaming logs
+            self._stream_task = asyncio.create_task(self._stream_logs())
+            
+        except Exception as e:
+            self._set_state(GatewayState.STOPPED)
+            self.notice(f"[MANAGER] Failed to start container: {e}")
+            self._output.close()
+            raise
+
+    async def _create_container(self) -> None:
         # Construct environment for the agent
         env = {
             "GATEWAY_PROJECT_ID": self.project_id,
             "GATEWAY_WORKING_DIR": self.working_directory,
-            "GATEWAY_COMMAND": json.dumps(self.command)
+            "GATEWAY_COMMAND": json.dumps(self.command),
         }
+        if self.pty:
+            env["GATEWAY_PTY"] = "1"
+        if self.processes:
+            env["GATEWAY_PROCESSES"] = json.dumps(self.processes)
+        if self.watch is not None:
+            env["GATEWAY_WATCH"] = json.dumps(self.watch)
+        if settings.gateway_control_port:
+            env["GATEWAY_CONTROL_TOKEN"] = control_token(self.project_id)
 
+        # Create and start the container
+        # We use the dev-gateway image (which has the agent)
+        labels = {
+            LABEL_PROJECT_ID: self.project_id,
+            LABEL_WORKING_DIRECTORY: self.working_directory,
+            LABEL_COMMAND: json.dumps(self.command),
+            LABEL_LIMITS: self.limits.to_label(),
+            LABEL_PTY: "true" if self.pty else "false",
+        }
+        if self.processes:
+            labels[LABEL_PROCESSES] = json.dumps(self.processes)
+        if self.watch is not None:
+            labels[LABEL_WATCH] = json.dumps(self.watch)
+        # stdin stays open for console input (see send_input)
+        config = build_container_config(env, labels, stdin=True, limits=self.limits)
         try:
-            # Create and start the container
-            # We use the dev-gateway image (which has the agent)
-            self._container = self._docker_client.containers.run(
-                image=settings.gateway_image,
-                name=f"dev-gateway-{self.project_id}",
-                environment=env,
-                detach=True,
-                remove=True, # Cleanup on stop
-            )
-            self._state = GatewayState.RUNNING
-            
-            # Start streaming logs
-            self._stream_task = asyncio.create_task(self._stream_logs())
-            
-        except Exception as e:
-            self._state = GatewayState.STOPPED
-            await self._output_queue.put(f"[MANAGER] Failed to start container: {e}")
+            self._container_id = await self._engine.create_container(self.container_name, config)
+        except DockerEngineError as e:
+            if e.status != 409:
+                raise
+            # A dead container still holds the name (live ones are adopted at startup)
+            await self._engine.remove_container(self.container_name, force=True)
+            self._container_id = await self._engine.create_container(self.container_name, config)
+        try:
+            await self._engine.start_container(self._container_id)
+        except DockerEngineError:
+            await self._engine.remove_container(self._container_id, force=True)
+            self._container_id = None
             raise
 
+    async def _bind_pooled(self, container_id: str) -> None:
+        """Hands the project to a standby agent over its stdin."""
+        self._container_id = container_id
+        # Standby containers are created before their project (and its limits) is known
+        resources = self.limits.to_resources()
+        if resources:
+            await self._engine.update_container(container_id, resources)
+        await self._engine.rename_container(container_id, self.container_name)
+        self._stdin = await self._engine.attach_stdin(container_id)
+        assignment = {
+            "project_id": self.project_id,
+            "working_directory": self.working_directory,
+            "command": self.command,
+            "pty": self.pty,
+        }
+        if self.processes:
+            assignment["processes"] = self.processes
+        if self.watch is not None:
+            assignment["watch"] = self.watch
+        if settings.gateway_control_port:
+            assignment["control_token"] = control_token(self.project_id)
+        try:
+            self._stdin.write((json.dumps(assignment) + "\n").encode())
+            await self._stdin.drain()
+        except ConnectionError as e:
+            raise DockerEngineError(f"Failed to bind pooled container: {e}") from e
+        self.pooled = True
+
+    async def adopt(self, container_id: str, paused: bool = False) -> None:
+        """
+        Takes over an already running container, e.g. after a manager restart,
+        and re-attaches its log stream with the most recent lines replayed.
+        """
+        if self._state != GatewayState.PENDING:
+            raise RuntimeError(f"Cannot adopt container in state {self._state}")
+        self._container_id = container_id
+        self._set_state(GatewayState.PAUSED if paused else GatewayState.RUNNING)
+        self._stream_task = asyncio.create_task(
+            self._stream_logs(tail=str(settings.console_buffer_lines))
+        )
+
+    def _on_log_line(self, line: str) -> None:
+        # Plain text: agents without framed output, and agent errors on stderr.
+        # The agent's own "[GATEWAY] ..." banner doesn't count as project output
+        if not line.startswith("[GATEWAY]"):
+            self._first_output()
+        self._on_output(line)
+
+    def _on_frame(self, frame: dict) -> None:
+        """Handles a frame of structured agent output (see devgateway.gateway.frames)."""
+        data = frame.get("data") or []
+        seq = frame.get("seq")
+        if isinstance(seq, int):
+            if self._agent_seq is not None and seq > self._agent_seq:
+                # A gap: the agent dropped entries from its scrollback
+                self.agent_lines_dropped += seq - self._agent_seq
+                self.notice(f"[GATEWAY] {seq - self._agent_seq} {'chunks' if self.pty else 'lines'} dropped")
+            self._agent_seq = seq + len(data)
+        ts = frame.get("ts")
+        kind = frame.get("type")
+        process = frame.get("process")
+        # Lines of supervised processes are labelled like the agent does in plain text mode
+        prefix = f"[{process}] " if process is not None and not self.pty else ""
+        if kind == "output":
+            stream = str(frame.get("stream"))
+            self.stream_lines[stream] = self.stream_lines.get(stream, 0) + len(data)
+            if data:
+                self._first_output(ts if isinstance(ts, (int, float)) else None)
+            for text in data:
+                self._on_output(f"{prefix}{text}")
+            return
+        if kind == "started" and isinstance(ts, (int, float)) and self._process_started_at is None:
+            self._process_started_at = ts
+        elif kind == "exit" and isinstance(frame.get("code"), int):
+            self.exit_code = frame["code"]
+        elif kind == "reload" and isinstance(frame.get("latency"), (int, float)):
+            self.reloads += 1
+            self.last_reload_latency = frame["latency"]
+            process_reload_seconds.observe(frame["latency"])
+        elif kind == "process" and process is not None:
+            self.process_states[str(process)] = {
+                key: frame.get(key) for key in ("state", "pid", "restarts", "exit_code", "retry_in")
+            }
+        # Agent notices skip the rate limiter; emit its pending markers first to keep the order
+        self._limiter.flush()
+        for message in data:
+            self.notice(prefix + str(message).strip("\r\n"))
+
+    def _first_output(self, agent_time: Optional[float] = None) -> None:
+        if self.first_output_latency is None and self._run_started_at is not None:
+            self.first_output_latency = asyncio.get_running_loop().time() - self._run_started_at
+            gateway_first_output_seconds.observe(self.first_output_latency)
+        if self.process_first_output_latency is None and None not in (agent_time, self._process_started_at):
+            self.process_first_output_latency = agent_time - self._process_started_at
+            process_first_output_seconds.observe(self.process_first_output_latency)
+
+    def _on_output(self, line: str) -> None:
+        if self._input_sent_at is not None:
+            console_echo_seconds.observe(time.perf_counter() - self._input_sent_at)
+            self._input_sent_at = None
+        if self.pty:
+            self._line_open = not line.endswith("\n")
+        self._limiter.feed(line)
+
+    async def send_input(self, data: str, newline: bool = True, process: Optional[str] = None) -> None:
+        """
+        Forwards console input to the project process's stdin.
+
+        The input goes to the agent as a JSON line over a persistent attach
+        stream to the container's stdin, opened on first use.
+
+        Args:
+            data: Text to write.
+            newline: Append a newline if `data` doesn't end with one.
+            process: Supervised process to send it to (default: the first one).
+
+        Raises:
+            RuntimeError: If the gateway is not running.
+            DockerEngineError: If the input could not be delivered.
+        """
+        if self._state != GatewayState.RUNNING or not self._container_id:
+            raise RuntimeError(f"Cannot send input to gateway in state {self._state}")
+        message = {"type": "input", "data": data, "newline": newline}
+        if process is not None:
+            message["process"] = process
+        await self._send_message(message)
+        if self._input_sent_at is None:
+            self._input_sent_at = time.perf_counter()
+
+    async def resize(self, columns: int, rows: int) -> None:
+        """
+        Resizes the terminal of a PTY gateway.
+
+        Raises:
+            RuntimeError: If the gateway is not running or has no PTY.
+            DockerEngineError: If the message could not be delivered.
+        """
+        if not self.pty:
+            raise RuntimeError("Gateway has no terminal to resize")
+        if self._state != GatewayState.RUNNING or not self._container_id:
+            raise RuntimeError(f"Cannot resize gateway in state {self._state}")
+        await self._send_message({"type": "resize", "columns": columns, "rows": rows})
+
+    async def _send_message(self, message: dict) -> None:
+        """Writes a console message line to the agent over the container's stdin."""
+        data = (json.dumps(message) + "\n").encode()
+        async with self._stdin_lock:
+            # One retry with a fresh attach if the stream broke (e.g. Docker restarted)
+            for attempt in range(2):
+                if self._stdin is None:
+                    self._stdin = await self._engine.attach_stdin(self._container_id)
+                try:
+                    self._stdin.write(data)
+                    await self._stdin.drain()
+                    break
+                except ConnectionError as e:
+                    self._stdin.close()
+                    self._stdin = None
+                    if attempt:
+                        raise DockerEngineError(f"Failed to send console message: {e}") from e
+
+    async def control(self, method: str, path: str, body: Optional[dict] = None) -> dict:
+        """
+        Calls the agent's control endpoint (see devgateway's ControlServer)
+        over a keep-alive connection to the container's published control
+        port, bypassing the Docker API.
+
+        Raises:
+            RuntimeError: If the gateway is not running.
+            GatewayControlError: If the endpoint is disabled, unreachable or
+                refuses the request (`status` is then the agent's HTTP status).
+        """
+        if not settings.gateway_control_port:
+            raise GatewayControlError("The agent control endpoint is disabled")
+        if self._state != GatewayState.RUNNING or not self._container_id:
+            raise RuntimeError(f"Cannot control gateway in state {self._state}")
+        try:
+            if self._control is None:
+                container = await self._engine.inspect_container(self._container_id)
+                ports = (container.get("NetworkSettings") or {}).get("Ports") or {}
+                bindings = ports.get(f"{settings.gateway_control_port}/tcp")
+                if not bindings:
+                    raise GatewayControlError("Container has no published control port")
+                self._control = HTTPConnectionPool(
+                    f"http://{self._engine.pool.host}:{bindings[0]['HostPort']}", max_connections=4, max_idle=2
+                )
+            response = await self._control.request(
+                method, path, json_body=body, headers={"Authorization": f"Bearer {control_token(self.project_id)}"}
+            )
+        except (HTTPError, DockerEngineError, OSError) as e:
+            raise GatewayControlError(f"Control endpoint unreachable: {e}") from e
+        try:
+            result = response.json() or {}
+        except ValueError:
+            result = {}
+        if response.status >= 400:
+            raise GatewayControlError(
+                result.get("error") or f"Control request failed: {response.status} {response.reason}",
+                response.status,
+            )
+        return result
+
+    @timed(gateway_operation_seconds.labels("restart_process"))
+    async def restart_process(self, process: Optional[str] = None) -> dict:
+        """
+        Restarts the project process (or supervised process `process`) in
+        place, keeping the container. Returns the agent's status afterwards.
+        """
+        return await self.control("POST", "/restart", {"process": process} if process else {})
+
+    async def send_signal(self, signal: Union[str, int], process: Optional[str] = None) -> dict:
+        """Sends a signal (name or number) to the project process or to supervised process `process`."""
+        body = {"signal": signal}
+        if process:
+            body["process"] = process
+        return await self.control("POST", "/signal", body)
+
+    async def process_status(self) -> dict:
+        """The agent's live view of its process(es)."""
+        return await self.control("GET", "/status")
+
+    async def _close_control(self) -> None:
+        if self._control:
+            await self._control.close()
+            self._control = None
+
+    @timed(gateway_operation_seconds.labels("shutdown"))
     async def shutdown(self) -> None:
         """Stops the container."""
-        if not self._container:
+        if not self._container_id:
+            # Never started (e.g. still waiting for admission)
+            self._set_state(GatewayState.STOPPED)
+            if not self._output.closed:
+                self._output.close()
             return
 
-        self._state = GatewayState.STOPPED
+        self._shutting_down = True
+        self._set_state(GatewayState.STOPPED)
         try:
-            self._container.stop(timeout=5)
-        except Exception:
+            await self._engine.stop_container(self._container_id, timeout=5)
+        except DockerEngineError:
             try:
-                self._container.kill()
-            except Exception:
+                await self._engine.kill_container(self._container_id)
+            except DockerEngineError:
                 pass
         
         if self._stream_task:
@@ -87,57 +601,122 @@ class Gateway:
             except asyncio.CancelledError:
                 pass
         
-        await self._output_queue.put("[GATEWAY] Container stopped")
+        if self._stdin:
+            self._stdin.close()
+            self._stdin = None
+        await self._close_control()
+        
+        self.notice("[GATEWAY] Container stopped")
+        self._output.close()
 
+    async def kill(self) -> None:
+        """Kills the container immediately, without a stop grace period."""
+        self._shutting_down = True
+        self._set_state(GatewayState.STOPPED)
+        if self._container_id:
+            try:
+                await self._engine.kill_container(self._container_id)
+            except DockerEngineError:
+                pass
+        if self._stream_task:
+            self._stream_task.cancel()
+        if self._stdin:
+            self._stdin.close()
+            self._stdin = None
+        await self._close_control()
+        if not self._output.closed:
+            self.notice("[GATEWAY] Container killed")
+            self._output.close()
+
+    @timed(gateway_operation_seconds.labels("pause"))
     async def pause(self) -> None:
         if self._state != GatewayState.RUNNING:
             return
-        if self._container:
-            self._container.pause()
-            self._state = GatewayState.PAUSED
-            await self._output_queue.put("[GATEWAY] Container paused")
+        if self._container_id:
+            await self._engine.pause_container(self._container_id)
+            self._set_state(GatewayState.PAUSED)
+            self.notice("[GATEWAY] Container paused")
 
+    @timed(gateway_operation_seconds.labels("resume"))
     async def resume(self) -> None:
         if self._state != GatewayState.PAUSED:
             return
-        if self._container:
-            self._container.unpause()
-            self._state = GatewayState.RUNNING
-            await self._output_queue.put("[GATEWAY] Container resumed")
-
-    async def _stream_logs(self) -> None:
-        """Streams container logs to the output queue."""
-        if not self._container:
+        if self._container_id:
+            await self._engine.unpause_container(self._container_id)
+            self._set_state(GatewayState.RUNNING)
+            self.notice("[GATEWAY] Container resumed")
+
+    async def _stream_logs(self, tail: Optional[str] = None) -> None:
+        """Streams container logs to the output bus."""
+        if not self._container_id:
             return
             
         try:
-            # We use a thread-based approach for log streaming since docker-py's logs() is blocking
-            # but we can wrap it in a run_in_executor
-            loop = asyncio.get_event_loop()
-            
-            # This is a bit tricky with docker-py. A better way might be to use 
-            # the low-level API or just run a thread.
-            def get_logs():
-                for line in self._container.logs(stream=True, follow=True):
-                    # In a thread, we use loop.call_soon_threadsafe to put in queue
-                    msg = line.decode().rstrip()
-                    loop.call_soon_threadsafe(self._output_queue.put_nowait, msg)
-
-            await loop.run_in_executor(None, get_logs)
-            
+            await self._logs.follow(
+                self._container_id,
+                self._on_log_line,
+                tail=tail,
+                throttle=self._limiter.delay,
+                chunks=self.pty,
+                frame_sink=self._on_frame,
+            )
         except asyncio.CancelledError:
             pass
         except Exception as e:
-            await self._output_queue.put(f"[MANAGER] Log stream error: {e}")
+            self.notice(f"[MANAGER] Log stream error: {e}")
         finally:
+            self._limiter.flush()
+            # The die event may already have marked us stopped; shutdown() reports on its own
+            if not self._shutting_down:
+                await self._close_control()
+                if self._stdin:
+                    self._stdin.close()
+                    self._stdin = None
+                self._set_state(GatewayState.STOPPED)
+                if self.exit_code is not None:
+                    self.notice(f"[GATEWAY] Container exited with code {self.exit_code}")
+                else:
+                    self.notice("[GATEWAY] Container exited")
+                if self.oom_killed:
+                    self.notice("[GATEWAY] Container was killed for running out of memory")
+                self._output.close()
+
+    def handle_event(self, action: str, attributes: Dict[str, str]) -> None:
+        """
+        Applies a Docker container event (from DockerEventMonitor) to this gateway.
+        """
+        if action == "die":
+            try:
+                self.exit_code = int(attributes.get("exitCode", ""))
+            except ValueError:
+                pass
+            if self._state in (GatewayState.RUNNING, GatewayState.PAUSED):
+                self._set_state(GatewayState.STOPPED)
+        elif action == "oom":
+            self.oom_killed = True
+        elif action == "pause":
             if self._state == GatewayState.RUNNING:
-                self._state = GatewayState.STOPPED
-                await self._output_queue.put("[GATEWAY] Container exited")
+                self._set_state(GatewayState.PAUSED)
+        elif action == "unpause":
+            if self._state == GatewayState.PAUSED:
+                self._set_state(GatewayState.RUNNING)
+        elif action in ("start", "restart"):
+            if self._state == GatewayState.STOPPED and not self._shutting_down and self._container_id:
+                # Restarted outside the manager: follow its output again
+                self.exit_code = None
+                self.oom_killed = False
+                self._agent_seq = None
+                self._set_state(GatewayState.RUNNING)
+                if self._stream_task is None or self._stream_task.done():
+                    self._output.reopen()
+                    self.notice("[GATEWAY] Container restarted")
+                    self._stream_task = asyncio.create_task(self._stream_logs(tail="0"))
 
     async def wait(self) -> int:
-        if not self._container:
+        if not self._container_id:
             return -1
-        # Blocking call, wrap in executor
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self._container.wait)
-        return result.get("StatusCode", -1)
\ No newline at end of file
+        try:
+            return await self._engine.wait_container(self._container_id)
+        except DockerEngineError:
+            # Already removed (AutoRemove)
+            return -1
\ No newline at end of file
@@ -0,0 +1,269 @@
+import asyncio
+import time
+from typing import Callable, List, NamedTuple, Optional, Set
+
+
+class LogBatch(NamedTuple):
+    """A run of consecutive lines handed to a subscriber."""
+    seq: int
+    """Sequence number of the first line in `lines`."""
+    lines: List[str]
+    dropped: int = 0
+    """Lines skipped right before `seq` because they left the scrollback."""
+
+
+class LogBus:
+    """
+    Broadcasts a gateway's console output to any number of subscribers.
+
+    Lines are stored once in a fixed-size scrollback, capped both by line
+    count and by total size (in characters), and numbered with a monotonically
+    increasing sequence number. Every subscriber only keeps a cursor into the
+    scrollback, so adding viewers costs no extra memory per line. Publishing
+    never waits on subscribers: a viewer whose cursor falls out of the
+    scrollback skips ahead and is told how many lines it missed.
+    """
+
+    def __init__(self, max_lines: int, max_bytes: int):
+        if max_lines < 1 or max_bytes < 1:
+            raise ValueError("LogBus limits must be at least 1")
+        self._max_lines = max_lines
+        self._max_bytes = max_bytes
+        self._ring: List[Optional[str]] = [None] * max_lines
+        self._first_seq = 0
+        self._next_seq = 0
+        self._size = 0
+        self._published_bytes = 0
+        self._waiter: Optional[asyncio.Future] = None
+        self._subscriptions: Set["LogSubscription"] = set()
+        self._closed = False
+        self._last_activity = time.monotonic()
+        # Optional callback receiving every published line (e.g. the on-disk archive)
+        self.tap: Optional[Callable[[str], None]] = None
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest line still in the scrollback."""
+        return self._first_seq
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next published line will get."""
+        return self._next_seq
+
+    @property
+    def buffered_lines(self) -> int:
+        return self._next_seq - self._first_seq
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._size
+
+    @property
+    def published_bytes(self) -> int:
+        """Total characters published (lines published is `next_seq`)."""
+        return self._published_bytes
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    @property
+    def max_subscriber_lag(self) -> int:
+        """Lines the slowest subscriber has yet to read."""
+        if not self._subscriptions:
+            return 0
+        return self._next_seq - min(sub.cursor for sub in self._subscriptions)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def last_activity(self) -> float:
+        """time.monotonic() of the last published line or subscriber change."""
+        return self._last_activity
+
+    def publish(self, line: str) -> int:
+        """
+        Append a line and wake waiting subscribers. Never blocks.
+
+        Returns:
+            The sequence number assigned to the line.
+        """
+        if self._closed:
+            return -1
+        # Lines longer than the whole byte budget are cut so they can't evict everything else
+        if len(line) > self._max_bytes:
+            line = line[:self._max_bytes]
+        seq = self._next_seq
+        if seq - self._first_seq == self._max_lines:
+            self._evict()
+        self._ring[seq % self._max_lines] = line
+        self._size += len(line)
+        self._published_bytes += len(line)
+        self._next_seq = seq + 1
+        self._last_activity = time.monotonic()
+        if self.tap is not None:
+            self.tap(line)
+        while self._size > self._max_bytes:
+            self._evict()
+        self._wake()
+        return seq
+
+    def close(self) -> None:
+        """Mark the end of output. Subscribers drain what is buffered, then stop."""
+        self._closed = True
+        self._wake()
+
+    def reopen(self) -> None:
+        """Accept output again after `close()`, continuing the sequence numbers."""
+        self._closed = False
+
+    def subscribe(self, since: Optional[int] = None) -> "LogSubscription":
+        """
+        Subscribe to the bus.
+
+        Args:
+            since: Sequence number of the last line the client already has.
+                Only later lines are delivered. When omitted (or when it is
+                ahead of this bus, e.g. after a gateway restart) the whole
+                scrollback is replayed first.
+        """
+        if since is None or since >= self._next_seq:
+            cursor = self._first_seq
+        else:
+            cursor = max(0, since + 1)
+        return LogSubscription(self, cursor)
+
+    def _evict(self) -> None:
+        index = self._first_seq % self._max_lines
+        self._size -= len(self._ring[index])
+        self._ring[index] = None
+        self._first_seq += 1
+
+    def _wake(self) -> None:
+        # One shared future per batch of publishes, so waking N subscribers is O(1) here
+        if self._waiter is not None:
+            if not self._waiter.done():
+                self._waiter.set_result(None)
+            self._waiter = None
+
+    async def _wait_past(self, seq: int) -> None:
+        while self._next_seq <= seq and not self._closed:
+            if self._waiter is None:
+                self._waiter = asyncio.get_running_loop().create_future()
+            # Shield so a cancelled subscriber doesn't cancel the shared future
+            await asyncio.shield(self._waiter)
+
+    def _read(self, cursor: int, max_lines: int) -> List[str]:
+        end = min(self._next_seq, cursor + max_lines)
+        return [self._ring[seq % self._max_lines] for seq in range(cursor, end)]
+
+
+class LogSubscription:
+    """
+    A single viewer's cursor into a LogBus.
+
+    Fetch batches with `next_batch`, or iterate lines with
+    `async for line in subscription`. Always `close()` it (or use it as a
+    context manager) so the bus keeps an accurate subscriber count.
+    """
+
+    def __init__(self, bus: LogBus, cursor: int):
+        self._bus = bus
+        self._cursor = cursor
+        self._active = True
+        bus._subscriptions.add(self)
+        bus._last_activity = time.monotonic()
+
+    @property
+    def cursor(self) -> int:
+        """Sequence number of the next line this subscriber will receive."""
+        return self._cursor
+
+    async def next_batch(self, max_lines: int = 256) -> Optional[LogBatch]:
+        """
+        Wait for and return the next batch of lines.
+
+        Returns None once the bus is closed and fully drained.
+        """
+        bus = self._bus
+        await bus._wait_past(self._cursor)
+
+        dropped = 0
+        if self._cursor < bus.first_seq:
+            dropped = bus.first_seq - self._cursor
+            self._cursor = bus.first_seq
+
+        seq = self._cursor
+        lines = bus._read(seq, max_lines)
+        if not lines and not dropped:
+            return None
+        self._cursor += len(lines)
+        return LogBatch(seq, lines, dropped)
+
+    async def next_frame(
+        self, max_bytes: int, max_latency: float, max_lines: int = 1024
+    ) -> Optional[LogBatch]:
+        """
+        Like `next_batch`, but coalesces lines into one batch for transports
+        that pay per frame.
+
+        Once the first line is available, keeps collecting for at most
+        `max_latency` seconds or until roughly `max_bytes` characters (or
+        `max_lines` lines) are gathered. A gap (dropped lines) always ends the batch before it.
+
+        Returns None once the bus is closed and fully drained.
+        """
+        batch = await self.next_batch()
+        if batch is None:
+            return None
+
+        lines = batch.lines
+        size = sum(len(line) for line in lines)
+        deadline = asyncio.get_running_loop().time() + max_latency
+        bus = self._bus
+        while size < max_bytes and len(lines) < max_lines and not bus.closed:
+            if bus.next_seq <= self._cursor:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(bus._wait_past(self._cursor), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if self._cursor < bus.first_seq:
+                break
+            more = bus._read(self._cursor, max_lines - len(lines))
+            if not more:
+                continue
+            self._cursor += len(more)
+            lines.extend(more)
+            size += sum(len(line) for line in more)
+        return LogBatch(batch.seq, lines, batch.dropped)
+
+    def close(self) -> None:
+        if self._active:
+            self._active = False
+            self._bus._subscriptions.discard(self)
+            self._bus._last_activity = time.monotonic()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while True:
+            batch = await self.next_batch()
+            if batch is None:
+                return
+            if batch.dropped:
+                yield f"[MANAGER] {batch.dropped} lines dropped (console viewer too slow)"
+            for line in batch.lines:
+                yield line
+
+    def __enter__(self) -> "LogSubscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,205 @@
+import asyncio
+import codecs
+import json
+from typing import Callable, Dict, List, Optional
+
+from devmanager.engine import DockerEngine
+
+STDOUT = 1
+STDERR = 2
+
+# Agents started with GATEWAY_OUTPUT_FORMAT=frames write their stdout as an
+# RFC 7464 JSON text sequence: each frame is this byte, a JSON object and a newline
+RECORD_SEPARATOR = 0x1E
+
+LineSink = Callable[[str], None]
+FrameSink = Callable[[dict], None]
+
+
+class StreamDemuxer:
+    """
+    Incremental parser for Docker's multiplexed attach/log stream.
+
+    Each frame is an 8-byte header (stream type, 3 zero bytes, big-endian
+    payload length) followed by the payload. Frames don't line up with lines
+    or with HTTP chunks, so partial headers, payloads and lines are carried
+    over between `feed` calls.
+
+    With `chunks=True` (agents running their process on a PTY) payloads are
+    passed on as decoded text as soon as they arrive instead of being split
+    into lines.
+
+    With a `frame_sink`, a stream whose first payload starts with a record
+    separator is treated as framed agent output: it is split into lines
+    (regardless of `chunks`, since terminal chunks travel inside the frames)
+    and every frame is decoded and handed to `frame_sink`. Other streams,
+    and lines that aren't valid frames, go to `sink` as plain text.
+    """
+
+    HEADER_SIZE = 8
+
+    def __init__(
+        self,
+        sink: LineSink,
+        multiplexed: bool = True,
+        chunks: bool = False,
+        frame_sink: Optional[FrameSink] = None,
+    ):
+        self._sink = sink
+        self._frame_sink = frame_sink
+        self._multiplexed = multiplexed
+        # Whether each stream carries frames, decided by its first payload
+        self._framed: Dict[int, bool] = {}
+        self._buffer = bytearray()
+        self._partial: Dict[int, bytearray] = {STDOUT: bytearray(), STDERR: bytearray()}
+        self._decoders = None
+        if chunks:
+            decoder = codecs.getincrementaldecoder("utf-8")
+            self._decoders = {STDOUT: decoder(errors="replace"), STDERR: decoder(errors="replace")}
+
+    def feed(self, data: bytes) -> None:
+        if not self._multiplexed:
+            self._emit(STDOUT, data)
+            return
+
+        buffer = self._buffer
+        buffer += data
+        offset = 0
+        end = len(buffer)
+        while end - offset >= self.HEADER_SIZE:
+            stream = buffer[offset]
+            size = int.from_bytes(buffer[offset + 4:offset + 8], "big")
+            if end - offset - self.HEADER_SIZE < size:
+                break
+            start = offset + self.HEADER_SIZE
+            self._emit(stream, buffer[start:start + size])
+            offset = start + size
+        del buffer[:offset]
+
+    def flush(self) -> None:
+        """Emit whatever partial lines are left at end of stream."""
+        if self._decoders:
+            for stream, decoder in self._decoders.items():
+                if not self._framed.get(stream) and (text := decoder.decode(b"", final=True)):
+                    self._sink(text)
+        for stream, partial in self._partial.items():
+            if partial:
+                self._line(stream, partial)
+                partial.clear()
+
+    def _emit(self, stream: int, payload: bytes) -> None:
+        if stream not in self._partial:
+            stream = STDOUT
+        framed = self._framed.get(stream)
+        if framed is None and payload:
+            framed = self._framed[stream] = self._frame_sink is not None and payload[0] == RECORD_SEPARATOR
+        if self._decoders and not framed:
+            if text := self._decoders[stream].decode(payload):
+                self._sink(text)
+            return
+        partial = self._partial[stream]
+        newline = payload.rfind(b"\n")
+        if newline < 0:
+            partial += payload
+            return
+        partial += payload[:newline]
+        for line in partial.split(b"\n"):
+            self._line(stream, line)
+        partial.clear()
+        partial += payload[newline + 1:]
+
+    def _line(self, stream: int, line: bytes) -> None:
+        if self._framed.get(stream) and line and line[0] == RECORD_SEPARATOR:
+            try:
+                frame = json.loads(line[1:])
+            except ValueError:
+                pass
+            else:
+                if isinstance(frame, dict):
+                    self._frame_sink(frame)
+                    return
+        self._sink(line.decode(errors="replace").rstrip("\r"))
+
+
+class LogMultiplexer:
+    """
+    Follows the log streams of every gateway container on the event loop.
+
+    Each followed container costs one coroutine and one socket rather than a
+    thread, so the manager can follow hundreds of gateways with a constant
+    thread count. Docker's stream framing is decoded here, not by docker-py.
+    """
+
+    def __init__(self, engine: DockerEngine):
+        self._engine = engine
+        self._streams: Dict[str, asyncio.Task] = {}
+
+    @property
+    def active_streams(self) -> int:
+        return len(self._streams)
+
+    def follow(
+        self,
+        container_id: str,
+        sink: LineSink,
+        tail: Optional[str] = None,
+        tty: bool = False,
+        throttle: Optional[Callable[[], float]] = None,
+        chunks: bool = False,
+        frame_sink: Optional[FrameSink] = None,
+    ) -> asyncio.Task:
+        """
+        Start following a container's stdout and stderr.
+
+        Args:
+            container_id: Container to follow.
+            sink: Called with every complete output line.
+            tail: Only replay this many existing lines ("all" by default).
+            tty: Whether the container has a TTY (its stream is then unframed).
+            throttle: Called after each chunk; returns how long to wait
+                before reading the next one (backpressure).
+            chunks: Pass output on in chunks as it arrives instead of lines.
+            frame_sink: Called with every decoded frame of framed agent
+                output (see StreamDemuxer).
+
+        Returns:
+            A task that finishes when the log stream ends (the container
+            stopped). Cancelling it stops following.
+        """
+        if container_id in self._streams:
+            raise ValueError(f"Already following container {container_id}")
+        task = asyncio.create_task(self._read(container_id, sink, tail, tty, throttle, chunks, frame_sink))
+        self._streams[container_id] = task
+        task.add_done_callback(lambda _: self._streams.pop(container_id, None))
+        return task
+
+    async def _read(
+        self,
+        container_id: str,
+        sink: LineSink,
+        tail: Optional[str],
+        tty: bool,
+        throttle: Optional[Callable[[], float]],
+        chunks: bool,
+        frame_sink: Optional[FrameSink],
+    ) -> None:
+        response = await self._engine.stream(
+            "GET",
+            f"/containers/{container_id}/logs",
+            params={"follow": "1", "stdout": "1", "stderr": "1", "tail": tail or "all"},
+        )
+        demuxer = StreamDemuxer(sink, multiplexed=not tty, chunks=chunks, frame_sink=frame_sink)
+        try:
+            async for chunk in response.iter_chunks():
+                demuxer.feed(chunk)
+                if throttle and (delay := throttle()) > 0:
+                    await asyncio.sleep(delay)
+        finally:
+            response.close()
+            demuxer.flush()
+
+    async def close(self) -> None:
+        tasks: List[asyncio.Task] = list(self._streams.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
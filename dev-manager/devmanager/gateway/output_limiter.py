@@ -0,0 +1,164 @@
+import time
+from enum import Enum
+from typing import Callable, Optional
+
+
+class OutputPolicy(str, Enum):
+    DROP = "drop"
+    """Discard lines over the limit and say how many were suppressed."""
+    SAMPLE = "sample"
+    """Like DROP, but still let one in every `sample_every` lines through."""
+    BACKPRESSURE = "backpressure"
+    """Keep every line but slow down reading the container's log stream."""
+
+
+class OutputLimiter:
+    """
+    Token-bucket rate limiter and repeat collapser in front of a gateway's
+    LogBus, so one project printing in a tight loop can't starve the manager
+    or its neighbours.
+
+    Two buckets (lines and characters per second, each holding
+    `burst_seconds` worth of tokens) are refilled lazily on every line. A run
+    of identical lines is published once, followed by a
+    "previous line repeated N times" marker. Markers go through `notice`
+    (default: `publish`).
+    """
+
+    # A run of repeats is reported at least this often, so a line printed
+    # forever still shows up periodically
+    REPEAT_REPORT_SECONDS = 1.0
+
+    def __init__(
+        self,
+        publish: Callable[[str], int],
+        lines_per_second: float,
+        bytes_per_second: float,
+        burst_seconds: float = 2.0,
+        policy: OutputPolicy = OutputPolicy.DROP,
+        sample_every: int = 100,
+        collapse_repeats: bool = True,
+        notice: Optional[Callable[[str], None]] = None,
+    ):
+        self._publish = publish
+        self._notice = notice or publish
+        self._lines_per_second = lines_per_second
+        self._bytes_per_second = bytes_per_second
+        self._line_burst = lines_per_second * burst_seconds
+        self._byte_burst = bytes_per_second * burst_seconds
+        self._line_tokens = self._line_burst
+        self._byte_tokens = self._byte_burst
+        self._updated = time.monotonic()
+        self._limited = lines_per_second > 0 or bytes_per_second > 0
+        self.policy = policy
+        self._sample_every = max(1, sample_every)
+        self._collapse = collapse_repeats
+
+        self._last_line: Optional[str] = None
+        self._repeats = 0
+        self._repeats_since = 0.0
+        self._pending_suppressed = 0
+
+        self.lines_in = 0
+        self.lines_out = 0
+        self.lines_suppressed = 0
+        self.lines_collapsed = 0
+        self.backpressure_seconds = 0.0
+
+    def feed(self, line: str) -> None:
+        self.lines_in += 1
+        if self._collapse:
+            if line == self._last_line:
+                now = time.monotonic()
+                if not self._repeats:
+                    self._repeats_since = now
+                self._repeats += 1
+                self.lines_collapsed += 1
+                if now - self._repeats_since >= self.REPEAT_REPORT_SECONDS:
+                    self._report_repeats()
+                return
+            if self._repeats:
+                self._report_repeats()
+            # Only published lines are collapsed; repeats of a dropped line are dropped too
+            self._last_line = None
+
+        if self._limited and not self._take(len(line)):
+            self._pending_suppressed += 1
+            self.lines_suppressed += 1
+            if self.policy != OutputPolicy.SAMPLE or self._pending_suppressed % self._sample_every:
+                return
+            # Sampled: let this one through despite the limit
+            self._pending_suppressed -= 1
+            self.lines_suppressed -= 1
+        if self._pending_suppressed:
+            self._report_suppressed()
+        self._publish(line)
+        self.lines_out += 1
+        if self._collapse:
+            self._last_line = line
+
+    def _take(self, size: int) -> bool:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self._lines_per_second > 0:
+            self._line_tokens = min(self._line_burst, self._line_tokens + elapsed * self._lines_per_second)
+        if self._bytes_per_second > 0:
+            self._byte_tokens = min(self._byte_burst, self._byte_tokens + elapsed * self._bytes_per_second)
+
+        over = (self._lines_per_second > 0 and self._line_tokens < 1) or (
+            self._bytes_per_second > 0 and self._byte_tokens < size
+        )
+        if over and self.policy != OutputPolicy.BACKPRESSURE:
+            return False
+        # Backpressure goes into debt; `delay` turns the debt into reader sleep time
+        self._line_tokens -= 1
+        self._byte_tokens -= size
+        return True
+
+    def delay(self) -> float:
+        """
+        Seconds the log reader should wait before reading more (only with the
+        BACKPRESSURE policy, while the buckets are in debt).
+        """
+        if self.policy != OutputPolicy.BACKPRESSURE or not self._limited:
+            return 0.0
+        delay = 0.0
+        if self._lines_per_second > 0 and self._line_tokens < 0:
+            delay = -self._line_tokens / self._lines_per_second
+        if self._bytes_per_second > 0 and self._byte_tokens < 0:
+            delay = max(delay, -self._byte_tokens / self._bytes_per_second)
+        self.backpressure_seconds += delay
+        return delay
+
+    def _report_repeats(self) -> None:
+        self._notice(f"[MANAGER] previous line repeated {self._repeats} times")
+        self._repeats = 0
+
+    def _report_suppressed(self) -> None:
+        if self.policy == OutputPolicy.SAMPLE:
+            self._notice(
+                f"[MANAGER] {self._pending_suppressed} lines suppressed "
+                f"(output rate limit, showing 1 in {self._sample_every})"
+            )
+        else:
+            self._notice(f"[MANAGER] {self._pending_suppressed} lines suppressed (output rate limit)")
+        self._pending_suppressed = 0
+
+    def flush(self) -> None:
+        """Publishes pending repeat/suppression markers, e.g. when the stream ends."""
+        if self._repeats:
+            self._report_repeats()
+        if self._pending_suppressed:
+            self._report_suppressed()
+        self._last_line = None
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy.value,
+            "lines_in": self.lines_in,
+            "lines_out": self.lines_out,
+            "lines_suppressed": self.lines_suppressed,
+            "lines_collapsed": self.lines_collapsed,
+            "backpressure_seconds": self.backpressure_seconds,
+        }
@@ -1,42 +1,372 @@
 import asyncio
-from typing import Optional, List, Dict
-from devmanager.gateway.gateway import Gateway, GatewayState
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, List, Dict, Union
+from devmanager.admission import AdmissionRejected
+from devmanager.config import settings
+from devmanager.engine import DockerEngine
+from devmanager.gateway.gateway import (
+    CONTAINER_PREFIX,
+    LABEL_COMMAND,
+    LABEL_LIMITS,
+    LABEL_MANAGED,
+    LABEL_PROCESSES,
+    LABEL_PROJECT_ID,
+    LABEL_PTY,
+    LABEL_WATCH,
+    LABEL_WORKING_DIRECTORY,
+    Gateway,
+    GatewayState,
+    ResourceLimits,
+)
+from devmanager.docker_hosts import DockerHost, HashRing
+from devmanager.gateway_pool import POOL_CONTAINER_PREFIX
+from devmanager.idle_policy import IdlePolicy
+from devmanager.log_archive import LogArchive
+from devmanager.log_search import SearchQuery
+from devmanager.metrics import (
+    LoopLagMonitor,
+    Metric,
+    gateway_first_output_seconds,
+    process_first_output_seconds,
+    process_reload_seconds,
+)
+from devmanager.state_store import StateStore
+
+logger = logging.getLogger(__name__)
 
 class GatewayManager:
     """
     Manages all Gateway (Docker container) instances.
+    
+    Gateways are spread over one or more Docker hosts (`docker_hosts`). A new
+    gateway goes to the least loaded of its `placement_candidates` preferred
+    hosts on a consistent hash ring keyed by project id, so projects keep
+    landing on the same hosts while load stays even.
     """
     
-    def __init__(self):
+    def __init__(self, engines: Optional[List[DockerEngine]] = None):
         self._gateways: Dict[str, Gateway] = {}
+        self._hosts: Dict[str, DockerHost] = {}
+        self._ring = HashRing()
+        if engines is None:
+            # One Docker client (and connection pool) per host, shared by its gateways
+            engines = [DockerEngine(url) for url in settings.docker_hosts or [settings.docker_host]]
+        for engine in engines:
+            self._register_host(engine)
+        self._idle = IdlePolicy(self)
+        self._store = StateStore(settings.state_db_path or os.path.join(settings.storage_path, "devmanager.db"))
+        self._archive: Optional[LogArchive] = None
+        if settings.log_archive_enabled:
+            self._archive = LogArchive(
+                os.path.join(settings.storage_path, "logs"),
+                settings.log_segment_bytes,
+                settings.log_block_bytes,
+                settings.log_flush_seconds,
+                settings.log_retention_bytes,
+                settings.log_retention_hours * 3600,
+            )
+        self._admitting: Dict[str, asyncio.Task] = {}
+        self._loop_lag = LoopLagMonitor()
     
     @property
     def gateways(self) -> Dict[str, Gateway]:
         return self._gateways
     
+    @property
+    def hosts(self) -> Dict[str, DockerHost]:
+        return self._hosts
+    
+    @property
+    def idle_policy(self) -> IdlePolicy:
+        return self._idle
+    
+    @property
+    def store(self) -> StateStore:
+        return self._store
+    
+    def _register_host(self, engine: DockerEngine) -> DockerHost:
+        host = DockerHost(engine, self._on_docker_event)
+        self._hosts[host.url] = host
+        self._ring.add(host.url)
+        return host
+    
+    def host_of(self, gateway: Gateway) -> DockerHost:
+        return self._hosts[gateway.engine.url]
+    
+    async def start(self) -> None:
+        """Re-adopts containers from a previous run, then starts background work."""
+        self._store.open()
+        if self._archive:
+            self._archive.start()
+        await asyncio.gather(*(self._start_host(host) for host in self._hosts.values()))
+        await self._mark_lost()
+        self._idle.start()
+        self._loop_lag.start()
+    
+    async def _mark_lost(self) -> None:
+        """Records gateways the store thinks are live but that weren't found on any host."""
+        for state in (GatewayState.PENDING, GatewayState.RUNNING, GatewayState.PAUSED):
+            for record in await self._store.list_gateways(state=state.value, limit=None):
+                if record["project_id"] not in self._gateways:
+                    record.update(state=GatewayState.STOPPED.value, state_changed_at=time.time())
+                    self._store.save_gateway(record)
+                    self._store.record_event(record["project_id"], "lost", {"host": record["host"]})
+    
+    async def _start_host(self, host: DockerHost) -> None:
+        # Capacity must be known before adopted gateways are committed against it,
+        # and events are subscribed first so nothing during reconciliation is missed
+        await host.start()
+        try:
+            await self.reconcile(host)
+        except Exception:
+            logger.exception("Failed to reconcile existing gateway containers on %s", host.url)
+        host.pool.start()
+    
+    async def reconcile(self, host: DockerHost) -> int:
+        """
+        Re-adopts gateway containers left running on a host by a previous
+        manager process.
+        
+        Project gateways are registered again with their log streams re-attached;
+        unbound standby containers go back into the warm pool (or are removed if
+        it is full).
+        
+        Returns:
+            The number of project gateways adopted.
+        """
+        containers = await host.engine.list_containers(
+            filters={"label": [f"{LABEL_MANAGED}=true"]}
+        )
+        adopted = 0
+        for container in containers:
+            container_id = container["Id"]
+            name = (container.get("Names") or ["/"])[0].lstrip("/")
+            labels = container.get("Labels") or {}
+            
+            if name.startswith(POOL_CONTAINER_PREFIX):
+                if not host.pool.adopt(container_id):
+                    await host.engine.remove_container(container_id, force=True)
+                continue
+            
+            # Containers bound from the pool only carry the project in their name
+            project_id = labels.get(LABEL_PROJECT_ID) or name.removeprefix(CONTAINER_PREFIX)
+            if not project_id or project_id in self._gateways:
+                continue
+            # Pool-bound containers have no project labels; the store remembers them
+            record = await self._store.get_gateway(project_id) or {}
+            gateway = self._new_gateway(
+                host,
+                project_id,
+                labels.get(LABEL_WORKING_DIRECTORY) or record.get("working_directory", ""),
+                json.loads(labels[LABEL_COMMAND]) if LABEL_COMMAND in labels else record.get("command", []),
+                ResourceLimits.from_label(labels.get(LABEL_LIMITS) or json.dumps(record.get("limits"))),
+                owner=record.get("owner"),
+                pty=labels[LABEL_PTY] == "true" if LABEL_PTY in labels else bool(record.get("pty")),
+                processes=(
+                    json.loads(labels[LABEL_PROCESSES]) if LABEL_PROCESSES in labels else record.get("processes")
+                ),
+                watch=json.loads(labels[LABEL_WATCH]) if LABEL_WATCH in labels else record.get("watch"),
+            )
+            if record.get("created_at"):
+                gateway.created_at = record["created_at"]
+                gateway.started_at = record["started_at"]
+            await gateway.adopt(container_id, paused=container.get("State") == "paused")
+            adopted += 1
+        return adopted
+    
+    def _on_docker_event(self, host: DockerHost, event: dict) -> None:
+        actor = event.get("Actor") or {}
+        container_id = actor.get("ID")
+        attributes = actor.get("Attributes") or {}
+        name = attributes.get("name", "")
+        action = event.get("Action", "")
+        
+        if name.startswith(POOL_CONTAINER_PREFIX):
+            if action == "die":
+                host.pool.discard(container_id)
+            return
+        
+        project_id = attributes.get(LABEL_PROJECT_ID) or name.removeprefix(CONTAINER_PREFIX)
+        gateway = self._gateways.get(project_id)
+        if gateway and gateway.engine is host.engine and gateway.container_id == container_id:
+            gateway.handle_event(action, attributes)
+            if action in ("die", "oom"):
+                # Exit code / OOM may arrive after the state already changed
+                self._save(gateway)
+    
     def get_gateway(self, project_id: str) -> Optional[Gateway]:
         return self._gateways.get(project_id)
     
+    async def ensure_awake(self, project_id: str) -> Optional[Gateway]:
+        """
+        Gets a gateway on behalf of a client, resuming it if it was paused for
+        being idle.
+        """
+        gateway = self._gateways.get(project_id)
+        if gateway:
+            await self._idle.ensure_awake(gateway)
+        return gateway
+    
+    def _new_gateway(
+        self,
+        host: DockerHost,
+        project_id: str,
+        working_directory: str,
+        command: List[str],
+        limits: ResourceLimits,
+        owner: Optional[str] = None,
+        pty: bool = False,
+        processes: Optional[List[dict]] = None,
+        watch: Optional[dict] = None,
+    ) -> Gateway:
+        gateway = Gateway(
+            project_id, working_directory, command, host.engine, host.logs, limits, owner, pty, processes, watch
+        )
+        gateway.on_state_change = self._on_gateway_state
+        if self._archive:
+            gateway.output.tap = self._archive.writer(project_id).append
+        self._gateways[project_id] = gateway
+        return gateway
+    
+    def _save(self, gateway: Gateway) -> None:
+        self._store.save_gateway({
+            "project_id": gateway.project_id,
+            "owner": gateway.owner,
+            "host": gateway.engine.url,
+            "state": gateway.state.value,
+            "working_directory": gateway.working_directory,
+            "command": gateway.command,
+            "limits": gateway.limits._asdict(),
+            "container_id": gateway.container_id,
+            "created_at": gateway.created_at,
+            "started_at": gateway.started_at,
+            "state_changed_at": gateway.state_changed_at,
+            "exit_code": gateway.exit_code,
+            "oom_killed": gateway.oom_killed,
+            "pty": gateway.pty,
+            "processes": gateway.processes,
+            "watch": gateway.watch,
+        })
+    
+    def _on_gateway_state(self, gateway: Gateway, state: GatewayState) -> None:
+        # Keep committed capacity in line with what is actually running,
+        # including containers adopted or restarted outside the admission queue
+        self._save(gateway)
+        self._store.record_event(gateway.project_id, state.value, {
+            "host": gateway.engine.url,
+            "container_id": gateway.container_id,
+            "exit_code": gateway.exit_code,
+        })
+        admission = self.host_of(gateway).admission
+        if state == GatewayState.STOPPED:
+            admission.release(gateway.project_id)
+        elif state in (GatewayState.RUNNING, GatewayState.PAUSED):
+            admission.commit(gateway.project_id, gateway.limits)
+    
+    def _place(self, project_id: str, limits: ResourceLimits) -> DockerHost:
+        """Picks the host for a new gateway."""
+        active = [host for host in self._hosts.values() if not host.draining]
+        if not active:
+            raise AdmissionRejected("No Docker hosts are accepting gateways")
+        draining = {host.url for host in self._hosts.values() if host.draining}
+        candidates = [
+            self._hosts[url]
+            for url in self._ring.preferred(project_id, settings.placement_candidates, exclude=draining)
+        ]
+        # If none of the preferred hosts can start it now, any host that can will do
+        if not any(host.admission.would_admit(limits) for host in candidates):
+            candidates = [host for host in active if host.admission.would_admit(limits)] or candidates
+        # min() is stable, so ties go to the host earliest on the ring
+        return min(candidates, key=lambda host: (not host.admission.would_admit(limits), host.load))
+    
     async def create_gateway(
         self,
         project_id: str,
         working_directory: str,
-        command: List[str]
+        command: List[str],
+        limits: Optional[ResourceLimits] = None,
+        owner: Optional[str] = None,
+        pty: bool = False,
+        processes: Optional[List[dict]] = None,
+        watch: Optional[dict] = None,
     ) -> Gateway:
+        """
+        Creates a gateway on the best host and starts it once that host's
+        admission scheduler lets it.
+        
+        With `processes` (a list of named process configurations) the agent
+        supervises those processes instead of running `command`. With
+        `watch` (watch mode options) the agent restarts the process in place
+        when project files change.
+        
+        If the host has no spare capacity the gateway is returned still
+        pending and starts in the background when capacity frees up (see
+        `get_queue_position`).
+        
+        Raises:
+            ValueError: If the project already has a gateway.
+            AdmissionRejected: If the start would never fit or the queue is full.
+        """
         if project_id in self._gateways:
             raise ValueError(f"Gateway already exists for project {project_id}")
         
-        gateway = Gateway(project_id, working_directory, command)
-        self._gateways[project_id] = gateway
-        await gateway.run()
+        limits = limits or ResourceLimits.from_settings()
+        return await self._create_on(
+            self._place(project_id, limits), project_id, working_directory, command, limits, owner, pty,
+            processes, watch,
+        )
+    
+    async def _create_on(
+        self,
+        host: DockerHost,
+        project_id: str,
+        working_directory: str,
+        command: List[str],
+        limits: ResourceLimits,
+        owner: Optional[str] = None,
+        pty: bool = False,
+        processes: Optional[List[dict]] = None,
+        watch: Optional[dict] = None,
+    ) -> Gateway:
+        """Creates a gateway on `host` (see `create_gateway`)."""
+        admitted = host.admission.reserve(project_id, limits)
+        gateway = self._new_gateway(
+            host, project_id, working_directory, command, limits, owner, pty, processes, watch
+        )
+        self._save(gateway)
+        self._store.record_event(project_id, "created", {"host": host.url, "queued": admitted is not None})
+        if admitted is None:
+            await gateway.run(host.pool.acquire())
+        else:
+            gateway.notice("[MANAGER] Waiting for host capacity")
+            task = asyncio.create_task(self._start_when_admitted(gateway, admitted))
+            self._admitting[project_id] = task
+            task.add_done_callback(lambda _: self._admitting.pop(project_id, None))
         
         return gateway
     
+    async def _start_when_admitted(self, gateway: Gateway, admitted: asyncio.Future) -> None:
+        await admitted
+        try:
+            await gateway.run(self.host_of(gateway).pool.acquire())
+        except Exception:
+            logger.exception("Failed to start queued gateway %s", gateway.project_id)
+    
+    def get_queue_position(self, project_id: str) -> Optional[int]:
+        gateway = self._gateways.get(project_id)
+        return self.host_of(gateway).admission.queue_position(project_id) if gateway else None
+    
     async def stop_gateway(self, project_id: str) -> bool:
         gateway = self._gateways.pop(project_id, None)
         if gateway is None:
             return False
         
+        self._idle.release(gateway)
+        self.host_of(gateway).admission.release(project_id)
         await gateway.shutdown()
         return True
     
@@ -50,10 +380,45 @@ class GatewayManager:
     async def resume_gateway(self, project_id: str) -> bool:
         gateway = self._gateways.get(project_id)
         if gateway:
+            gateway.touch()
             await gateway.resume()
+            self._idle.release(gateway)
             return True
         return False
     
+    async def restart_process(self, project_id: str, process: Optional[str] = None) -> Optional[dict]:
+        """
+        Restarts a gateway's project process (or one supervised process)
+        through its agent, without recreating the container.
+        
+        Returns:
+            The agent's process status, or None if there is no such gateway.
+        
+        Raises:
+            RuntimeError: If the gateway is not running.
+            GatewayControlError: If the agent couldn't be reached or refused.
+        """
+        gateway = await self.ensure_awake(project_id)
+        if not gateway:
+            return None
+        gateway.touch()
+        return await gateway.restart_process(process)
+    
+    async def signal_gateway(
+        self, project_id: str, signal: Union[str, int], process: Optional[str] = None
+    ) -> Optional[dict]:
+        """Sends a signal to a gateway's project process; see `restart_process`."""
+        gateway = await self.ensure_awake(project_id)
+        if not gateway:
+            return None
+        gateway.touch()
+        return await gateway.send_signal(signal, process)
+    
+    async def get_process_status(self, project_id: str) -> Optional[dict]:
+        """The agent's live status of a gateway's process(es); see `restart_process`."""
+        gateway = self._gateways.get(project_id)
+        return await gateway.process_status() if gateway else None
+    
     def get_gateway_status(self, project_id: str) -> Optional[dict]:
         gateway = self._gateways.get(project_id)
         if not gateway:
@@ -61,16 +426,356 @@ class GatewayManager:
         return {
             "project_id": gateway.project_id,
             "state": gateway.state.value,
+            "owner": gateway.owner,
+            "host": gateway.engine.url,
+            "queue_position": self.get_queue_position(project_id),
+            "limits": gateway.limits._asdict(),
             "working_directory": gateway.working_directory,
             "command": gateway.command,
+            "pooled": gateway.pooled,
+            "first_output_latency": gateway.first_output_latency,
+            "process_first_output_latency": gateway.process_first_output_latency,
+            "exit_code": gateway.exit_code,
+            "oom_killed": gateway.oom_killed,
+            "pty": gateway.pty,
+            "processes": gateway.processes,
+            "process_states": gateway.process_states or None,
+            "watch": gateway.watch,
+            "reloads": gateway.reloads,
+            "last_reload_latency": gateway.last_reload_latency,
+            "created_at": gateway.created_at,
+            "started_at": gateway.started_at,
+            "state_changed_at": gateway.state_changed_at,
+            "auto_paused": gateway.auto_paused,
+            "idle_seconds": gateway.idle_seconds(),
+            "idle_pause_minutes": self._idle.get_timeout(project_id),
+            "cpu_seconds_reclaimed": gateway.cpu_seconds_reclaimed,
+            "output": {
+                **gateway.limiter.stats(),
+                "streams": dict(gateway.stream_lines),
+                "agent_lines_dropped": gateway.agent_lines_dropped,
+            },
+        }
+    
+    def get_pool_status(self) -> dict:
+        return {
+            "hosts": {url: {**host.pool.stats(), "admission": host.admission.stats()} for url, host in self._hosts.items()},
+            "first_output_seconds": gateway_first_output_seconds.snapshot(),
+            "process_first_output_seconds": process_first_output_seconds.snapshot(),
+            "process_reload_seconds": process_reload_seconds.snapshot(),
         }
     
     def list_gateways(self) -> List[dict]:
         return [
-            {"project_id": gw.project_id, "state": gw.state.value}
+            {
+                "project_id": gw.project_id,
+                "state": gw.state.value,
+                "exit_code": gw.exit_code,
+                "host": gw.engine.url,
+            }
             for gw in self._gateways.values()
         ]
     
+    async def query_gateways(
+        self,
+        state: Optional[str] = None,
+        owner: Optional[str] = None,
+        host: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[dict]:
+        """
+        Gateway records from the state store, including stopped ones, ordered
+        by project id and paginated with `cursor` (the last project id seen).
+        """
+        await self._store.flush()
+        return await self._store.list_gateways(state, owner, host, cursor, limit)
+    
+    async def get_gateway_record(self, project_id: str) -> Optional[dict]:
+        """The stored record of a gateway, which outlives the gateway itself."""
+        await self._store.flush()
+        return await self._store.get_gateway(project_id)
+    
+    async def get_gateway_events(
+        self, project_id: str, cursor: Optional[int] = None, limit: int = 100
+    ) -> List[dict]:
+        await self._store.flush()
+        return await self._store.list_events(project_id, cursor, limit)
+    
+    async def get_gateway_logs(
+        self,
+        project_id: str,
+        from_seq: Optional[int] = None,
+        to_seq: Optional[int] = None,
+        from_time: Optional[float] = None,
+        to_time: Optional[float] = None,
+        limit: int = 1000,
+    ) -> Optional[dict]:
+        """
+        Archived output of a gateway (including stopped ones) as
+        {"lines": [{"seq", "ts", "line"}, ...], "next": seq of the next page or None}.
+        """
+        if not self._archive:
+            return None
+        lines, next_seq = await self._archive.read(project_id, from_seq, to_seq, from_time, to_time, limit)
+        return {
+            "lines": [{"seq": seq, "ts": ts, "line": line} for seq, ts, line in lines],
+            "next": next_seq,
+        }
+    
+    async def search_logs(
+        self,
+        query: str,
+        project_id: Optional[str] = None,
+        regex: bool = False,
+        ignore_case: bool = False,
+        context: int = 2,
+        from_seq: Optional[int] = None,
+        limit: int = 100,
+    ) -> Optional[dict]:
+        """
+        Archived lines matching a substring (or regex) query, in one gateway's
+        history or across all gateways when `project_id` is None.
+
+        Raises:
+            ValueError: If `query` is not a valid regular expression.
+        """
+        if not self._archive:
+            return None
+        search = SearchQuery(query, regex, ignore_case)
+        timeout = settings.log_search_timeout_seconds
+        if project_id is None:
+            matches, truncated = await self._archive.search_all(search, context, limit, timeout)
+            return {"matches": matches, "truncated": truncated}
+        matches, next_seq, truncated = await self._archive.search(
+            project_id, search, context, from_seq, limit, timeout
+        )
+        return {"matches": matches, "next": next_seq, "truncated": truncated}
+    
+    def collect_metrics(self) -> List[Metric]:
+        """Gauges and counters read at scrape time (see metrics.render)."""
+        gateways = list(self._gateways.values())
+        hosts = list(self._hosts.values())
+        states: Dict[str, int] = {state.value: 0 for state in GatewayState}
+        for gw in gateways:
+            states[gw.state.value] += 1
+        
+        def per_gateway(value: Callable[[Gateway], float]):
+            return [({"project_id": gw.project_id}, value(gw)) for gw in gateways]
+        
+        def per_host(value: Callable[[DockerHost], float]):
+            return [({"host": host.url}, value(host)) for host in hosts]
+        
+        return [
+            ("devmanager_gateways", "gauge", "Gateways by state.",
+             [({"state": state}, count) for state, count in states.items()]),
+            ("devmanager_gateway_output_lines_total", "counter", "Output lines published by a gateway.",
+             per_gateway(lambda gw: gw.output.next_seq)),
+            ("devmanager_gateway_stream_lines_total", "counter",
+             "Output lines received from a gateway's agent, by process stream.",
+             [({"project_id": gw.project_id, "stream": stream}, count)
+              for gw in gateways for stream, count in gw.stream_lines.items()]),
+            ("devmanager_gateway_agent_dropped_lines_total", "counter",
+             "Output lines a gateway's agent dropped before the manager read them.",
+             per_gateway(lambda gw: gw.agent_lines_dropped)),
+            ("devmanager_gateway_output_bytes_total", "counter", "Output characters published by a gateway.",
+             per_gateway(lambda gw: gw.output.published_bytes)),
+            ("devmanager_gateway_output_suppressed_lines_total", "counter",
+             "Output lines dropped by a gateway's rate limiter.",
+             per_gateway(lambda gw: gw.limiter.lines_suppressed)),
+            ("devmanager_gateway_output_collapsed_lines_total", "counter",
+             "Repeated output lines collapsed into a repeat marker.",
+             per_gateway(lambda gw: gw.limiter.lines_collapsed)),
+            ("devmanager_gateway_output_backpressure_seconds_total", "counter",
+             "Time a gateway's log stream reader was held back by its rate limiter.",
+             per_gateway(lambda gw: gw.limiter.backpressure_seconds)),
+            ("devmanager_gateway_buffered_lines", "gauge", "Lines held in a gateway's console scrollback.",
+             per_gateway(lambda gw: gw.output.buffered_lines)),
+            ("devmanager_gateway_buffered_bytes", "gauge", "Characters held in a gateway's console scrollback.",
+             per_gateway(lambda gw: gw.output.buffered_bytes)),
+            ("devmanager_console_subscribers", "gauge", "Console viewers attached to a gateway.",
+             per_gateway(lambda gw: gw.output.subscriber_count)),
+            ("devmanager_console_lag_lines", "gauge", "Lines the slowest console viewer of a gateway is behind.",
+             per_gateway(lambda gw: gw.output.max_subscriber_lag)),
+            ("devmanager_admission_queue_depth", "gauge", "Gateway starts waiting for host capacity.",
+             per_host(lambda host: len(host.admission.stats()["queue"]))),
+            ("devmanager_admission_committed_cpus", "gauge", "CPUs committed to gateways on a host.",
+             per_host(lambda host: host.admission.committed_cpus)),
+            ("devmanager_admission_committed_memory_mb", "gauge", "Memory committed to gateways on a host.",
+             per_host(lambda host: host.admission.committed_memory_mb)),
+            ("devmanager_pool_idle_containers", "gauge", "Warm standby containers ready on a host.",
+             per_host(lambda host: host.pool.idle)),
+            ("devmanager_log_streams", "gauge", "Container log streams followed on a host.",
+             per_host(lambda host: host.logs.active_streams)),
+            ("devmanager_docker_idle_connections", "gauge", "Idle keep-alive connections to a Docker host.",
+             per_host(lambda host: host.engine.pool.idle_connections)),
+            ("devmanager_state_store_pending_writes", "gauge", "State store writes waiting for the writer thread.",
+             [({}, self._store.pending_writes)]),
+            ("devmanager_log_archive_pending_blocks", "gauge", "Output blocks waiting to be written to the archive.",
+             [({}, self._archive.pending_blocks if self._archive else 0)]),
+            ("devmanager_threads", "gauge", "Threads in the manager process.",
+             [({}, threading.active_count())]),
+            ("devmanager_process_cpu_seconds_total", "counter", "CPU time used by the manager process.",
+             [({}, time.process_time())]),
+        ]
+    
+    def list_hosts(self) -> List[dict]:
+        return [
+            {**host.stats(), "gateways": sum(1 for gw in self._gateways.values() if gw.engine is host.engine)}
+            for host in self._hosts.values()
+        ]
+    
+    async def add_host(self, url: str) -> None:
+        """
+        Starts managing another Docker endpoint (adopting any gateways already
+        on it). Running gateways stay where they are; new ones start landing
+        on the host, and `rebalance(spread=True)` moves idle ones onto it.
+        
+        Raises:
+            ValueError: If the host is already managed.
+        """
+        if url in self._hosts:
+            raise ValueError(f"Docker host {url} is already managed")
+        await self._start_host(self._register_host(DockerEngine(url)))
+    
+    async def drain_host(self, url: str) -> Dict[str, dict]:
+        """
+        Stops placing gateways on a host and moves its gateways elsewhere.
+        
+        Raises:
+            KeyError: If the host isn't managed.
+        """
+        self._hosts[url].draining = True
+        return await self.rebalance()
+    
+    async def remove_host(self, url: str) -> None:
+        """
+        Stops managing a drained host.
+        
+        Raises:
+            KeyError: If the host isn't managed.
+            ValueError: If gateways still run on it.
+        """
+        host = self._hosts[url]
+        gateways = [gw for gw in self._gateways.values() if gw.engine is host.engine]
+        if any(gw.state != GatewayState.STOPPED for gw in gateways):
+            raise ValueError(f"Docker host {url} still runs gateways; drain it first")
+        for gateway in gateways:
+            del self._gateways[gateway.project_id]
+        self._ring.remove(url)
+        del self._hosts[url]
+        await host.close()
+    
+    async def rebalance(self, spread: bool = False) -> Dict[str, dict]:
+        """
+        Moves gateways off draining hosts. With `spread`, also moves gateways
+        nobody is watching whose host dropped out of their preferred hosts
+        (e.g. after one was added); only on request, since a move restarts
+        the project's process on its new host. A gateway whose new host fails
+        to start it is restored on its old one.
+        
+        Returns:
+            Per-project results as in `run_bulk`, with the new host on success.
+        """
+        draining = {url for url, host in self._hosts.items() if host.draining}
+        moves = []
+        for gateway in self._gateways.values():
+            url = gateway.engine.url
+            if gateway.state == GatewayState.STOPPED:
+                continue
+            if url in draining:
+                moves.append(gateway.project_id)
+            elif spread and gateway.output.subscriber_count == 0 and url not in self._ring.preferred(
+                gateway.project_id, settings.placement_candidates, exclude=draining
+            ):
+                moves.append(gateway.project_id)
+        return await self.run_bulk(moves, self._move_gateway)
+    
+    async def _move_gateway(self, project_id: str) -> str:
+        gateway = self._gateways[project_id]
+        origin = self.host_of(gateway)
+        config = (
+            gateway.working_directory, gateway.command, gateway.limits, gateway.owner, gateway.pty,
+            gateway.processes, gateway.watch,
+        )
+        await self.stop_gateway(project_id)
+        try:
+            moved = await self.create_gateway(project_id, *config)
+        except Exception as e:
+            # Never leave the project without a container: put it back where it was
+            self._store.record_event(project_id, "move_failed", {"host": origin.url, "error": str(e)})
+            if project_id in self._gateways:
+                await self.stop_gateway(project_id)
+            try:
+                await self._create_on(origin, project_id, *config)
+            except Exception as restore_error:
+                raise RuntimeError(
+                    f"Move failed ({e}) and restoring on {origin.url} failed: {restore_error}"
+                ) from restore_error
+            raise RuntimeError(f"Move failed, restored on {origin.url}: {e}") from e
+        return moved.engine.url
+    
+    async def run_bulk(
+        self,
+        project_ids: List[str],
+        operation: Callable[[str], Awaitable[Any]],
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, dict]:
+        """
+        Runs `operation` for many projects in parallel.
+        
+        At most `concurrency` operations run at once and the whole batch is
+        bounded by `timeout` seconds; operations still running then are
+        cancelled and reported as timed out.
+        
+        Returns:
+            Per-project results: {"ok": True, "result": ...} or {"ok": False, "error": ...}.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.bulk_concurrency)
+        
+        async def run_one(project_id: str) -> dict:
+            async with semaphore:
+                try:
+                    return {"ok": True, "result": await operation(project_id)}
+                except Exception as e:
+                    return {"ok": False, "error": str(e)}
+        
+        tasks = {pid: asyncio.create_task(run_one(pid)) for pid in dict.fromkeys(project_ids)}
+        if not tasks:
+            return {}
+        _, pending = await asyncio.wait(
+            tasks.values(), timeout=timeout if timeout is not None else settings.bulk_timeout_seconds
+        )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+        return {
+            pid: {"ok": False, "error": "timed out"} if task in pending else task.result()
+            for pid, task in tasks.items()
+        }
+    
     async def shutdown_all(self) -> None:
-        for pid in list(self._gateways.keys()):
-            await self.stop_gateway(pid)
\ No newline at end of file
+        """
+        Stops every gateway concurrently (bounded by shutdown_concurrency).
+        Gateways still stopping at shutdown_deadline_seconds are killed.
+        """
+        await self._idle.close()
+        await self._loop_lag.close()
+        for task in list(self._admitting.values()):
+            task.cancel()
+        gateways = list(self._gateways.values())
+        results = await self.run_bulk(
+            [gw.project_id for gw in gateways],
+            self.stop_gateway,
+            concurrency=settings.shutdown_concurrency,
+            timeout=settings.shutdown_deadline_seconds,
+        )
+        stragglers = [gw for gw in gateways if not results[gw.project_id]["ok"]]
+        await asyncio.gather(*(gw.kill() for gw in stragglers), return_exceptions=True)
+        
+        await asyncio.gather(*(host.close() for host in self._hosts.values()))
+        if self._archive:
+            await self._archive.close()
+        await self._store.close()
\ No newline at end of file
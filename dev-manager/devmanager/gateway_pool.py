@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional
+from uuid import uuid4
+
+from devmanager.engine import DockerEngine, DockerEngineError
+from devmanager.gateway.gateway import CONTAINER_PREFIX, LABEL_POOL, build_container_config
+
+logger = logging.getLogger(__name__)
+
+POOL_CONTAINER_PREFIX = f"{CONTAINER_PREFIX}pool-"
+
+
+class GatewayPool:
+    """
+    Keeps a number of started, idle agent containers ready to be bound to a
+    project, so a start request skips container creation and agent startup.
+
+    Pooled agents run in standby mode and wait for their project assignment on
+    stdin. A background task refills the pool whenever a container is taken.
+    """
+
+    def __init__(self, engine: DockerEngine, size: int):
+        self._engine = engine
+        self._size = size
+        self._idle: Deque[str] = deque()
+        self._creating = 0
+        self._wakeup = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def start(self) -> None:
+        if self._size > 0 and self._refill_task is None:
+            self._refill_task = asyncio.create_task(self._refill_loop())
+
+    def acquire(self) -> Optional[str]:
+        """
+        Take an idle container out of the pool.
+
+        Returns:
+            The container id, or None if the pool is empty.
+        """
+        self._wakeup.set()
+        if self._idle:
+            self.hits += 1
+            return self._idle.popleft()
+        self.misses += 1
+        return None
+
+    def adopt(self, container_id: str) -> bool:
+        """
+        Put an existing standby container (e.g. found after a restart) back
+        into the pool.
+
+        Returns:
+            False if the pool is already full and the container wasn't taken.
+        """
+        if len(self._idle) + self._creating >= self._size:
+            return False
+        self._idle.append(container_id)
+        return True
+
+    def discard(self, container_id: str) -> None:
+        """Forget an idle container that died on its own and trigger a refill."""
+        try:
+            self._idle.remove(container_id)
+        except ValueError:
+            return
+        self._wakeup.set()
+
+    async def _refill_loop(self) -> None:
+        backoff = 1.0
+        while True:
+            missing = self._size - len(self._idle) - self._creating
+            if missing <= 0:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            results = await asyncio.gather(
+                *(self._create() for _ in range(missing)), return_exceptions=True
+            )
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                logger.warning(
+                    "Failed to create %d of %d pooled gateway containers: %s", len(errors), missing, errors[0]
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+            else:
+                backoff = 1.0
+
+    async def _create(self) -> None:
+        self._creating += 1
+        try:
+            container_id = await self._engine.create_container(
+                f"{POOL_CONTAINER_PREFIX}{uuid4().hex[:12]}",
+                build_container_config({"GATEWAY_STANDBY": "1"}, {LABEL_POOL: "true"}, stdin=True),
+            )
+            try:
+                await self._engine.start_container(container_id)
+            except DockerEngineError:
+                await self._engine.remove_container(container_id, force=True)
+                raise
+            self._idle.append(container_id)
+        finally:
+            self._creating -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "creating": self._creating,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    async def close(self) -> None:
+        """Stop refilling and remove every idle container."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+            self._refill_task = None
+        idle, self._idle = list(self._idle), deque()
+        await asyncio.gather(
+            *(self._engine.remove_container(cid, force=True) for cid in idle),
+            return_exceptions=True,
+        )
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from devmanager.config import settings
+from devmanager.engine import DockerEngineError
+from devmanager.gateway.gateway import Gateway, GatewayState
+
+if TYPE_CHECKING:
+    from devmanager.gateway_manager import GatewayManager
+
+logger = logging.getLogger(__name__)
+
+
+class IdlePolicy:
+    """
+    Pauses gateways nobody is using and wakes them up on demand.
+
+    A running gateway is idle once it has had no console subscribers, no
+    output and no API activity for its idle timeout (`idle_pause_minutes`,
+    off by default, set per project). Gateways paused this way are resumed when a
+    console connects or an API call targets them; gateways paused explicitly
+    are left alone.
+    """
+
+    def __init__(self, manager: "GatewayManager"):
+        self._manager = manager
+        self._overrides: Dict[str, float] = {}
+        self._paused_at: Dict[str, float] = {}
+        self._cpu_rate: Dict[str, float] = {}
+        self._pausing: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.auto_pauses = 0
+        self.wakeups = 0
+        self.cpu_seconds_reclaimed = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def get_timeout(self, project_id: str) -> float:
+        """Idle timeout in minutes for a project (0 = never pause)."""
+        return self._overrides.get(project_id, settings.idle_pause_minutes)
+
+    def set_override(self, project_id: str, idle_minutes: Optional[float]) -> None:
+        """Sets a per-project idle timeout in minutes; 0 disables, None restores the default."""
+        if idle_minutes is None:
+            self._overrides.pop(project_id, None)
+        else:
+            self._overrides[project_id] = idle_minutes
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.idle_check_interval_seconds)
+            for gateway in list(self._manager.gateways.values()):
+                if self._is_idle(gateway) and gateway.project_id not in self._pausing:
+                    task = asyncio.create_task(self._pause(gateway))
+                    self._pausing[gateway.project_id] = task
+                    task.add_done_callback(lambda _, pid=gateway.project_id: self._pausing.pop(pid, None))
+
+    def _is_idle(self, gateway: Gateway) -> bool:
+        timeout = self.get_timeout(gateway.project_id)
+        return (
+            timeout > 0
+            and gateway.state == GatewayState.RUNNING
+            and gateway.output.subscriber_count == 0
+            and gateway.idle_seconds() >= timeout * 60
+        )
+
+    async def _pause(self, gateway: Gateway) -> None:
+        # Sample CPU usage first so the time spent paused can be credited
+        rate = 0.0
+        try:
+            rate = self._cpu_cores(await gateway.engine.container_stats(gateway.container_id))
+        except (DockerEngineError, KeyError, TypeError, ZeroDivisionError):
+            pass
+        # Activity may have resumed while sampling
+        if not self._is_idle(gateway):
+            return
+        try:
+            await gateway.pause()
+        except DockerEngineError as e:
+            logger.warning("Failed to idle-pause gateway %s: %s", gateway.project_id, e)
+            return
+        gateway.auto_paused = True
+        self._paused_at[gateway.project_id] = time.monotonic()
+        self._cpu_rate[gateway.project_id] = rate
+        self.auto_pauses += 1
+        gateway.notice(
+            f"[MANAGER] Paused after {self.get_timeout(gateway.project_id):g} idle minutes; "
+            "connecting a console resumes it"
+        )
+
+    @staticmethod
+    def _cpu_cores(stats: dict) -> float:
+        """Average number of cores in use over the stats sample window."""
+        cpu, pre = stats["cpu_stats"], stats["precpu_stats"]
+        cpu_delta = cpu["cpu_usage"]["total_usage"] - pre["cpu_usage"]["total_usage"]
+        system_delta = cpu["system_cpu_usage"] - pre["system_cpu_usage"]
+        online = cpu.get("online_cpus") or len(cpu["cpu_usage"].get("percpu_usage") or [1])
+        return max(0.0, cpu_delta / system_delta * online)
+
+    def release(self, gateway: Gateway) -> None:
+        """Credits reclaimed CPU time once an idle-paused gateway is resumed or stopped."""
+        paused_at = self._paused_at.pop(gateway.project_id, None)
+        rate = self._cpu_rate.pop(gateway.project_id, 0.0)
+        if paused_at is not None:
+            reclaimed = (time.monotonic() - paused_at) * rate
+            gateway.cpu_seconds_reclaimed += reclaimed
+            self.cpu_seconds_reclaimed += reclaimed
+
+    async def ensure_awake(self, gateway: Gateway) -> bool:
+        """
+        Records activity on a gateway and resumes it if the idle policy paused it.
+
+        Returns:
+            True if the gateway was woken up.
+        """
+        gateway.touch()
+        if not (gateway.auto_paused and gateway.state == GatewayState.PAUSED):
+            return False
+        try:
+            await gateway.resume()
+        except DockerEngineError as e:
+            logger.warning("Failed to wake gateway %s: %s", gateway.project_id, e)
+            return False
+        self.release(gateway)
+        self.wakeups += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "default_idle_minutes": settings.idle_pause_minutes,
+            "overrides": dict(self._overrides),
+            "auto_paused": sorted(self._paused_at),
+            "auto_pauses": self.auto_pauses,
+            "wakeups": self.wakeups,
+            "cpu_seconds_reclaimed": self.cpu_seconds_reclaimed,
+        }
+
+    async def close(self) -> None:
+        tasks = [t for t in (self._task, *self._pausing.values()) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
@@ -0,0 +1,555 @@
+import asyncio
+import logging
+import mmap
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from devmanager.log_search import (
+    TRIGRAM_LOG_SUFFIX,
+    TRIGRAM_SUFFIX,
+    SearchQuery,
+    TrigramIndex,
+    append_trigrams,
+    seal,
+    trigrams,
+)
+
+logger = logging.getLogger(__name__)
+
+# Index record per compressed block: first seq, offset in the segment,
+# first timestamp, compressed length, line count
+INDEX_RECORD = struct.Struct("<QQdII")
+# Line record inside a (decompressed) block: timestamp, byte length
+LINE_HEADER = struct.Struct("<dI")
+
+SEGMENT_SUFFIX = ".log"
+INDEX_SUFFIX = ".idx"
+SUFFIXES = (SEGMENT_SUFFIX, INDEX_SUFFIX, TRIGRAM_SUFFIX, TRIGRAM_LOG_SUFFIX)
+
+# Sentinel telling the writer thread to stop
+_CLOSE = object()
+
+
+class GatewayLogWriter:
+    """
+    Event-loop side of one project's archive: buffers lines and hands full
+    blocks to the archive's writer thread. `append` is a list append.
+    """
+
+    def __init__(self, archive: "LogArchive", project_id: str):
+        self._archive = archive
+        self.project_id = project_id
+        self._lines: List[Tuple[float, str]] = []
+        self._size = 0
+
+    def append(self, line: str) -> None:
+        self._lines.append((time.time(), line))
+        self._size += len(line)
+        if self._size >= self._archive.block_bytes:
+            self.ship()
+
+    def ship(self) -> None:
+        """Queue the buffered lines as one block."""
+        if self._lines:
+            self._archive._writes.put((self.project_id, self._lines))
+            self._lines = []
+            self._size = 0
+
+
+class _ProjectSpool:
+    """Writer-thread state for one project's directory of segments."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.segment = None
+        self.index = None
+        self.trigrams = None
+        self.base: Optional[str] = None
+        self.blocks = 0
+        self.segment_size = 0
+        self.next_seq = 0
+        segments = list_segments(directory)
+        # Segments left by a previous run are complete; index them for search
+        for name in segments:
+            seal(os.path.join(directory, name))
+        if segments:
+            last = segments[-1]
+            records = read_index(os.path.join(directory, last + INDEX_SUFFIX))
+            if records:
+                self.next_seq = records[-1][0] + records[-1][4]
+            else:
+                self.next_seq = int(last, 16)
+
+    def write_block(self, lines: List[Tuple[float, str]], segment_bytes: int) -> bool:
+        """
+        Compresses and appends a block. Returns True if the segment was rotated.
+        """
+        rotated = False
+        if self.segment is None or self.segment_size >= segment_bytes:
+            self._rotate()
+            rotated = True
+        raw = bytearray()
+        for ts, line in lines:
+            data = line.encode("utf-8", errors="replace")
+            raw += LINE_HEADER.pack(ts, len(data))
+            raw += data
+        compressed = zlib.compress(bytes(raw), 1)
+        offset = self.segment.tell()
+        self.segment.write(compressed)
+        self.segment.flush()
+        append_trigrams(self.trigrams, self.blocks, trigrams("\n".join(line for _, line in lines)))
+        self.trigrams.flush()
+        # The index entry is only written once its block is on disk, so
+        # readers never see an entry pointing past the end of a segment
+        self.index.write(INDEX_RECORD.pack(self.next_seq, offset, lines[0][0], len(compressed), len(lines)))
+        self.index.flush()
+        self.next_seq += len(lines)
+        self.blocks += 1
+        self.segment_size = offset + len(compressed)
+        return rotated
+
+    def _rotate(self) -> None:
+        self.close()
+        self.base = os.path.join(self.directory, f"{self.next_seq:016x}")
+        self.segment = open(self.base + SEGMENT_SUFFIX, "ab")
+        self.index = open(self.base + INDEX_SUFFIX, "ab")
+        self.trigrams = open(self.base + TRIGRAM_LOG_SUFFIX, "ab")
+        self.segment_size = self.segment.tell()
+        self.blocks = self.index.tell() // INDEX_RECORD.size
+
+    def close(self) -> None:
+        for handle in (self.segment, self.index, self.trigrams):
+            if handle:
+                handle.close()
+        self.segment = self.index = self.trigrams = None
+        if self.base:
+            seal(self.base)
+            self.base = None
+
+
+def list_segments(directory: str) -> List[str]:
+    """Segment base names (hex first seq) in order."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(name[:-len(SEGMENT_SUFFIX)] for name in names if name.endswith(SEGMENT_SUFFIX))
+
+
+def read_index(path: str) -> List[Tuple[int, int, float, int, int]]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % INDEX_RECORD.size
+    return [record for record in INDEX_RECORD.iter_unpack(data[:usable])]
+
+
+class LogArchive:
+    """
+    Append-only, compressed, segmented history of every gateway's output
+    under `<storage_path>/logs/<project>/`.
+
+    Lines are grouped into zlib-compressed blocks (one per `block_bytes` of
+    output or per flush interval) appended to segment files of about
+    `segment_bytes`. Each segment has a sparse index with one fixed-size
+    record per block (first sequence number, offset, first timestamp), so a
+    read binary-searches the memory-mapped index and decompresses only the
+    blocks it needs. Sequence numbers continue across gateway restarts.
+
+    All file work (compression, writes, retention) happens on one writer
+    thread; reads run in worker threads.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        segment_bytes: int,
+        block_bytes: int,
+        flush_seconds: float,
+        retention_bytes: int,
+        retention_seconds: float,
+    ):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.block_bytes = block_bytes
+        self.flush_seconds = flush_seconds
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self._writers: Dict[str, GatewayLogWriter] = {}
+        self._writes: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._trigrams = TrigramIndex()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _directory(self, project_id: str) -> str:
+        return os.path.join(self.root, quote(project_id, safe=""))
+
+    def start(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="log-archive-writer", daemon=True)
+        self._thread.start()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    @property
+    def pending_blocks(self) -> int:
+        """Blocks queued but not yet written."""
+        return self._writes.qsize()
+
+    def writer(self, project_id: str) -> GatewayLogWriter:
+        """The (shared) appender for a project's archive."""
+        writer = self._writers.get(project_id)
+        if writer is None:
+            writer = self._writers[project_id] = GatewayLogWriter(self, project_id)
+        return writer
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            for writer in list(self._writers.values()):
+                writer.ship()
+
+    async def flush(self, project_id: Optional[str] = None) -> None:
+        """Waits until buffered lines (of one project, or all) are on disk."""
+        writers = [self._writers[project_id]] if project_id in self._writers else (
+            [] if project_id else list(self._writers.values())
+        )
+        for writer in writers:
+            writer.ship()
+        if self._thread is None:
+            return
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self._writes.put(lambda: loop.call_soon_threadsafe(done.set_result, None))
+        await done
+
+    def _write_loop(self) -> None:
+        spools: Dict[str, _ProjectSpool] = {}
+        last_sweep = 0.0
+        while True:
+            item = self._writes.get()
+            if item is _CLOSE:
+                break
+            if callable(item):
+                item()
+                continue
+            project_id, lines = item
+            try:
+                spool = spools.get(project_id)
+                if spool is None:
+                    spool = spools[project_id] = _ProjectSpool(self._directory(project_id))
+                if spool.write_block(lines, self.segment_bytes):
+                    self._apply_retention(spool.directory)
+            except OSError as e:
+                logger.warning("Failed to archive output of %s: %s", project_id, e)
+            # Age-based retention also applies to projects that stopped writing
+            if time.monotonic() - last_sweep > 60:
+                last_sweep = time.monotonic()
+                self._sweep()
+        for spool in spools.values():
+            spool.close()
+
+    def _sweep(self) -> None:
+        try:
+            directories = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in directories:
+            directory = os.path.join(self.root, name)
+            self._apply_retention(directory)
+            if not list_segments(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def _apply_retention(self, directory: str) -> None:
+        """Deletes the oldest segments beyond the size or age limit (never the newest)."""
+        segments = list_segments(directory)
+        sizes = {}
+        for name in segments:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(directory, name + SEGMENT_SUFFIX))
+            except FileNotFoundError:
+                sizes[name] = 0
+        total = sum(sizes.values())
+        now = time.time()
+        for name in segments[:-1]:
+            path = os.path.join(directory, name + SEGMENT_SUFFIX)
+            try:
+                expired = now - os.path.getmtime(path) > self.retention_seconds
+            except FileNotFoundError:
+                expired = True
+            if total <= self.retention_bytes and not expired:
+                break
+            for suffix in SUFFIXES:
+                try:
+                    os.remove(os.path.join(directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+            total -= sizes[name]
+
+    async def read(
+        self,
+        project_id: str,
+        from_seq: Optional[int] = None,
+        to_seq: Optional[int] = None,
+        from_time: Optional[float] = None,
+        to_time: Optional[float] = None,
+        limit: int = 1000,
+    ) -> Tuple[List[Tuple[int, float, str]], Optional[int]]:
+        """
+        Archived lines of a project as (seq, timestamp, line), oldest first,
+        within the given sequence and/or time bounds (inclusive).
+
+        Returns:
+            The lines and the seq to pass as `from_seq` for the next page
+            (None when the range is exhausted).
+        """
+        await self.flush(project_id)
+        return await asyncio.to_thread(
+            self._read, self._directory(project_id), from_seq, to_seq, from_time, to_time, limit
+        )
+
+    def _read(
+        self,
+        directory: str,
+        from_seq: Optional[int],
+        to_seq: Optional[int],
+        from_time: Optional[float],
+        to_time: Optional[float],
+        limit: int,
+    ) -> Tuple[List[Tuple[int, float, str]], Optional[int]]:
+        lines: List[Tuple[int, float, str]] = []
+        for seq, ts, line in self._scan(directory, from_seq, from_time):
+            if (to_seq is not None and seq > to_seq) or (to_time is not None and ts > to_time):
+                return lines, None
+            if (from_seq is not None and seq < from_seq) or (from_time is not None and ts < from_time):
+                continue
+            if len(lines) == limit:
+                return lines, seq
+            lines.append((seq, ts, line))
+        return lines, None
+
+    def _scan(
+        self, directory: str, from_seq: Optional[int], from_time: Optional[float]
+    ) -> Iterator[Tuple[int, float, str]]:
+        segments = list_segments(directory)
+        # Skip whole segments that end before the requested start
+        start = 0
+        if from_seq is not None:
+            for i, name in enumerate(segments):
+                if int(name, 16) <= from_seq:
+                    start = i
+        for name in segments[start:]:
+            base = os.path.join(directory, name)
+            yield from self._scan_segment(base, from_seq, from_time)
+
+    def _scan_segment(
+        self, base: str, from_seq: Optional[int], from_time: Optional[float]
+    ) -> Iterator[Tuple[int, float, str]]:
+        with _Segment.open(base) as segment:
+            if segment is None:
+                return
+            for i in range(segment.first_block(from_seq, from_time), segment.count):
+                yield from segment.block(i)
+
+    async def search(
+        self,
+        project_id: str,
+        query: SearchQuery,
+        context: int = 2,
+        from_seq: Optional[int] = None,
+        limit: int = 100,
+        timeout: float = 2.0,
+    ) -> Tuple[List[dict], Optional[int], bool]:
+        """
+        Archived lines of a project matching `query`, oldest first, each with
+        up to `context` lines before and after (within its segment).
+
+        Returns:
+            The matches, the seq to pass as `from_seq` for the next page, and
+            whether the search stopped at `timeout` before covering the archive.
+        """
+        await self.flush(project_id)
+        return await asyncio.to_thread(
+            self._search, project_id, query, context, from_seq, limit, time.monotonic() + timeout
+        )
+
+    async def search_all(
+        self, query: SearchQuery, context: int = 2, limit: int = 100, timeout: float = 2.0
+    ) -> Tuple[List[dict], bool]:
+        """Like `search` across every archived project; matches carry a project_id."""
+        await self.flush()
+
+        def run() -> Tuple[List[dict], bool]:
+            deadline = time.monotonic() + timeout
+            matches: List[dict] = []
+            try:
+                names = sorted(os.listdir(self.root))
+            except FileNotFoundError:
+                return matches, False
+            for name in names:
+                found, next_seq, truncated = self._search(
+                    unquote(name), query, context, None, limit - len(matches), deadline
+                )
+                matches.extend(found)
+                if truncated or next_seq is not None:
+                    return matches, True
+            return matches, False
+
+        return await asyncio.to_thread(run)
+
+    def _search(
+        self,
+        project_id: str,
+        query: SearchQuery,
+        context: int,
+        from_seq: Optional[int],
+        limit: int,
+        deadline: float,
+    ) -> Tuple[List[dict], Optional[int], bool]:
+        directory = self._directory(project_id)
+        matches: List[dict] = []
+        segments = list_segments(directory)
+        start = 0
+        if from_seq is not None:
+            for i, name in enumerate(segments):
+                if int(name, 16) <= from_seq:
+                    start = i
+        for name in segments[start:]:
+            base = os.path.join(directory, name)
+            with _Segment.open(base) as segment:
+                if segment is None:
+                    continue
+                first = segment.first_block(from_seq, None)
+                candidates = range(first, segment.count)
+                if query.trigrams:
+                    indexed = self._trigrams.candidates(base, query.trigrams)
+                    if indexed is not None:
+                        candidates = sorted(block for block in indexed if first <= block < segment.count)
+                for i in candidates:
+                    if time.monotonic() > deadline:
+                        return matches, segment.record(i)[0], True
+                    lines = segment.block(i)
+                    for position, (seq, ts, line) in enumerate(lines):
+                        if (from_seq is not None and seq < from_seq) or not query.matches(line):
+                            continue
+                        if len(matches) == limit:
+                            return matches, seq, False
+                        matches.append({
+                            "project_id": project_id,
+                            "seq": seq,
+                            "ts": ts,
+                            "line": line,
+                            "before": [text for _, _, text in segment.around(i, lines, position - context, position)],
+                            "after": [text for _, _, text in segment.around(i, lines, position + 1, position + 1 + context)],
+                        })
+        return matches, None, False
+
+    async def close(self) -> None:
+        """Writes out everything buffered and stops the writer thread."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        for writer in self._writers.values():
+            writer.ship()
+        if self._thread:
+            self._writes.put(_CLOSE)
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+
+class _Segment:
+    """Memory-mapped read access to one segment and its block index."""
+
+    def __init__(self, index: mmap.mmap, data: mmap.mmap, count: int):
+        self._index = index
+        self._data = data
+        self.count = count
+        self._cache: Dict[int, List[Tuple[int, float, str]]] = {}
+
+    @staticmethod
+    @contextmanager
+    def open(base: str) -> Iterator[Optional["_Segment"]]:
+        try:
+            index_file = open(base + INDEX_SUFFIX, "rb")
+            segment_file = open(base + SEGMENT_SUFFIX, "rb")
+        except FileNotFoundError:
+            yield None  # Removed by retention meanwhile
+            return
+        with index_file, segment_file:
+            segment_size = os.fstat(segment_file.fileno()).st_size
+            count = os.fstat(index_file.fileno()).st_size // INDEX_RECORD.size
+            if not count or not segment_size:
+                yield None
+                return
+            with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index, \
+                    mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Blocks written after the segment was mapped aren't visible
+                while count:
+                    _, offset, _, length, _ = INDEX_RECORD.unpack_from(index, (count - 1) * INDEX_RECORD.size)
+                    if offset + length <= segment_size:
+                        break
+                    count -= 1
+                yield _Segment(index, data, count)
+
+    def record(self, i: int) -> Tuple[int, int, float, int, int]:
+        return INDEX_RECORD.unpack_from(self._index, i * INDEX_RECORD.size)
+
+    def block(self, i: int) -> List[Tuple[int, float, str]]:
+        """The (seq, timestamp, line) entries of block `i`."""
+        lines = self._cache.get(i)
+        if lines is not None:
+            return lines
+        first_seq, offset, _, length, _ = self.record(i)
+        raw = zlib.decompress(self._data[offset:offset + length])
+        lines = []
+        position = 0
+        seq = first_seq
+        while position < len(raw):
+            ts, size = LINE_HEADER.unpack_from(raw, position)
+            position += LINE_HEADER.size
+            lines.append((seq, ts, raw[position:position + size].decode("utf-8", errors="replace")))
+            position += size
+            seq += 1
+        # Searches look at neighbouring blocks for context; keep just a few
+        if len(self._cache) > 4:
+            self._cache.clear()
+        self._cache[i] = lines
+        return lines
+
+    def around(
+        self, i: int, lines: List[Tuple[int, float, str]], start: int, end: int
+    ) -> List[Tuple[int, float, str]]:
+        """Lines `start:end` relative to block `i`, spilling into neighbouring blocks."""
+        result = []
+        if start < 0 and i > 0:
+            previous = self.block(i - 1)
+            result.extend(previous[max(0, len(previous) + start):])
+        result.extend(lines[max(0, start):min(end, len(lines))])
+        if end > len(lines) and i + 1 < self.count:
+            result.extend(self.block(i + 1)[:end - len(lines)])
+        return result
+
+    def first_block(self, from_seq: Optional[int], from_time: Optional[float]) -> int:
+        """Binary search for the last block starting at or before the requested position."""
+        if from_seq is None and from_time is None:
+            return 0
+        low, high = 0, self.count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            seq, _, ts, _, _ = self.record(middle)
+            if (from_seq is None or seq <= from_seq) and (from_time is None or ts <= from_time):
+                low = middle
+            else:
+                high = middle - 1
+        return low
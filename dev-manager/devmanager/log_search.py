@@ -0,0 +1,266 @@
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+# The regex parser is private to the re module (its sre_parse alias is
+# deprecated since 3.11). It is only used to find the literals a regex
+# requires; a query it fails on is answered by scanning every block
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Per-block trigram sets of the segment being written: block number, trigram count, codes
+TRIGRAM_LOG_SUFFIX = ".trl"
+TRIGRAM_LOG_RECORD = struct.Struct("<II")
+# Postings of a sealed segment: count, sorted (code, offset, count) directory, block numbers
+TRIGRAM_SUFFIX = ".tri"
+POSTINGS_HEADER = struct.Struct("<I")
+POSTINGS_ENTRY = struct.Struct("<III")
+
+
+def trigrams(text: str) -> Set[int]:
+    """
+    Case-folded byte trigrams of the whitespace-separated tokens of `text`,
+    as 24-bit codes. Trigrams spanning whitespace are left out: they make up
+    a fraction of the index and queries drop them the same way.
+    """
+    windows = set()
+    for token in set(text.lower().encode("utf-8", errors="replace").split()):
+        windows.update(zip(token, token[1:], token[2:]))
+    return {(a << 16) | (b << 8) | c for a, b, c in windows}
+
+
+def append_trigrams(file, block: int, codes: Set[int]) -> None:
+    """Records the trigrams of one block in a segment's trigram log (writer thread)."""
+    file.write(TRIGRAM_LOG_RECORD.pack(block, len(codes)))
+    file.write(array("I", codes).tobytes())
+
+
+def _read_trigram_log(path: str, start: int, postings: Dict[int, List[int]]) -> int:
+    """Adds the records of a trigram log from byte `start` on; returns where parsing stopped."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+    except FileNotFoundError:
+        return start
+    position = 0
+    while position + TRIGRAM_LOG_RECORD.size <= len(data):
+        block, count = TRIGRAM_LOG_RECORD.unpack_from(data, position)
+        end = position + TRIGRAM_LOG_RECORD.size + count * 4
+        if end > len(data):
+            break  # Record still being written
+        codes = array("I")
+        codes.frombytes(data[position + TRIGRAM_LOG_RECORD.size:end])
+        for code in codes:
+            postings.setdefault(code, []).append(block)
+        position = end
+    return start + position
+
+
+def _read_postings(path: str) -> Dict[int, List[int]]:
+    postings: Dict[int, List[int]] = {}
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return postings
+    if not data:
+        return postings
+    (count,) = POSTINGS_HEADER.unpack_from(data)
+    blocks = array("I")
+    blocks.frombytes(data[POSTINGS_HEADER.size + count * POSTINGS_ENTRY.size:])
+    for code, offset, length in POSTINGS_ENTRY.iter_unpack(
+        data[POSTINGS_HEADER.size:POSTINGS_HEADER.size + count * POSTINGS_ENTRY.size]
+    ):
+        postings[code] = blocks[offset:offset + length].tolist()
+    return postings
+
+
+def seal(base: str) -> None:
+    """
+    Compacts the trigram log of a segment that is no longer written into a
+    sorted postings file that searches binary-search through mmap.
+    """
+    log_path = base + TRIGRAM_LOG_SUFFIX
+    if not os.path.exists(log_path):
+        return
+    postings = _read_postings(base + TRIGRAM_SUFFIX)
+    _read_trigram_log(log_path, 0, postings)
+    directory = bytearray(POSTINGS_HEADER.pack(len(postings)))
+    blocks = array("I")
+    for code in sorted(postings):
+        entries = sorted(set(postings[code]))
+        directory += POSTINGS_ENTRY.pack(code, len(blocks), len(entries))
+        blocks.extend(entries)
+    temporary = base + TRIGRAM_SUFFIX + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(directory)
+        f.write(blocks.tobytes())
+    os.replace(temporary, base + TRIGRAM_SUFFIX)
+    os.remove(log_path)
+
+
+class TrigramIndex:
+    """
+    Reader side of the per-segment trigram indexes. Sealed segments are
+    looked up in their postings file; the trigram log of the segment being
+    written is parsed incrementally and kept in memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # trigram log path -> (bytes parsed, postings)
+        self._logs: Dict[str, tuple] = {}
+
+    def candidates(self, base: str, codes: Set[int]) -> Optional[Set[int]]:
+        """
+        Blocks of a segment containing every trigram in `codes`, or None if
+        the segment has no index (every block is a candidate).
+        """
+        result: Optional[Set[int]] = None
+        indexed = False
+        for blocks in (self._sealed(base, codes), self._unsealed(base, codes)):
+            if blocks is None:
+                continue
+            indexed = True
+            result = blocks if result is None else result | blocks
+        return result if indexed else None
+
+    def _sealed(self, base: str, codes: Set[int]) -> Optional[Set[int]]:
+        try:
+            f = open(base + TRIGRAM_SUFFIX, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if not os.fstat(f.fileno()).st_size:
+                return set()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                (count,) = POSTINGS_HEADER.unpack_from(data)
+                blocks_start = POSTINGS_HEADER.size + count * POSTINGS_ENTRY.size
+                result: Optional[Set[int]] = None
+                for code in codes:
+                    low, high = 0, count
+                    while low < high:
+                        middle = (low + high) // 2
+                        if POSTINGS_ENTRY.unpack_from(data, POSTINGS_HEADER.size + middle * POSTINGS_ENTRY.size)[0] < code:
+                            low = middle + 1
+                        else:
+                            high = middle
+                    if low == count:
+                        return set()
+                    found, offset, length = POSTINGS_ENTRY.unpack_from(
+                        data, POSTINGS_HEADER.size + low * POSTINGS_ENTRY.size
+                    )
+                    if found != code:
+                        return set()
+                    blocks = array("I")
+                    blocks.frombytes(data[blocks_start + offset * 4:blocks_start + (offset + length) * 4])
+                    result = set(blocks) if result is None else result.intersection(blocks)
+                    if not result:
+                        return result
+                return result if result is not None else set()
+
+    def _unsealed(self, base: str, codes: Set[int]) -> Optional[Set[int]]:
+        path = base + TRIGRAM_LOG_SUFFIX
+        if not os.path.exists(path):
+            with self._lock:
+                self._logs.pop(path, None)
+            return None
+        with self._lock:
+            parsed, postings = self._logs.get(path, (0, {}))
+            if parsed > os.path.getsize(path):
+                parsed, postings = 0, {}  # Rewritten
+            self._logs[path] = (_read_trigram_log(path, parsed, postings), postings)
+            result: Optional[Set[int]] = None
+            for code in codes:
+                blocks = postings.get(code, ())
+                result = set(blocks) if result is None else result.intersection(blocks)
+                if not result:
+                    return set()
+            return result if result is not None else set()
+
+
+def _indexable(char: str, ignore_case: bool) -> bool:
+    """
+    Whether a character of a query literal can be looked up in the index.
+    Trigrams come from lower()ed text, which maps a few characters
+    differently from the matcher: 'Σ' lowers by what follows it, and with
+    IGNORECASE 'ſ' and 'ı' match 's' and 'i' (non-ASCII letters can have
+    such equivalents too).
+    """
+    if ignore_case:
+        return char.isascii() and char not in "iIsS"
+    return char != "Σ"
+
+
+def _literal_runs(text: str, ignore_case: bool) -> List[str]:
+    """The parts of a literal between characters that can't be looked up."""
+    runs = [""]
+    for char in text:
+        if _indexable(char, ignore_case):
+            runs[-1] += char
+        elif runs[-1]:
+            runs.append("")
+    return [run for run in runs if run]
+
+
+def _required_literals(parsed: Iterable, literals: List[str], ignore_case: bool) -> None:
+    """Collects literal runs every match of a parsed regex must contain."""
+    run: List[str] = []
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(value))
+            continue
+        if run:
+            literals.extend(_literal_runs("".join(run), ignore_case))
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, pattern = value
+            _required_literals(
+                pattern,
+                literals,
+                (ignore_case or bool(add_flags & sre_constants.SRE_FLAG_IGNORECASE))
+                and not del_flags & sre_constants.SRE_FLAG_IGNORECASE,
+            )
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and value[0] >= 1:
+            _required_literals(value[2], literals, ignore_case)
+        # Alternations, classes, assertions etc. require nothing definite
+    if run:
+        literals.extend(_literal_runs("".join(run), ignore_case))
+
+
+class SearchQuery:
+    """
+    A substring or regex query: the compiled matcher plus the trigrams any
+    matching line must contain (derived from the regex's required literals).
+    """
+
+    def __init__(self, query: str, regex: bool = False, ignore_case: bool = False):
+        flags = re.IGNORECASE if ignore_case else 0
+        pattern = query if regex else re.escape(query)
+        try:
+            self.pattern = re.compile(pattern, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+        if regex:
+            literals: List[str] = []
+            try:
+                parsed = sre_parse.parse(pattern, flags)
+                _required_literals(parsed, literals, bool(parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE))
+            except Exception:  # Parser internals changed
+                literals = []
+        else:
+            literals = _literal_runs(query, ignore_case)
+        self.trigrams: Set[int] = set()
+        for literal in literals:
+            self.trigrams |= trigrams(literal)
+
+    def matches(self, line: str) -> bool:
+        return self.pattern.search(line) is not None
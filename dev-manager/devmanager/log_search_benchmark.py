@@ -0,0 +1,146 @@
+"""
+Search benchmark for the log archive: latency of trigram-indexed searches
+over a generated archive of a few GB spread across gateways, the size the
+search is meant to answer in under 100 ms.
+
+    python -m devmanager.log_search_benchmark [--megabytes N] [--projects N] [--runs N] [--dir DIR] [--scan]
+
+The archive is written with the configured segment and block sizes, in a
+temporary directory unless --dir names one. Writing a few GB takes minutes;
+an archive already in --dir is reused. Searches run against a freshly opened
+archive with its files in the page cache, and the median and slowest of
+--runs are reported per query. With --scan, each query is also timed
+without the index.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+from devmanager.config import settings
+from devmanager.log_archive import LogArchive, list_segments
+from devmanager.log_search import SearchQuery
+
+# A line in about this many is a rare error the queries look for
+RARE = 200_000
+
+QUERIES = (
+    # (name, query, regex, ignore_case, across every project)
+    ("rare literal", "ELIFECYCLE", False, False, False),
+    ("rare literal, ignore case", "connection refused by upstream", False, True, False),
+    ("rare regex", r"error: (timeout|refused) after \d+ms", True, False, False),
+    ("rare literal, all projects", "ELIFECYCLE", False, False, True),
+    ("common literal", "handled in", False, False, False),
+)
+
+
+def generate(rng: random.Random, count: int) -> List[str]:
+    paths = ["/api/projects", "/api/files", "/healthz", "/api/builds", "/static/app.js"]
+    lines = []
+    for i in range(count):
+        if rng.randrange(RARE) == 0:
+            lines.append(rng.choice((
+                "npm ERR! code ELIFECYCLE",
+                "ERROR Connection refused by upstream 10.0.0.7:5432",
+                f"error: timeout after {rng.randrange(1000, 9000)}ms",
+            )))
+            continue
+        lines.append(
+            f"2026-10-18T12:{i // 60 % 60:02d}:{i % 60:02d}Z INFO {rng.choice(paths)} "
+            f"request {rng.getrandbits(48):012x} handled in {rng.randrange(400)} ms"
+        )
+    return lines
+
+
+async def write(archive: LogArchive, projects: int, megabytes: int) -> None:
+    rng = random.Random(0)
+    per_project = megabytes * 1024 * 1024 // projects
+    for project in range(projects):
+        project_id = f"project-{project}"
+        writer = archive.writer(project_id)
+        written = 0
+        while written < per_project:
+            for line in generate(rng, 10_000):
+                writer.append(line)
+                written += len(line)
+            # Keep the writer thread's queue short
+            await archive.flush(project_id)
+        print(f"  {project_id}: {written / 1024 / 1024:.0f} MB", flush=True)
+
+
+def archive_bytes(root: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(root)
+        for name in names
+    )
+
+
+async def measure(archive: LogArchive, runs: int, scan: bool) -> None:
+    for name, query, regex, ignore_case, everywhere in QUERIES:
+        variants = [("indexed", SearchQuery(query, regex, ignore_case))]
+        if scan:
+            unindexed = SearchQuery(query, regex, ignore_case)
+            unindexed.trigrams = set()
+            variants.append(("scan", unindexed))
+        for variant, search in variants:
+            times, found = [], 0
+            for _ in range(runs):
+                started = time.perf_counter()
+                if everywhere:
+                    matches, _ = await archive.search_all(search, timeout=3600)
+                else:
+                    matches, _, _ = await archive.search("project-0", search, timeout=3600)
+                times.append((time.perf_counter() - started) * 1000)
+                found = len(matches)
+            print(
+                f"{name:<28} {variant:<8} median {statistics.median(times):8.1f} ms   "
+                f"max {max(times):8.1f} ms   ({found} matches)"
+            )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure indexed log search latency")
+    parser.add_argument("--megabytes", type=int, default=2048, help="archived output in total (default 2048)")
+    parser.add_argument("--projects", type=int, default=16, help="gateways to spread it over (default 16)")
+    parser.add_argument("--runs", type=int, default=5, help="runs per query (default 5)")
+    parser.add_argument("--dir", help="archive directory to create or reuse (default: a temporary one)")
+    parser.add_argument("--scan", action="store_true", help="also time each query without the index")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary:
+        root = args.dir or temporary
+
+        def open_archive() -> LogArchive:
+            return LogArchive(
+                root,
+                settings.log_segment_bytes,
+                settings.log_block_bytes,
+                settings.log_flush_seconds,
+                # Nothing is dropped while the benchmark runs
+                retention_bytes=1 << 62,
+                retention_seconds=float("inf"),
+            )
+
+        if not list_segments(os.path.join(root, "project-0")):
+            print(f"Writing {args.megabytes} MB of output for {args.projects} projects to {root}")
+            archive = open_archive()
+            archive.start()
+            await write(archive, args.projects, args.megabytes)
+            await archive.close()
+
+        archive = open_archive()
+        archive.start()
+        try:
+            print(f"Archive: {archive_bytes(root) / 1024 / 1024:.0f} MB on disk")
+            await measure(archive, args.runs, args.scan)
+        finally:
+            await archive.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
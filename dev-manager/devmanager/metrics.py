@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# (labels, value) pairs of one metric, as produced by scrape-time collectors
+Samples = Iterable[Tuple[Dict[str, str], float]]
+# (name, type, help, samples)
+Metric = Tuple[str, str, str, Samples]
+Collector = Callable[[], Iterable[Metric]]
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values (seconds unless noted).
+
+    Observing is a bisect plus two additions, cheap enough for hot paths.
+    With `labelnames`, observations go to per-label-value children obtained
+    with `labels(...)`; keep a reference to the child on hot paths.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def labels(self, *values: str) -> "Histogram":
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = Histogram(self.name, self.help, self.buckets)
+        return child
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict:
+        """Cumulative bucket counts keyed by upper bound, plus count and sum."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self._counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+    def expose(self) -> List[str]:
+        """Prometheus text format lines for this histogram (and its children)."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        if self.labelnames:
+            series = [(dict(zip(self.labelnames, values)), child) for values, child in self._children.items()]
+        else:
+            series = [({}, self)]
+        for labels, histogram in series:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+        return lines
+
+
+def timed(histogram: Histogram):
+    """Decorator observing how long an async function takes."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def render(*collectors: Collector) -> str:
+    """
+    All histograms plus the metrics produced by `collectors`, in the
+    Prometheus text exposition format (version 0.0.4).
+    """
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    for collect in collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task, i.e. how long
+    callbacks (log parsing, WebSocket sends, ...) keep it busy.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            event_loop_lag_seconds.observe(max(0.0, loop.time() - expected))
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+gateway_first_output_seconds = Histogram(
+    "devmanager_gateway_first_output_seconds",
+    "Time from a gateway start request to the first project output line.",
+)
+
+process_first_output_seconds = Histogram(
+    "devmanager_process_first_output_seconds",
+    "Time from the agent starting a project process to its first output line (agent clock).",
+)
+
+process_reload_seconds = Histogram(
+    "devmanager_process_reload_seconds",
+    "Time from a file change to the restarted project process in watch mode (agent clock).",
+    buckets=FAST_BUCKETS,
+)
+
+gateway_operation_seconds = Histogram(
+    "devmanager_gateway_operation_seconds",
+    "Duration of gateway lifecycle operations.",
+    labelnames=("operation",),
+)
+
+docker_api_seconds = Histogram(
+    "devmanager_docker_api_seconds",
+    "Docker Engine API call latency by endpoint (until the headers for streams).",
+    buckets=FAST_BUCKETS,
+    labelnames=("host", "method", "endpoint"),
+)
+
+console_send_seconds = Histogram(
+    "devmanager_console_send_seconds",
+    "Time spent sending one console WebSocket frame.",
+    buckets=FAST_BUCKETS,
+)
+
+console_echo_seconds = Histogram(
+    "devmanager_console_echo_seconds",
+    "Time from forwarding console input to a gateway until its next output line.",
+    buckets=FAST_BUCKETS,
+)
+
+event_loop_lag_seconds = Histogram(
+    "devmanager_event_loop_lag_seconds",
+    "How late the event loop ran a timer that was due.",
+    buckets=FAST_BUCKETS,
+)
+
+HISTOGRAMS = (
+    gateway_first_output_seconds,
+    process_first_output_seconds,
+    process_reload_seconds,
+    gateway_operation_seconds,
+    docker_api_seconds,
+    console_send_seconds,
+    console_echo_seconds,
+    event_loop_lag_seconds,
+)
@@ -1,20 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Union
 import asyncio
+import json
+import time
 
+from devmanager.admission import AdmissionRejected
 from devmanager.auth import verify_internal_token
+from devmanager.config import settings
+from devmanager.engine import DockerEngineError
+from devmanager.gateway.gateway import GatewayControlError, ResourceLimits
 from devmanager.gateway_manager import GatewayManager
+from devmanager.metrics import console_send_seconds
+
+# After console input, output is sent without batching delay for this long,
+# so echoes of what the user types come back immediately
+INTERACTIVE_SECONDS = 2.0
+
+class ProcessConfig(BaseModel):
+    name: str
+    command: List[str]
+    # Defaults to the gateway's working directory
+    working_directory: Optional[str] = None
+    env: Dict[str, str] = {}
+    # Names of processes that must have started first, or a mapping of
+    # names to "started" or "completed" (exited with code 0, e.g. installs)
+    depends_on: Union[List[str], Dict[str, Literal["started", "completed"]]] = []
+    restart: Literal["never", "on-failure", "always"] = "on-failure"
+    # Restart when files in its working directory change (options: StartGatewayRequest.watch)
+    watch: bool = False
+
+class WatchConfig(BaseModel):
+    # Added to the agent's defaults (.git, node_modules, __pycache__, *.log, ...)
+    ignore: List[str] = []
+    # Quiet time that ends a burst of changes
+    debounce_ms: int = 200
 
 class StartGatewayRequest(BaseModel):
     working_directory: str
-    command: List[str]
+    # Either a single command or several named processes run side by side
+    command: List[str] = []
+    processes: Optional[List[ProcessConfig]] = None
+    # Watch mode: restart the process in place when project files change
+    watch: Optional[WatchConfig] = None
+    owner: Optional[str] = None
+    # Run the command on a pseudo-terminal; console output is then raw terminal chunks
+    pty: bool = False
+    # Resource limits; omitted fields use the configured defaults, 0 = unlimited
+    cpus: Optional[float] = None
+    cpu_shares: Optional[int] = None
+    memory_mb: Optional[int] = None
+    pids_limit: Optional[int] = None
+    
+    def process_configs(self) -> Optional[List[dict]]:
+        """
+        The processes as passed to the agent.
+        
+        Raises:
+            ValueError: If there is neither a command nor processes, or
+                process names repeat or depend on unknown processes.
+        """
+        if not self.processes:
+            if not self.command:
+                raise ValueError("Either command or processes is required")
+            return None
+        names = [process.name for process in self.processes]
+        if len(set(names)) != len(names):
+            raise ValueError("Process names must be unique")
+        for process in self.processes:
+            unknown = set(process.depends_on) - set(names)
+            if unknown:
+                raise ValueError(f"Process {process.name} depends on unknown processes: {', '.join(sorted(unknown))}")
+        return [process.model_dump() for process in self.processes]
+    
+    def limits(self) -> ResourceLimits:
+        return ResourceLimits.from_settings(
+            cpus=self.cpus,
+            cpu_shares=self.cpu_shares,
+            memory_mb=self.memory_mb,
+            pids_limit=self.pids_limit,
+        )
+
+class RestartProcessRequest(BaseModel):
+    # Supervised process to restart; the first (or only) one by default
+    process: Optional[str] = None
+
+class SignalRequest(BaseModel):
+    # Name ("HUP", "SIGTERM") or number
+    signal: Union[str, int]
+    process: Optional[str] = None
+
+class IdlePolicyRequest(BaseModel):
+    # Minutes without console subscribers, output or API calls before pausing;
+    # 0 disables auto-pause for the project, null restores the default
+    idle_minutes: Optional[float] = None
+
+class HostRequest(BaseModel):
+    # Docker endpoint, e.g. unix:///var/run/docker.sock or tcp://10.0.0.5:2375
+    url: str
+
+class BatchStartItem(StartGatewayRequest):
+    project_id: str
+
+class BatchStartRequest(BaseModel):
+    gateways: List[BatchStartItem]
+
+class BatchRequest(BaseModel):
+    project_ids: List[str]
+
+class BatchResponse(BaseModel):
+    results: Dict[str, dict]
 
 class GatewayStatusResponse(BaseModel):
     project_id: str
     state: str
+    owner: Optional[str] = None
+    host: Optional[str] = None
+    queue_position: Optional[int] = None
+    limits: Optional[Dict[str, float]] = None
     working_directory: Optional[str] = None
     command: Optional[List[str]] = None
+    pooled: Optional[bool] = None
+    first_output_latency: Optional[float] = None
+    process_first_output_latency: Optional[float] = None
+    exit_code: Optional[int] = None
+    oom_killed: Optional[bool] = None
+    pty: Optional[bool] = None
+    processes: Optional[List[dict]] = None
+    # Last reported state of each supervised process, by name
+    process_states: Optional[Dict[str, dict]] = None
+    watch: Optional[dict] = None
+    reloads: Optional[int] = None
+    # Seconds from a file change to the restarted process
+    last_reload_latency: Optional[float] = None
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    state_changed_at: Optional[float] = None
+    auto_paused: Optional[bool] = None
+    idle_seconds: Optional[float] = None
+    idle_pause_minutes: Optional[float] = None
+    cpu_seconds_reclaimed: Optional[float] = None
+    output: Optional[dict] = None
 
 def create_gateway_router(manager: GatewayManager) -> APIRouter:
     router = APIRouter(
@@ -27,28 +153,251 @@ def create_gateway_router(manager: GatewayManager) -> APIRouter:
     async def list_gateways():
         return manager.list_gateways()
     
+    @router.get("/history", response_model=List[dict])
+    async def list_gateway_history(
+        response: Response,
+        state: Optional[str] = None,
+        owner: Optional[str] = None,
+        host: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000),
+    ):
+        # Stored records, including stopped gateways; pass X-Next-Cursor back as ?cursor= for the next page
+        records = await manager.query_gateways(state, owner, host, cursor, limit)
+        if len(records) == limit:
+            response.headers["X-Next-Cursor"] = records[-1]["project_id"]
+        return records
+    
+    @router.get("/history/{project_id}")
+    async def get_gateway_history(project_id: str):
+        # The stored record, which outlives the gateway itself
+        record = await manager.get_gateway_record(project_id)
+        if not record:
+            raise HTTPException(404, "Gateway not found")
+        return record
+    
+    @router.get("/pool")
+    async def get_pool():
+        return manager.get_pool_status()
+    
+    @router.get("/hosts")
+    async def list_hosts():
+        return manager.list_hosts()
+    
+    @router.post("/hosts")
+    async def add_host(request: HostRequest):
+        try:
+            await manager.add_host(request.url)
+        except ValueError as e:
+            raise HTTPException(409, str(e))
+        return {"status": "added"}
+    
+    @router.post("/hosts/drain", response_model=BatchResponse)
+    async def drain_host(request: HostRequest):
+        try:
+            return {"results": await manager.drain_host(request.url)}
+        except KeyError:
+            raise HTTPException(404, "Docker host not found")
+    
+    @router.post("/hosts/remove")
+    async def remove_host(request: HostRequest):
+        try:
+            await manager.remove_host(request.url)
+        except KeyError:
+            raise HTTPException(404, "Docker host not found")
+        except ValueError as e:
+            raise HTTPException(409, str(e))
+        return {"status": "removed"}
+    
+    @router.post("/rebalance", response_model=BatchResponse)
+    async def rebalance(spread: bool = False):
+        # ?spread=true also restarts idle gateways onto their preferred hosts
+        return {"results": await manager.rebalance(spread)}
+    
+    @router.get("/idle")
+    async def get_idle_policy():
+        return manager.idle_policy.stats()
+    
+    # Batch routes are declared before /{project_id}/... so "batch" isn't taken as a project id
+    @router.post("/batch/start", response_model=BatchResponse)
+    async def batch_start(request: BatchStartRequest):
+        items = {item.project_id: item for item in request.gateways}
+        
+        async def start(project_id: str):
+            item = items[project_id]
+            await manager.create_gateway(
+                project_id, item.working_directory, item.command, item.limits(), item.owner, item.pty,
+                item.process_configs(), item.watch.model_dump() if item.watch else None,
+            )
+            return manager.get_gateway_status(project_id)
+        
+        return {"results": await manager.run_bulk(list(items), start)}
+    
+    async def run_batch(request: BatchRequest, operation) -> dict:
+        async def run(project_id: str):
+            if not await operation(project_id):
+                raise LookupError("Gateway not found")
+            status = manager.get_gateway_status(project_id)
+            return status["state"] if status else "stopped"
+        return {"results": await manager.run_bulk(request.project_ids, run)}
+    
+    @router.post("/batch/stop", response_model=BatchResponse)
+    async def batch_stop(request: BatchRequest):
+        return await run_batch(request, manager.stop_gateway)
+    
+    @router.post("/batch/pause", response_model=BatchResponse)
+    async def batch_pause(request: BatchRequest):
+        return await run_batch(request, manager.pause_gateway)
+    
+    @router.post("/batch/resume", response_model=BatchResponse)
+    async def batch_resume(request: BatchRequest):
+        return await run_batch(request, manager.resume_gateway)
+    
+    async def search_logs(project_id: Optional[str], **params) -> dict:
+        try:
+            result = await manager.search_logs(project_id=project_id, **params)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if result is None:
+            raise HTTPException(404, "Log archive is disabled")
+        return result
+    
+    @router.get("/logs/search")
+    async def search_all_logs(
+        q: str = Query(..., min_length=1),
+        regex: bool = False,
+        ignore_case: bool = False,
+        context: int = Query(2, ge=0, le=50),
+        limit: int = Query(100, ge=1, le=1000),
+    ):
+        # Searches the archived output of every gateway, stopped ones included
+        return await search_logs(
+            None, query=q, regex=regex, ignore_case=ignore_case, context=context, limit=limit
+        )
+    
     @router.get("/{project_id}", response_model=GatewayStatusResponse)
     async def get_gateway(project_id: str):
+        await manager.ensure_awake(project_id)
         status = manager.get_gateway_status(project_id)
         if not status:
             raise HTTPException(404, "Gateway not found")
         return status
     
+    @router.get("/{project_id}/events", response_model=List[dict])
+    async def get_gateway_events(
+        project_id: str,
+        response: Response,
+        cursor: Optional[int] = None,
+        limit: int = Query(100, ge=1, le=1000),
+    ):
+        events = await manager.get_gateway_events(project_id, cursor, limit)
+        if len(events) == limit:
+            response.headers["X-Next-Cursor"] = str(events[-1]["id"])
+        return events
+    
+    @router.get("/{project_id}/logs")
+    async def get_gateway_logs(
+        project_id: str,
+        from_seq: Optional[int] = Query(None, alias="from", ge=0),
+        to_seq: Optional[int] = Query(None, alias="to", ge=0),
+        from_time: Optional[float] = None,
+        to_time: Optional[float] = None,
+        limit: int = Query(1000, ge=1, le=10000),
+    ):
+        # from/to are archive sequence numbers (inclusive), from_time/to_time unix timestamps;
+        # pass "next" back as ?from= for the next page
+        logs = await manager.get_gateway_logs(project_id, from_seq, to_seq, from_time, to_time, limit)
+        if logs is None:
+            raise HTTPException(404, "Log archive is disabled")
+        return logs
+    
+    @router.get("/{project_id}/logs/search")
+    async def search_gateway_logs(
+        project_id: str,
+        q: str = Query(..., min_length=1),
+        regex: bool = False,
+        ignore_case: bool = False,
+        context: int = Query(2, ge=0, le=50),
+        from_seq: Optional[int] = Query(None, alias="from", ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+    ):
+        # "truncated" means the search timed out; continue with ?from=<next>
+        return await search_logs(
+            project_id, query=q, regex=regex, ignore_case=ignore_case, context=context,
+            from_seq=from_seq, limit=limit,
+        )
+    
     @router.post("/{project_id}/start", response_model=GatewayStatusResponse)
-    async def start_gateway(project_id: str, request: StartGatewayRequest):
+    async def start_gateway(project_id: str, request: StartGatewayRequest, response: Response):
+        try:
+            processes = request.process_configs()
+        except ValueError as e:
+            raise HTTPException(422, str(e))
         try:
             gateway = await manager.create_gateway(
-                project_id, request.working_directory, request.command
+                project_id, request.working_directory, request.command, request.limits(), request.owner,
+                request.pty, processes, request.watch.model_dump() if request.watch else None,
             )
-            return manager.get_gateway_status(project_id)
         except ValueError as e:
             raise HTTPException(409, str(e))
+        except AdmissionRejected as e:
+            raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+        status = manager.get_gateway_status(project_id)
+        if status["queue_position"] is not None:
+            # Accepted, starts once the host has capacity
+            response.status_code = 202
+        return status
     
     @router.post("/{project_id}/stop")
     async def stop_gateway(project_id: str):
         if await manager.stop_gateway(project_id):
             return {"status": "stopped"}
         raise HTTPException(404, "Gateway not found")
+    
+    @router.post("/{project_id}/pause", response_model=GatewayStatusResponse)
+    async def pause_gateway(project_id: str):
+        if not await manager.pause_gateway(project_id):
+            raise HTTPException(404, "Gateway not found")
+        return manager.get_gateway_status(project_id)
+    
+    @router.post("/{project_id}/resume", response_model=GatewayStatusResponse)
+    async def resume_gateway(project_id: str):
+        if not await manager.resume_gateway(project_id):
+            raise HTTPException(404, "Gateway not found")
+        return manager.get_gateway_status(project_id)
+    
+    async def agent_control(call) -> dict:
+        # Process-level operations go to the agent's control endpoint
+        try:
+            result = await call
+        except RuntimeError as e:
+            raise HTTPException(409, str(e))
+        except GatewayControlError as e:
+            raise HTTPException(e.status if e.status and e.status < 500 else 502, str(e))
+        if result is None:
+            raise HTTPException(404, "Gateway not found")
+        return result
+    
+    @router.post("/{project_id}/restart")
+    async def restart_gateway_process(project_id: str, request: Optional[RestartProcessRequest] = None):
+        # Restarts the process in place (milliseconds) instead of recreating the container
+        process = request.process if request else None
+        return await agent_control(manager.restart_process(project_id, process))
+    
+    @router.post("/{project_id}/signal")
+    async def signal_gateway_process(project_id: str, request: SignalRequest):
+        return await agent_control(manager.signal_gateway(project_id, request.signal, request.process))
+    
+    @router.get("/{project_id}/processes")
+    async def get_gateway_processes(project_id: str):
+        return await agent_control(manager.get_process_status(project_id))
+    
+    @router.put("/{project_id}/idle-policy", response_model=GatewayStatusResponse)
+    async def set_idle_policy(project_id: str, request: IdlePolicyRequest):
+        if not manager.get_gateway(project_id):
+            raise HTTPException(404, "Gateway not found")
+        manager.idle_policy.set_override(project_id, request.idle_minutes)
+        return manager.get_gateway_status(project_id)
 
     return router
 
@@ -59,22 +408,135 @@ def create_console_router(manager: GatewayManager) -> APIRouter:
     async def console_websocket(websocket: WebSocket, project_id: str):
         # WebSocket auth
         token = websocket.query_params.get("token")
-        from devmanager.config import settings
         if token != settings.internal_api_token:
             await websocket.close(code=4001, reason="Invalid token")
             return
             
-        gateway = manager.get_gateway(project_id)
+        # Connecting a console wakes a gateway paused for being idle
+        gateway = await manager.ensure_awake(project_id)
         if not gateway:
             await websocket.close(code=4004, reason="Gateway not found")
             return
+        
+        # ?since=<seq> resumes after the last line the client has seen;
+        # without it the whole scrollback is replayed.
+        since = websocket.query_params.get("since")
+        try:
+            since = int(since) if since is not None else None
+        except ValueError:
+            await websocket.close(code=4400, reason="Invalid since parameter")
+            return
+        # format=json sends {"seq": n, "line": "..."} frames so clients can track their position
+        as_json = websocket.query_params.get("format") == "json"
+        # batch=1 coalesces lines into one frame per flush interval
+        # (text: newline-joined, json: {"seq": first, "lines": [...]})
+        batched = websocket.query_params.get("batch") in ("1", "true")
             
         await websocket.accept()
-        try:
+        last_input = 0.0
+        
+        async def send(frame):
+            started = time.perf_counter()
+            if as_json:
+                await websocket.send_json(frame)
+            else:
+                await websocket.send_text(frame)
+            console_send_seconds.observe(time.perf_counter() - started)
+        
+        def batch_latency() -> float:
+            if time.monotonic() - last_input < INTERACTIVE_SECONDS:
+                return 0.0
+            return settings.console_batch_latency_ms / 1000
+        
+        async def send_batched(subscription):
+            while (batch := await subscription.next_frame(settings.console_batch_max_bytes, batch_latency())) is not None:
+                if as_json:
+                    frame = {"seq": batch.seq, "lines": batch.lines}
+                    if batch.dropped:
+                        frame["dropped"] = batch.dropped
+                    await send(frame)
+                elif gateway.pty:
+                    # Terminal chunks carry their own line breaks
+                    text = "".join(batch.lines)
+                    if batch.dropped:
+                        text = f"\r\n[MANAGER] {batch.dropped} chunks dropped\r\n{text}"
+                    await send(text)
+                else:
+                    text = "\n".join(batch.lines)
+                    if batch.dropped:
+                        text = f"[MANAGER] {batch.dropped} lines dropped\n{text}"
+                    await send(text)
+        
+        async def send_output():
+            with gateway.output.subscribe(since) as subscription:
+                if batched:
+                    await send_batched(subscription)
+                    return
+                while (batch := await subscription.next_batch()) is not None:
+                    if batch.dropped:
+                        if as_json:
+                            await send({"seq": batch.seq, "dropped": batch.dropped})
+                        elif gateway.pty:
+                            await send(f"\r\n[MANAGER] {batch.dropped} chunks dropped\r\n")
+                        else:
+                            await send(f"[MANAGER] {batch.dropped} lines dropped")
+                    for offset, line in enumerate(batch.lines):
+                        if as_json:
+                            await send({"seq": batch.seq + offset, "line": line})
+                        else:
+                            await send(line)
+        
+        async def receive_input():
+            # Client frames are stdin for the project: a text frame is one line of
+            # input; with format=json, {"type": "input", "data": "...", "newline": false}
+            # is sent as is (e.g. single keystrokes; add "process": name to target one
+            # supervised process) and PTY gateways also take
+            # {"type": "resize", "columns": n, "rows": n}
+            nonlocal last_input
             while True:
-                line = await asyncio.wait_for(gateway.output_queue.get(), timeout=30.0)
-                await websocket.send_text(line)
-        except (WebSocketDisconnect, asyncio.TimeoutError):
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                text = message.get("text")
+                if text is None:
+                    continue
+                if as_json:
+                    try:
+                        frame = json.loads(text)
+                    except ValueError:
+                        continue
+                    if not isinstance(frame, dict):
+                        continue
+                    if frame.get("type") == "resize":
+                        try:
+                            await gateway.resize(int(frame["columns"]), int(frame["rows"]))
+                        except (KeyError, TypeError, ValueError, RuntimeError, DockerEngineError) as e:
+                            await send({"error": f"Resize failed: {e}"})
+                        continue
+                    if frame.get("type") != "input":
+                        continue
+                    data, newline = str(frame.get("data", "")), bool(frame.get("newline", False))
+                    process = str(frame["process"]) if frame.get("process") is not None else None
+                else:
+                    data, newline, process = text, True, None
+                last_input = time.monotonic()
+                gateway.touch()
+                try:
+                    await gateway.send_input(data, newline, process)
+                except (RuntimeError, DockerEngineError) as e:
+                    await send({"error": str(e)} if as_json else f"[MANAGER] Input not delivered: {e}")
+        
+        tasks = [asyncio.create_task(send_output()), asyncio.create_task(receive_input())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        try:
+            await websocket.close()
+        except (WebSocketDisconnect, RuntimeError):
             pass
             
     return router
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS gateways (
+    project_id TEXT PRIMARY KEY,
+    owner TEXT,
+    host TEXT,
+    state TEXT NOT NULL,
+    working_directory TEXT,
+    command TEXT,
+    limits TEXT,
+    container_id TEXT,
+    created_at REAL,
+    started_at REAL,
+    state_changed_at REAL,
+    exit_code INTEGER,
+    oom_killed INTEGER NOT NULL DEFAULT 0,
+    pty INTEGER NOT NULL DEFAULT 0,
+    processes TEXT,
+    watch TEXT
+);
+CREATE INDEX IF NOT EXISTS gateways_by_state ON gateways (state, project_id);
+CREATE INDEX IF NOT EXISTS gateways_by_owner ON gateways (owner, project_id);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_project ON events (project_id, id);
+"""
+
+UPSERT_GATEWAY = """
+INSERT INTO gateways (
+    project_id, owner, host, state, working_directory, command, limits, container_id,
+    created_at, started_at, state_changed_at, exit_code, oom_killed, pty, processes, watch
+) VALUES (
+    :project_id, :owner, :host, :state, :working_directory, :command, :limits, :container_id,
+    :created_at, :started_at, :state_changed_at, :exit_code, :oom_killed, :pty, :processes, :watch
+)
+ON CONFLICT (project_id) DO UPDATE SET
+    owner = excluded.owner,
+    host = excluded.host,
+    state = excluded.state,
+    working_directory = excluded.working_directory,
+    command = excluded.command,
+    limits = excluded.limits,
+    container_id = excluded.container_id,
+    created_at = excluded.created_at,
+    started_at = excluded.started_at,
+    state_changed_at = excluded.state_changed_at,
+    exit_code = excluded.exit_code,
+    oom_killed = excluded.oom_killed,
+    pty = excluded.pty,
+    processes = excluded.processes,
+    watch = excluded.watch
+"""
+
+INSERT_EVENT = "INSERT INTO events (project_id, ts, event, detail) VALUES (?, ?, ?, ?)"
+
+# Sentinel telling the writer thread to stop
+_CLOSE = object()
+
+
+class StateStore:
+    """
+    Durable record of every gateway and its lifecycle events, kept in SQLite
+    (WAL mode) so the manager can recover working directories, commands and
+    exit codes after a crash and list gateways without walking memory.
+
+    Writes never block the event loop: they are queued to a single writer
+    thread that commits them in batches. Reads go through a separate
+    connection in a worker thread; `flush` waits for queued writes when a read
+    must see them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writes: "queue.Queue[Any]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only risks the last transactions on power loss, not corruption
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.commit()
+        self._writer = threading.Thread(
+            target=self._write_loop, args=(connection,), name="state-store-writer", daemon=True
+        )
+        self._writer.start()
+        self._reader = self._connect()
+
+    @property
+    def pending_writes(self) -> int:
+        """Writes queued but not yet committed."""
+        return self._writes.qsize()
+
+    # --- Writes (queued) ---
+
+    def save_gateway(self, record: Dict[str, Any]) -> None:
+        """Queues an insert-or-update of a gateway record (see `GatewayManager`)."""
+        row = dict(record)
+        row["command"] = json.dumps(row.get("command") or [])
+        row["limits"] = json.dumps(row.get("limits") or {})
+        row["oom_killed"] = int(bool(row.get("oom_killed")))
+        row["pty"] = int(bool(row.get("pty")))
+        row["processes"] = json.dumps(row["processes"]) if row.get("processes") else None
+        row["watch"] = json.dumps(row["watch"]) if row.get("watch") is not None else None
+        self._writes.put((UPSERT_GATEWAY, row))
+
+    def record_event(self, project_id: str, event: str, detail: Optional[dict] = None) -> None:
+        self._writes.put(
+            (INSERT_EVENT, (project_id, time.time(), event, json.dumps(detail) if detail else None))
+        )
+
+    async def flush(self) -> None:
+        """Waits until every write queued so far is committed."""
+        if self._writer is None:
+            return
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self._writes.put(lambda: loop.call_soon_threadsafe(done.set_result, None))
+        await done
+
+    def _write_loop(self, connection: sqlite3.Connection) -> None:
+        while True:
+            batch = [self._writes.get()]
+            # Group everything already queued into one transaction
+            while not self._writes.empty() and len(batch) < 1000:
+                batch.append(self._writes.get_nowait())
+            # Callbacks (flush) must run even if a write in the batch fails
+            callbacks = [item for item in batch if callable(item)]
+            closing = _CLOSE in batch
+            try:
+                with connection:
+                    for item in batch:
+                        if item is not _CLOSE and not callable(item):
+                            connection.execute(*item)
+            except sqlite3.Error as e:
+                logger.warning("Failed to write manager state: %s", e)
+            for callback in callbacks:
+                callback()
+            if closing:
+                connection.close()
+                return
+
+    # --- Reads ---
+
+    async def _read(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        def run() -> List[sqlite3.Row]:
+            with self._read_lock:
+                return self._reader.execute(sql, params).fetchall()
+        return await asyncio.to_thread(run)
+
+    @staticmethod
+    def _gateway_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record["command"] = json.loads(record["command"] or "[]")
+        record["limits"] = json.loads(record["limits"] or "{}")
+        record["oom_killed"] = bool(record["oom_killed"])
+        record["pty"] = bool(record["pty"])
+        record["processes"] = json.loads(record["processes"]) if record["processes"] else None
+        record["watch"] = json.loads(record["watch"]) if record["watch"] else None
+        return record
+
+    async def get_gateway(self, project_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._read("SELECT * FROM gateways WHERE project_id = ?", (project_id,))
+        return self._gateway_record(rows[0]) if rows else None
+
+    async def list_gateways(
+        self,
+        state: Optional[str] = None,
+        owner: Optional[str] = None,
+        host: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = 100,
+    ) -> List[Dict[str, Any]]:
+        """
+        Gateway records ordered by project id, starting after the `after`
+        cursor (the last project id of the previous page). A `limit` of None
+        returns every matching record.
+        """
+        where, params = [], []
+        for column, value in (("state", state), ("owner", owner), ("host", host)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if after is not None:
+            where.append("project_id > ?")
+            params.append(after)
+        sql = "SELECT * FROM gateways"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY project_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._gateway_record(row) for row in await self._read(sql, tuple(params))]
+
+    async def list_events(
+        self, project_id: str, after: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Lifecycle events of a gateway, oldest first, after the event id `after`."""
+        rows = await self._read(
+            "SELECT * FROM events WHERE project_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (project_id, after or 0, limit),
+        )
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["detail"] = json.loads(event["detail"]) if event["detail"] else None
+            events.append(event)
+        return events
+
+    async def close(self) -> None:
+        """Commits outstanding writes and closes the database."""
+        if self._writer is None:
+            return
+        self._writes.put(_CLOSE)
+        await asyncio.to_thread(self._writer.join)
+        self._writer = None
+        with self._read_lock:
+            self._reader.close()
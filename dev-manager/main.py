@@ -1,7 +1,9 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
+from devmanager import metrics
 from devmanager.gateway_manager import GatewayManager
 from devmanager.routes import create_gateway_router, create_console_router
 
@@ -10,6 +12,7 @@ async def lifespan(app: FastAPI):
     # Startup
     manager = GatewayManager()
     app.state.gateway_manager = manager
+    await manager.start()
     
     # App is already created, but we can mount routes here if we want 
     # OR we can just use the manager instance in the router functions
@@ -30,6 +33,19 @@ app = FastAPI(
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request):
+    manager: GatewayManager = request.app.state.gateway_manager
+    return PlainTextResponse(
+        metrics.render(manager.collect_metrics),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 if __name__ == "__main__":
     from devmanager.config import settings
-    uvicorn.run(app, host="0.0.0.0", port=settings.gateway_http_port)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=settings.gateway_http_port,
+        ws_per_message_deflate=settings.console_per_message_deflate,
+    )
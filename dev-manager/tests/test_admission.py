@@ -0,0 +1,100 @@
+import asyncio
+from typing import Optional
+
+import pytest
+
+from devmanager.admission import AdmissionRejected, AdmissionScheduler
+from devmanager.config import settings
+from devmanager.gateway.gateway import ResourceLimits
+
+
+def scheduler(cpus: Optional[float] = 4.0, memory_mb: Optional[int] = 4096) -> AdmissionScheduler:
+    admission = AdmissionScheduler(engine=None)
+    admission.cpu_capacity = cpus
+    admission.memory_capacity_mb = memory_mb
+    return admission
+
+
+def limits(cpus: float, memory_mb: int = 0) -> ResourceLimits:
+    return ResourceLimits(cpus=cpus, memory_mb=memory_mb)
+
+
+def test_starts_that_fit_are_admitted_right_away():
+    async def run():
+        admission = scheduler()
+        assert admission.reserve("a", limits(2, 1024)) is None
+        assert admission.reserve("b", limits(2, 1024)) is None
+        # Reserving again for an admitted gateway doesn't count it twice
+        assert admission.reserve("a", limits(2, 1024)) is None
+        assert (admission.committed_cpus, admission.committed_memory_mb, admission.running) == (4, 2048, 2)
+
+    asyncio.run(run())
+
+
+def test_queue_is_strictly_first_in_first_out():
+    async def run():
+        admission = scheduler()
+        admission.reserve("a", limits(3))
+        big = admission.reserve("big", limits(4))
+        # One CPU is free, but a small start doesn't overtake the big one
+        assert not admission.would_admit(limits(1))
+        small = admission.reserve("small", limits(1))
+        assert (admission.queue_position("big"), admission.queue_position("small")) == (1, 2)
+
+        admission.release("a")
+        assert big.done() and not small.done()
+        assert admission.queue_position("small") == 1
+
+        admission.release("big")
+        assert small.done()
+        assert admission.stats()["queue"] == []
+        assert (admission.admitted, admission.queued) == (3, 2)
+
+    asyncio.run(run())
+
+
+def test_release_frees_capacity_for_as_many_as_fit():
+    async def run():
+        admission = scheduler(cpus=4, memory_mb=2048)
+        admission.reserve("a", limits(4, 2048))
+        waiting = [admission.reserve(name, limits(1, 512)) for name in "bcdef"]
+        admission.release("a")
+        assert [future.done() for future in waiting] == [True, True, True, True, False]
+        assert admission.committed_memory_mb == 2048
+
+        # Releasing a queued start cancels its future and frees its slot
+        admission.release("b")
+        assert waiting[-1].done() and not waiting[-1].cancelled()
+        blocked = admission.reserve("g", limits(4))
+        queued = admission.reserve("h", limits(1))
+        admission.release("g")
+        assert blocked.cancelled() and not queued.done()
+        admission.release("h")
+        assert queued.cancelled()
+
+    asyncio.run(run())
+
+
+def test_rejects_what_never_fits_and_a_full_queue(monkeypatch):
+    async def run():
+        admission = scheduler()
+        with pytest.raises(AdmissionRejected):
+            admission.reserve("huge", limits(8))
+        monkeypatch.setattr(settings, "admission_queue_size", 2)
+        admission.reserve("a", limits(4))
+        admission.reserve("b", limits(1))
+        admission.reserve("c", limits(1))
+        with pytest.raises(AdmissionRejected):
+            admission.reserve("d", limits(1))
+        assert admission.rejected == 2
+
+    asyncio.run(run())
+
+
+def test_unknown_capacity_admits_everything():
+    async def run():
+        admission = scheduler(cpus=None, memory_mb=None)
+        for name in "abc":
+            assert admission.reserve(name, limits(64, 1 << 20)) is None
+
+    asyncio.run(run())
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+from devmanager.config import settings
+from devmanager.docker_hosts import HashRing
+from devmanager.engine import DockerEngine
+from devmanager.gateway.gateway import GatewayState
+from devmanager.gateway_manager import GatewayManager
+
+HOSTS = [f"tcp://docker-{i}:2375" for i in range(4)]
+PROJECTS = [f"project-{i}" for i in range(4000)]
+
+
+def ring(hosts):
+    ring = HashRing()
+    for host in hosts:
+        ring.add(host)
+    return ring
+
+
+def placement(ring: HashRing, count: int = 1):
+    return {project: ring.preferred(project, count) for project in PROJECTS}
+
+
+def test_placement_is_deterministic():
+    assert placement(ring(HOSTS)) == placement(ring(reversed(HOSTS)))
+    assert all(len(set(hosts)) == 2 for hosts in placement(ring(HOSTS), 2).values())
+
+
+def test_adding_a_host_only_moves_projects_onto_it():
+    before = placement(ring(HOSTS[:3]))
+    after = placement(ring(HOSTS))
+    moved = [project for project in PROJECTS if before[project] != after[project]]
+    assert all(after[project] == [HOSTS[3]] for project in moved)
+    # About a quarter of the projects, not a reshuffle
+    assert 0.15 < len(moved) / len(PROJECTS) < 0.35
+
+
+def test_removing_a_host_only_moves_its_projects():
+    full = ring(HOSTS)
+    before = placement(full)
+    full.remove(HOSTS[1])
+    after = placement(full)
+    for project in PROJECTS:
+        if before[project] != [HOSTS[1]]:
+            assert after[project] == before[project]
+        else:
+            assert after[project] != [HOSTS[1]]
+
+
+def test_draining_host_is_skipped_without_disturbing_the_rest():
+    full = ring(HOSTS)
+    for project in PROJECTS:
+        preferred = full.preferred(project, 3)
+        assert full.preferred(project, 2, exclude={HOSTS[2]}) == [h for h in preferred if h != HOSTS[2]][:2]
+
+
+def manager_with_gateways():
+    manager = GatewayManager(engines=[DockerEngine(url) for url in HOSTS[:3]])
+    hosts = list(manager.hosts.values())
+    for i, project in enumerate(PROJECTS[:300]):
+        manager.gateways[project] = SimpleNamespace(
+            project_id=project,
+            engine=hosts[i % 3].engine,
+            state=GatewayState.STOPPED if i % 10 == 0 else GatewayState.RUNNING,
+            # Every other gateway has a console viewer
+            output=SimpleNamespace(subscriber_count=i % 2),
+        )
+    moves = []
+
+    async def run_bulk(project_ids, operation, concurrency=None, timeout=None):
+        moves.extend(project_ids)
+        return {}
+
+    manager.run_bulk = run_bulk
+    return manager, moves
+
+
+def test_rebalance_moves_only_off_draining_hosts():
+    async def run():
+        manager, moves = manager_with_gateways()
+        # A new host changes many projects' preferred hosts, but moves nothing by itself
+        manager._register_host(DockerEngine(HOSTS[3]))
+        await manager.rebalance()
+        assert moves == []
+
+        manager.hosts[HOSTS[0]].draining = True
+        await manager.rebalance()
+        assert moves and moves == [
+            gateway.project_id
+            for gateway in manager.gateways.values()
+            if gateway.engine.url == HOSTS[0] and gateway.state != GatewayState.STOPPED
+        ]
+
+    asyncio.run(run())
+
+
+def test_spread_moves_unwatched_gateways_off_hosts_they_no_longer_prefer():
+    async def run():
+        manager, moves = manager_with_gateways()
+        manager._register_host(DockerEngine(HOSTS[3]))
+        await manager.rebalance(spread=True)
+        assert moves
+        for project in moves:
+            gateway = manager.gateways[project]
+            assert gateway.state != GatewayState.STOPPED
+            assert gateway.output.subscriber_count == 0
+            assert gateway.engine.url not in manager._ring.preferred(project, settings.placement_candidates)
+
+    asyncio.run(run())
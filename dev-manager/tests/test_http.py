@@ -0,0 +1,54 @@
+import asyncio
+
+from devmanager.engine.http import HTTPConnectionPool
+
+
+async def serve(response: bytes):
+    """A server answering every request with `response`; returns it and its connection count."""
+    connections = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connections.append(writer)
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(response)
+            await writer.drain()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, connections
+
+
+def test_no_content_without_length_does_not_wait_for_eof():
+    async def run():
+        server, connections = await serve(b"HTTP/1.1 204 No Content\r\nServer: Docker\r\n\r\n")
+        port = server.sockets[0].getsockname()[1]
+        pool = HTTPConnectionPool(f"http://127.0.0.1:{port}")
+        try:
+            for _ in range(3):
+                response = await pool.request("POST", "/v1.41/containers/x/start", timeout=2)
+                assert response.status == 204
+                assert response.body == b""
+            # The connection stays reusable
+            assert len(connections) == 1
+        finally:
+            await pool.close()
+            server.close()
+
+    asyncio.run(run())
+
+
+def test_head_response_has_no_body():
+    async def run():
+        server, connections = await serve(b"HTTP/1.1 200 OK\r\nContent-Length: 42\r\n\r\n")
+        port = server.sockets[0].getsockname()[1]
+        pool = HTTPConnectionPool(f"http://127.0.0.1:{port}")
+        try:
+            for _ in range(2):
+                response = await pool.request("HEAD", "/_ping", timeout=2)
+                assert response.status == 200
+                assert response.body == b""
+            assert len(connections) == 1
+        finally:
+            await pool.close()
+            server.close()
+
+    asyncio.run(run())
@@ -0,0 +1,101 @@
+import asyncio
+
+from devmanager.gateway.log_bus import LogBus
+
+
+def test_lapped_subscriber_is_told_what_it_missed():
+    async def run():
+        bus = LogBus(max_lines=4, max_bytes=1000)
+        subscription = bus.subscribe()
+        for i in range(10):
+            bus.publish(f"line {i}")
+        # Publishing never waited on the subscriber; it lost everything the ring overwrote
+        batch = await subscription.next_batch()
+        assert (batch.seq, batch.dropped) == (6, 6)
+        assert batch.lines == ["line 6", "line 7", "line 8", "line 9"]
+        assert bus.max_subscriber_lag == 0
+
+        # Lapped again, by the byte cap this time, while it holds a cursor mid-ring
+        bus.publish("x" * 1000)
+        bus.publish("after")
+        batch = await subscription.next_batch()
+        assert (batch.seq, batch.dropped, batch.lines) == (11, 1, ["after"])
+
+    asyncio.run(run())
+
+
+def test_lapped_subscriber_iterates_with_a_gap_marker():
+    async def run():
+        bus = LogBus(max_lines=2, max_bytes=1000)
+        subscription = bus.subscribe()
+        for i in range(5):
+            bus.publish(str(i))
+        bus.close()
+        assert [line async for line in subscription] == [
+            "[MANAGER] 3 lines dropped (console viewer too slow)", "3", "4"
+        ]
+
+    asyncio.run(run())
+
+
+def test_since_replays_only_later_lines():
+    async def run():
+        bus = LogBus(max_lines=4, max_bytes=1000)
+        for i in range(6):
+            bus.publish(f"line {i}")
+        # first_seq is 2 now
+
+        batch = await bus.subscribe(since=3).next_batch()
+        assert (batch.seq, batch.lines, batch.dropped) == (4, ["line 4", "line 5"], 0)
+
+        # A client that has everything waits for the next line
+        subscription = bus.subscribe(since=5)
+        waiting = asyncio.create_task(subscription.next_batch())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        bus.publish("line 6")
+        assert (await waiting).lines == ["line 6"]
+
+        # Older than the scrollback: the gap is reported
+        batch = await bus.subscribe(since=0).next_batch()
+        assert (batch.seq, batch.dropped) == (3, 2)
+
+        # Ahead of the bus (the gateway restarted): the whole scrollback
+        batch = await bus.subscribe(since=100).next_batch()
+        assert (batch.seq, batch.dropped) == (3, 0)
+        assert batch.lines == ["line 3", "line 4", "line 5", "line 6"]
+
+    asyncio.run(run())
+
+
+def test_unsubscribe_while_waiting():
+    async def run():
+        bus = LogBus(max_lines=8, max_bytes=1000)
+        leaving = bus.subscribe()
+        staying = bus.subscribe()
+        left = asyncio.create_task(leaving.next_batch())
+        stays = asyncio.create_task(staying.next_batch())
+        await asyncio.sleep(0)
+        assert bus.subscriber_count == 2
+
+        # Cancelling one waiter must not cancel the future the others share
+        left.cancel()
+        leaving.close()
+        await asyncio.gather(left, return_exceptions=True)
+        assert left.cancelled()
+        assert bus.subscriber_count == 1
+
+        bus.publish("hello")
+        batch = await asyncio.wait_for(stays, 1)
+        assert batch.lines == ["hello"]
+        # The departed subscriber doesn't hold back the lag metric
+        assert bus.max_subscriber_lag == 0
+
+        # Closing a subscription twice is harmless, and waiting ends with the bus
+        leaving.close()
+        waiting = asyncio.create_task(staying.next_batch())
+        await asyncio.sleep(0)
+        bus.close()
+        assert await asyncio.wait_for(waiting, 1) is None
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+from devmanager.gateway.log_multiplexer import RECORD_SEPARATOR, STDERR, STDOUT, LogMultiplexer, StreamDemuxer
+
+
+def frame(stream: int, payload: bytes) -> bytes:
+    return bytes([stream, 0, 0, 0]) + len(payload).to_bytes(4, "big") + payload
+
+
+def demux(*chunks: bytes, **kwargs):
+    lines = []
+    demuxer = StreamDemuxer(lines.append, **kwargs)
+    for chunk in chunks:
+        demuxer.feed(chunk)
+    return demuxer, lines
+
+
+def test_header_split_across_chunks():
+    data = frame(STDOUT, b"hello\n")
+    for split in range(1, StreamDemuxer.HEADER_SIZE):
+        _, lines = demux(data[:split], data[split:])
+        assert lines == ["hello"]
+
+
+def test_frame_split_across_chunks():
+    data = frame(STDOUT, b"first line\nsecond ") + frame(STDOUT, b"line\n")
+    # Every split point, and one byte at a time
+    for split in range(1, len(data)):
+        _, lines = demux(data[:split], data[split:])
+        assert lines == ["first line", "second line"]
+    _, lines = demux(*(data[i:i + 1] for i in range(len(data))))
+    assert lines == ["first line", "second line"]
+
+
+def test_stdout_and_stderr_interleaved():
+    # A line on each stream arrives in pieces, interleaved frame by frame
+    data = (
+        frame(STDOUT, b"out ")
+        + frame(STDERR, b"err ")
+        + frame(STDOUT, b"one\nout two\n")
+        + frame(STDERR, b"one\n")
+        + frame(STDERR, b"err tail")
+    )
+    demuxer, lines = demux(data[:11], data[11:30], data[30:])
+    assert lines == ["out one", "out two", "err one"]
+    demuxer.flush()
+    assert lines == ["out one", "out two", "err one", "err tail"]
+
+
+def test_zero_length_frame():
+    data = frame(STDOUT, b"") + frame(STDOUT, b"after\n")
+    _, lines = demux(data)
+    assert lines == ["after"]
+    # On its own it emits nothing and leaves no partial line behind
+    demuxer, lines = demux(frame(STDERR, b""))
+    demuxer.flush()
+    assert lines == []
+
+
+def test_zero_length_frame_does_not_decide_framing():
+    frames = []
+    record = bytes([RECORD_SEPARATOR]) + json.dumps({"type": "exit", "code": 0}).encode() + b"\n"
+    lines = []
+    demuxer = StreamDemuxer(lines.append, frame_sink=frames.append)
+    demuxer.feed(frame(STDOUT, b"") + frame(STDOUT, record))
+    assert frames == [{"type": "exit", "code": 0}]
+    assert lines == []
+
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.closed = False
+
+    async def iter_chunks(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeEngine:
+    def __init__(self, chunks):
+        self.response = FakeResponse(chunks)
+
+    async def stream(self, method, path, params=None):
+        return self.response
+
+
+def test_multiplexer_follows_split_stream_and_flushes_at_end():
+    async def run():
+        data = frame(STDOUT, b"one\ntw") + frame(STDERR, b"oops\n") + frame(STDOUT, b"o\nunterminated")
+        engine = FakeEngine([data[i:i + 5] for i in range(0, len(data), 5)])
+        multiplexer = LogMultiplexer(engine)
+        lines = []
+        await multiplexer.follow("container", lines.append)
+        assert lines == ["one", "oops", "two", "unterminated"]
+        assert engine.response.closed
+        assert multiplexer.active_streams == 0
+
+    asyncio.run(run())
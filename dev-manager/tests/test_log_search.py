@@ -0,0 +1,134 @@
+import asyncio
+import os
+import re
+
+from devmanager.log_archive import INDEX_SUFFIX, SEGMENT_SUFFIX, LogArchive, read_index
+from devmanager.log_search import SearchQuery, _required_literals, sre_parse, trigrams
+
+LINES = [
+    "2026-10-18T12:00:00Z INFO request 1 handled in 12 ms",
+    "2026-10-18T12:00:01Z ERROR connection refused by upstream",
+    "2026-10-18T12:00:02Z error: timeout after 3000ms",
+    "2026-10-18T12:00:03Z WARN Connection Reset while reading",
+    "foobaz",
+    "foobarbaz",
+    "abdef abcdef abcccdef abccccdef",
+    "npm ERR! code ELIFECYCLE",
+    "Traceback (most recent call last):",
+    "  File \"app.py\", line 3, in <module>",
+    "ValueError: invalid literal for int() with base 10: 'x'",
+    "ſtatus ıd ΟΔΟΣΑ",
+    "status id ΟΔΟΣ",
+    "Kelvin-KEY",
+    "",
+] * 3
+
+QUERIES = [
+    # (query, regex, ignore_case)
+    ("connection refused", False, False),
+    ("Connection", False, False),
+    ("connection", False, True),
+    ("ELIFECYCLE", False, False),
+    ("refused|reset", True, False),
+    ("(timeout|refused)", True, True),
+    ("error: (timeout|refused) after \\d+ms", True, False),
+    ("foo(bar)?baz", True, False),
+    ("foo(?:bar)?baz", True, False),
+    ("abc{0,3}def", True, False),
+    ("abc{1,3}def", True, False),
+    ("(?i)connection reset", True, False),
+    ("(?i:CONNECTION) Reset", True, False),
+    ("(?-i:ERROR) connection", True, True),
+    ("status", False, True),
+    ("STATUS ID", False, True),
+    ("ΟΔΟΣ", False, False),
+    ("kelvin-key", False, True),
+    ("line \\d+, in", True, False),
+    ("^$", True, False),
+    ("no such line", False, False),
+]
+
+
+def literals(pattern: str, flags: int = 0):
+    found = []
+    parsed = sre_parse.parse(pattern, flags)
+    _required_literals(parsed, found, bool(parsed.state.flags & re.IGNORECASE))
+    return found
+
+
+def test_required_literals():
+    assert literals("error: (timeout|refused) after \\d+ms") == ["error: ", " after ", "ms"]
+    assert literals("timeout|refused") == []
+    assert literals("foo(bar)?baz") == ["foo", "baz"]
+    assert literals("abc{0,3}def") == ["ab", "def"]
+    assert literals("(ab){2,}c") == ["ab", "c"]
+    assert literals("[a-z]+\\.py") == [".py"]
+    # Letters that IGNORECASE matches to non-ASCII characters (ſ, ı) split literals
+    assert literals("(?i)Connection reset") == ["Connect", "on re", "et"]
+    assert literals("(?i:ERROR) (?-i:status)", re.IGNORECASE) == ["ERROR", " ", "status"]
+    assert literals("ΟΔΟΣΑ") == ["ΟΔΟ", "Α"]
+
+
+def test_literal_query_trigrams():
+    assert SearchQuery("refused").trigrams == trigrams("refused")
+    assert SearchQuery("foo.bar").trigrams == trigrams("foo.bar")
+    assert SearchQuery("foo.bar", regex=True).trigrams == trigrams("foo") | trigrams("bar")
+    assert SearchQuery("a|b", regex=True).trigrams == set()
+
+
+def scan(query: str, regex: bool, ignore_case: bool):
+    pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE if ignore_case else 0)
+    return [seq for seq, line in enumerate(LINES) if pattern.search(line)]
+
+
+def indexed(archive: LogArchive, query: str, regex: bool, ignore_case: bool):
+    async def run():
+        matches, next_seq, truncated = await archive.search(
+            "project", SearchQuery(query, regex, ignore_case), context=0, limit=len(LINES) + 1
+        )
+        assert next_seq is None and not truncated
+        return [match["seq"] for match in matches]
+
+    return run()
+
+
+def write(root: str, segment_bytes: int) -> LogArchive:
+    archive = LogArchive(root, segment_bytes, block_bytes=100, flush_seconds=60,
+                         retention_bytes=1 << 30, retention_seconds=3600)
+    archive.start()
+    writer = archive.writer("project")
+    for line in LINES:
+        writer.append(line)
+    return archive
+
+
+def test_indexed_search_matches_scan(tmp_path):
+    async def run():
+        # The segment being written (trigram log) and sealed segments (postings)
+        archive = write(str(tmp_path), segment_bytes=500)
+        for query in QUERIES:
+            assert await indexed(archive, *query) == scan(*query), query
+        await archive.close()
+
+        archive = LogArchive(str(tmp_path), 500, 100, 60, 1 << 30, 3600)
+        archive.start()
+        for query in QUERIES:
+            assert await indexed(archive, *query) == scan(*query), query
+        await archive.close()
+
+    asyncio.run(run())
+
+
+def test_index_prunes_blocks(tmp_path):
+    async def run():
+        archive = write(str(tmp_path), segment_bytes=1 << 20)
+        await archive.close()
+        directory = archive._directory("project")
+        (segment,) = [name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)]
+        base = os.path.join(directory, segment[:-len(SEGMENT_SUFFIX)])
+        count = len(read_index(base + INDEX_SUFFIX))
+        blocks = archive._trigrams.candidates(base, SearchQuery("ELIFECYCLE").trigrams)
+        # One line in fifteen has it; blocks hold a few lines each
+        assert blocks and len(blocks) < count // 2
+
+    asyncio.run(run())